@@ -10,6 +10,9 @@ import threading
 
 import base64
 
+from catalog_shards import MANIFEST_NAME, SHARD_DIR
+from catalog_store import catalog_backend
+
 # --- Start Flask API in background thread ---
 def start_flask_api():
     """Start the Flask API server in a background thread."""
@@ -225,7 +228,12 @@ def get_logo_base64():
         return None
 
 def run_update_script():
-    """Runs the update script and yields output lines."""
+    """
+    Runs the update script and yields output lines. The script runs the whole
+    pipeline (update_pipeline.run_update) in one child process: a process of its
+    own keeps its console output and its parser processes apart from Streamlit
+    and the API thread. It exits with 1 if the run failed.
+    """
     cmd = [sys.executable, str(SCRIPT_PATH)]
     
     # Use subprocess.Popen to run the script
@@ -242,12 +250,19 @@ def run_update_script():
     return process
 
 
+def catalog_input() -> Path:
+    """The catalog to export: the shard manifest with CATALOG_BACKEND=shards, so shards load in parallel."""
+    if catalog_backend() == "shards":
+        return SHARD_DIR / MANIFEST_NAME
+    return DATA_DIR / "product_details.json"
+
+
 def run_batch_convert(batch_size: int, price_formula: str = ""):
     """Runs the batch conversion script with specified batch size and optional price formula."""
     cmd = [
         sys.executable,
         str(CONVERT_SCRIPT_PATH),
-        "--input", str(DATA_DIR / "product_details.json"),
+        "--input", str(catalog_input()),
         "--output", str(OUTPUT_DIR / "woocommerce_products.csv"),
         "--batch", str(batch_size)
     ]
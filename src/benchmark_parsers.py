@@ -0,0 +1,100 @@
+import argparse
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+
+from scrape_products import CACHE_DIR, EXTRACTION_ENGINES
+
+console = Console()
+
+
+def load_fixtures(pages_dir: Path, limit: int) -> List[Tuple[str, bytes]]:
+    """
+    Loads saved product pages. Accepts either a directory of *.html files or the
+    HTTP response cache directory written by scrape_products (*.body files).
+    """
+    paths = sorted(pages_dir.glob("*.html")) or sorted(pages_dir.glob("*/*.body"))
+    if limit > 0:
+        paths = paths[:limit]
+    return [(path.name, path.read_bytes()) for path in paths]
+
+
+def time_engine(engine: str, pages: List[Tuple[str, bytes]], rounds: int) -> float:
+    extract = EXTRACTION_ENGINES[engine]
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _, html in pages:
+            extract(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare_engines(pages: List[Tuple[str, bytes]]) -> Dict[str, List[str]]:
+    """Returns {field: [page names]} for every field where the engines disagree."""
+    mismatches: Dict[str, List[str]] = {}
+    for name, html in pages:
+        expected: Dict[str, Any] = EXTRACTION_ENGINES["soup"](html)
+        actual: Dict[str, Any] = EXTRACTION_ENGINES["lxml"](html)
+        for field, value in expected.items():
+            if actual.get(field) != value:
+                mismatches.setdefault(field, []).append(name)
+    return mismatches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the BeautifulSoup and lxml product page extraction engines"
+    )
+    parser.add_argument(
+        "--pages",
+        type=Path,
+        default=CACHE_DIR,
+        help="Directory of saved *.html pages or the HTTP response cache (default: data/http_cache)",
+    )
+    parser.add_argument("--limit", type=int, default=0, help="Maximum number of pages to use (0 for all)")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed rounds per engine; the best round is reported")
+    parser.add_argument("--verify", action="store_true", help="Also check that both engines extract identical fields")
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.pages, args.limit)
+    if not pages:
+        raise SystemExit(f"No saved pages found in {args.pages}")
+    total_bytes = sum(len(html) for _, html in pages)
+    console.print(
+        Panel(
+            f"Benchmarking {len(pages)} pages ({total_bytes / (1024 * 1024):.1f} MB), best of {args.rounds} rounds",
+            border_style="cyan",
+        )
+    )
+
+    timings = {engine: time_engine(engine, pages, max(args.rounds, 1)) for engine in ("soup", "lxml")}
+
+    table = Table(title="Extraction throughput")
+    table.add_column("Engine", style="cyan")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Pages/sec", justify="right", style="magenta")
+    table.add_column("Speedup", justify="right", style="green")
+    for engine, seconds in timings.items():
+        table.add_row(
+            engine,
+            f"{seconds:.3f}",
+            f"{len(pages) / seconds:.1f}",
+            f"{timings['soup'] / seconds:.2f}x",
+        )
+    console.print(table)
+
+    if args.verify:
+        mismatches = compare_engines(pages)
+        if not mismatches:
+            console.print("[green]Both engines extracted identical fields for every page.[/green]")
+        for field, names in mismatches.items():
+            console.print(f"[yellow]{field}: differs on {len(names)} pages (e.g. {names[0]})[/yellow]")
+
+
+if __name__ == "__main__":
+    main()
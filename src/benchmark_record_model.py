@@ -0,0 +1,159 @@
+import argparse
+import gc
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+
+from product_model import ProductRecord
+import serialization
+
+console = Console()
+
+BRANDS = ("bmw", "mini", "land-rover", "toyota", "ford")
+CATEGORIES = ("Accessories", "Wheels", "Suspension", "Exhaust", "Aerodynamics", "Interior")
+
+
+def synthetic_product(index: int) -> Dict[str, Any]:
+    """A compact record shaped like the scraper output, varied by `index`."""
+    brand = BRANDS[index % len(BRANDS)]
+    category = CATEGORIES[index % len(CATEGORIES)]
+    url = f"https://www.ac-schnitzer.de/en/{brand}/{category.lower()}/{index}/product-{index}/"
+    return {
+        "brand": brand,
+        "url": url,
+        "title": f"Product {index}",
+        "breadcrumbs": [
+            {"title": brand.upper(), "url": f"https://www.ac-schnitzer.de/en/{brand}/", "position": 0},
+            {"title": category, "url": f"https://www.ac-schnitzer.de/en/{brand}/{category.lower()}/", "position": 1},
+        ],
+        "category_path": [brand.upper(), category],
+        "part_number": f"TN{index:06d}",
+        "sku": f"SKU-{index}",
+        "product_id": str(index),
+        "price": {"amount": f"{100 + index % 900}.50", "currency": "EUR", "display": f"€ {100 + index % 900},50 *"},
+        "availability": {
+            "message": "Ready for shipping today",
+            "classes": ["delivery--text", "delivery--text-available"],
+            "status": "available",
+            "badge": "✓",
+        },
+        "mounting_time": {"raw": "Mounting: 1,5 hours", "hours": 1.5},
+        "product_information": [
+            {"title": "Overview", "text": f"Overview of product {index}", "html": f"<p>Overview of product {index}</p>"},
+            {"title": "Description", "text": f"Description {index}", "html": f"<p>Description <b>{index}</b></p>"},
+        ],
+        "images": {
+            "count": 1,
+            "gallery": [
+                {
+                    "small": f"https://x/s{index}.jpg",
+                    "large": f"https://x/l{index}.jpg",
+                    "original": f"https://x/o{index}.jpg",
+                    "alt": f"Product {index}",
+                    "primary": f"https://x/o{index}.jpg",
+                }
+            ],
+        },
+        "documents": [{"url": f"https://x/doc{index}.pdf", "label": "TÜV report"}],
+        "manufacturer_info": "AC Schnitzer\nAachen\nGermany",
+        "ac_document": None,
+        "eu_tire_label": [],
+        "variations": [{"name": "Size", "options": ['19"', '20"']}],
+        "meta": {
+            "scraped_at": "2026-01-01T00:00:00",
+            "price_meta": {"og_price": f"{100 + index % 900}.50", "og_currency": "EUR", "og_product_url": url},
+        },
+        "lastmod": "2026-01-01",
+    }
+
+
+def best_of(rounds: int, func: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def traced(func: Callable[[], Any]) -> Any:
+    """Returns (result, MB still allocated by the result once func returns)."""
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current / (1024 * 1024)
+
+
+def read_dicts(products: List[Dict[str, Any]]) -> int:
+    total = 0
+    for product in products:
+        if product["price"]["amount"] and product["brand"] and product["category_path"]:
+            total += len(product["sku"]) + len(product["images"]["gallery"])
+    return total
+
+
+def read_records(records: List[ProductRecord]) -> int:
+    total = 0
+    for record in records:
+        if record.price.amount and record.brand and record.category_path:
+            total += len(record.sku) + len(record.images.gallery)
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare memory and attribute access of plain dict records and ProductRecord"
+    )
+    parser.add_argument("--products", type=int, default=100_000, help="Size of the synthetic catalog")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed rounds per case; the best round is reported")
+    args = parser.parse_args()
+
+    rounds = max(args.rounds, 1)
+    raw = serialization.dumps([synthetic_product(index) for index in range(args.products)], compact=True)
+    console.print(
+        Panel(
+            f"{args.products} synthetic products ({len(raw) / (1024 * 1024):.1f} MB of JSON), "
+            f"best of {rounds} rounds",
+            border_style="cyan",
+        )
+    )
+
+    # Records are built from freshly loaded JSON, so every string not interned is
+    # the record's own copy, as in production.
+    products, dict_mb = traced(lambda: serialization.loads(raw))
+    records, record_mb = traced(
+        lambda: [ProductRecord.from_dict(product) for product in serialization.loads(raw)]
+    )
+
+    from_time = best_of(rounds, lambda: [ProductRecord.from_dict(product) for product in products])
+    to_time = best_of(rounds, lambda: [record.to_dict() for record in records])
+    dict_read = best_of(rounds, lambda: read_dicts(products))
+    record_read = best_of(rounds, lambda: read_records(records))
+    if read_dicts(products) != read_records(records):
+        raise SystemExit("dict and ProductRecord reads disagree")
+
+    table = Table(title="Record model")
+    table.add_column("Measure", style="cyan")
+    table.add_column("dict", justify="right")
+    table.add_column("ProductRecord", justify="right")
+    table.add_column("Ratio", justify="right", style="green")
+    table.add_row(
+        "Memory (MB)", f"{dict_mb:.1f}", f"{record_mb:.1f}", f"{record_mb / dict_mb:.2f}x"
+    )
+    table.add_row(
+        "Field reads (s)", f"{dict_read:.3f}", f"{record_read:.3f}", f"{record_read / dict_read:.2f}x"
+    )
+    table.add_row("from_dict (s)", "", f"{from_time:.3f}", "")
+    table.add_row("to_dict (s)", "", f"{to_time:.3f}", "")
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import time
+from pathlib import Path
+from typing import Any, Callable, List
+
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+
+import serialization
+
+console = Console()
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_FILES = [
+    BASE_DIR / "data" / "product_details.json",
+    BASE_DIR / "data" / "updated_product_details.json",
+    BASE_DIR / "data" / "product_links.json",
+    BASE_DIR / "src" / "product_links.json",
+]
+
+
+def best_of(rounds: int, func: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare JSON load/dump times of the available serializer backends"
+    )
+    parser.add_argument(
+        "files",
+        nargs="*",
+        type=Path,
+        help="JSON files to benchmark (default: the catalog and link files under data/ and src/)",
+    )
+    parser.add_argument("--rounds", type=int, default=3, help="Timed rounds per case; the best round is reported")
+    args = parser.parse_args()
+
+    files: List[Path] = [path for path in (args.files or DEFAULT_FILES) if path.exists()]
+    if not files:
+        raise SystemExit("No JSON files found to benchmark")
+    rounds = max(args.rounds, 1)
+    console.print(
+        Panel(
+            f"Backends: {', '.join(serialization.BACKENDS)} (active: {serialization.backend_name()}), "
+            f"best of {rounds} rounds",
+            border_style="cyan",
+        )
+    )
+
+    table = Table(title="JSON serialization")
+    table.add_column("File", style="cyan")
+    table.add_column("Backend")
+    table.add_column("Mode")
+    table.add_column("Load (s)", justify="right")
+    table.add_column("Dump (s)", justify="right")
+    table.add_column("Size (MB)", justify="right", style="magenta")
+    table.add_column("Speedup", justify="right", style="green")
+
+    for path in files:
+        raw = path.read_bytes()
+        data = serialization.loads(raw, backend="json")
+        baseline = None
+        for backend in serialization.BACKENDS:
+            load_time = best_of(rounds, lambda: serialization.loads(raw, backend=backend))
+            for compact in (False, True):
+                encoded = serialization.dumps(data, compact=compact, backend=backend)
+                dump_time = best_of(
+                    rounds, lambda: serialization.dumps(data, compact=compact, backend=backend)
+                )
+                total = load_time + dump_time
+                if baseline is None:
+                    baseline = total
+                table.add_row(
+                    path.name,
+                    backend,
+                    "compact" if compact else "indent=2",
+                    f"{load_time:.3f}",
+                    f"{dump_time:.3f}",
+                    f"{len(encoded) / (1024 * 1024):.1f}",
+                    f"{baseline / total:.2f}x",
+                )
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
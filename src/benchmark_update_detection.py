@@ -0,0 +1,113 @@
+import argparse
+import io
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from rich.console import Console
+from rich.panel import Panel
+from rich.progress import BarColumn, Progress, SpinnerColumn, TaskProgressColumn, TextColumn
+from rich.table import Table
+
+from catalog_store import normalize_slug
+from slug_index import SlugIndex
+import update_detection
+
+console = Console()
+
+BRANDS = ("bmw", "mini", "land-rover", "toyota", "ford")
+CATEGORIES = ("wheels", "exhaust", "suspension", "aerodynamics", "interior")
+DEFAULT_SIZES = [5_000, 100_000, 1_000_000]
+
+
+def synthetic_sitemap(urls: int) -> Tuple[Dict[str, str], SlugIndex]:
+    """
+    A sitemap of `urls` URLs, each product listed under ~3 category URLs (some
+    with a ?c= query), and a slug index that is missing 10% of the products and
+    holds an older lastmod for a third of the rest.
+    """
+    products = max(urls // 3, 1)
+    sitemap: Dict[str, str] = {}
+    index = SlugIndex()
+    for position in range(urls):
+        product, listing = position % products, position // products
+        brand = BRANDS[product % len(BRANDS)]
+        category = CATEGORIES[listing % len(CATEGORIES)]
+        query = f"?c={listing}" if listing % 2 else ""
+        url = f"https://www.ac-schnitzer.de/en/{brand}/{category}/{product % 997}/ac-schnitzer-product-{product}/{query}"
+        lastmod = f"2026-{1 + product % 12:02d}-{1 + product % 28:02d}T08:{product % 60:02d}:00+02:00"
+        sitemap[url] = lastmod
+        if listing == 0 and product % 10:
+            index.add(url, lastmod if product % 3 else f"2025-{1 + product % 12:02d}-01T08:00:00+02:00")
+    return sitemap, index
+
+
+def loop_identify_updates(sitemap_urls: Dict[str, str], existing_index: SlugIndex) -> List[str]:
+    """run_updates.identify_updates as it was: a Python loop with a progress bar advanced per URL."""
+    updates = []
+    seen_normalized = set()
+    quiet = Console(file=io.StringIO())
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TaskProgressColumn(),
+        console=quiet,
+    ) as progress:
+        task = progress.add_task("[cyan]Checking for updates...", total=len(sitemap_urls))
+        for url, lastmod in sitemap_urls.items():
+            norm_url = normalize_slug(url)
+            if norm_url in seen_normalized:
+                progress.advance(task)
+                continue
+            if not existing_index.is_up_to_date(norm_url, lastmod):
+                updates.append(url)
+                seen_normalized.add(norm_url)
+            progress.advance(task)
+    return updates
+
+
+def best_of(rounds: int, func: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare the Python loop and the vectorized pandas update detection"
+    )
+    parser.add_argument("sizes", nargs="*", type=int, help="Sitemap sizes in URLs (default: 5000 100000 1000000)")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed rounds per case; the best round is reported")
+    args = parser.parse_args()
+
+    rounds = max(args.rounds, 1)
+    console.print(Panel(f"Synthetic sitemaps, best of {rounds} rounds", border_style="cyan"))
+
+    table = Table(title="Update detection")
+    table.add_column("URLs", justify="right", style="cyan")
+    table.add_column("Updates", justify="right")
+    table.add_column("Loop", justify="right")
+    table.add_column("Vectorized", justify="right")
+    table.add_column("Speedup", justify="right", style="green")
+    for size in args.sizes or DEFAULT_SIZES:
+        sitemap, index = synthetic_sitemap(size)
+        updates = update_detection.identify_updates(sitemap, index)
+        if updates != loop_identify_updates(sitemap, index):
+            raise SystemExit(f"loop and vectorized results disagree at {size} URLs")
+        loop_time = best_of(rounds, lambda: loop_identify_updates(sitemap, index))
+        vector_time = best_of(rounds, lambda: update_detection.identify_updates(sitemap, index))
+        table.add_row(
+            f"{size:,}",
+            f"{len(updates):,}",
+            f"{loop_time * 1000:.0f} ms",
+            f"{vector_time * 1000:.0f} ms",
+            f"{loop_time / vector_time:.1f}x",
+        )
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from catalog_snapshots import no_readers, reader_pin, snapshot_version
+from catalog_store import normalize_slug
+from product_schema import catalog_schema_version, set_removed
+import serialization
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SHARD_DIR = BASE_DIR / "data" / "catalog"
+MANIFEST_NAME = "manifest.json"
+# Brands with more products than this get one shard per first letter of the slug.
+BUCKET_THRESHOLD = 1000
+DEFAULT_WORKERS = 4
+SLUG_PREFIX = "ac-schnitzer-"
+
+# <brand>[.<bucket>][.<version>].json
+SHARD_FILE = re.compile(r"^[a-z0-9_-]+(\.[a-z_])?(\.\d{8}T\d{12})?\.json$")
+
+# (brand, bucket); bucket is None for a brand stored in a single shard.
+ShardKey = Tuple[str, Optional[str]]
+
+
+def bucket_for(url: str) -> str:
+    """
+    First letter of the product slug, '_' for anything else. Most slugs start
+    with "ac-schnitzer-", so the letter is taken after that prefix.
+    """
+    slug = normalize_slug(url).lower()
+    if slug.startswith(SLUG_PREFIX):
+        slug = slug[len(SLUG_PREFIX):]
+    first = slug[:1]
+    return first if "a" <= first <= "z" else "_"
+
+
+def shard_name(brand: str, bucket: Optional[str] = None) -> str:
+    name = re.sub(r"[^a-z0-9-]+", "_", brand.lower()) or "_"
+    return f"{name}.{bucket}" if bucket else name
+
+
+def is_shard_catalog(path: Path) -> bool:
+    """True for a shard directory or its manifest.json."""
+    path = Path(path)
+    return path.name == MANIFEST_NAME or (path.is_dir() and (path / MANIFEST_NAME).exists())
+
+
+class ShardedCatalog:
+    """
+    The catalog split into one product_details-shaped file per brand, or per
+    brand and first letter of the slug for brands above `bucket_threshold`
+    products, plus a manifest.json listing the shards in order.
+
+    Writes load only the shards they touch and write a new version of only those
+    whose products changed, then the manifest (both atomically). Shard files are
+    never overwritten, so a reader that pinned the catalog keeps a consistent
+    view; files the manifest no longer lists are pruned once no reader is active.
+    Reads load shards on a thread pool, up to `workers` ahead of the consumer,
+    in manifest order.
+    """
+
+    def __init__(
+        self,
+        root: Path = SHARD_DIR,
+        bucket_threshold: int = BUCKET_THRESHOLD,
+        workers: int = DEFAULT_WORKERS,
+    ) -> None:
+        root = Path(root)
+        self.root = root.parent if root.name == MANIFEST_NAME else root
+        self.bucket_threshold = bucket_threshold
+        self.workers = max(1, workers)
+        self._manifest: Optional[Dict[str, Any]] = None
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.root / MANIFEST_NAME
+
+    def exists(self) -> bool:
+        return self.manifest_path.exists()
+
+    def manifest(self) -> Dict[str, Any]:
+        if self._manifest is None:
+            if self.exists():
+                self._manifest = serialization.load(self.manifest_path)
+            else:
+                self._manifest = {"meta": {}, "shards": []}
+        return self._manifest
+
+    def _entries(self) -> Dict[ShardKey, Dict[str, Any]]:
+        return {(shard["brand"], shard["bucket"]): shard for shard in self.manifest()["shards"]}
+
+    def shards(self, brands: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Manifest entries, optionally only those of `brands` (case-insensitive)."""
+        wanted = {brand.lower() for brand in brands} if brands else None
+        return [
+            shard
+            for shard in self.manifest()["shards"]
+            if wanted is None or shard["brand"].lower() in wanted
+        ]
+
+    def count(self) -> int:
+        return sum(shard["products"] for shard in self.shards())
+
+    def _read(self, key: ShardKey, file: Optional[str]) -> Dict[str, Any]:
+        if file is None or not (self.root / file).exists():
+            return {}
+        return serialization.load(self.root / file).get("products", {}).get(key[0], {})
+
+    def _read_many(self, keys: List[ShardKey]) -> Iterator[Tuple[ShardKey, Dict[str, Any]]]:
+        """Yields (key, products) in the order of `keys`, reading up to `workers` shards ahead."""
+        if not keys:
+            return
+        files = {key: shard["file"] for key, shard in self._entries().items()}
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(keys))) as pool:
+            pending = []
+            for key in keys:
+                pending.append((key, pool.submit(self._read, key, files.get(key))))
+                if len(pending) > self.workers:
+                    done_key, future = pending.pop(0)
+                    yield done_key, future.result()
+            for done_key, future in pending:
+                yield done_key, future.result()
+
+    def iter_shards(
+        self, brands: Optional[Iterable[str]] = None
+    ) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Yields (manifest entry, {url: record}) per shard; memory holds at most
+        workers + 1 shards. The manifest is re-read under a reader pin, so the
+        whole iteration sees one version of the catalog even if a merge
+        publishes a new one meanwhile.
+        """
+        with reader_pin(self.root):
+            self._manifest = None
+            shards = self.shards(brands)
+            loaded = self._read_many([(shard["brand"], shard["bucket"]) for shard in shards])
+            for shard, (_, products) in zip(shards, loaded):
+                yield shard, products
+
+    def iter_products(
+        self, brands: Optional[Iterable[str]] = None
+    ) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """Yields (brand, url, record) in manifest order."""
+        for shard, products in self.iter_shards(brands):
+            for url, product in products.items():
+                yield shard["brand"], url, product
+
+    def iter_products_for(self, urls: Iterable[str]) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Yields (brand, url, record) of the given URLs that are in the catalog,
+        reading only the shards that can hold them (under a reader pin).
+        """
+        wanted = set(urls)
+        buckets = {bucket_for(url) for url in wanted}
+        with reader_pin(self.root):
+            self._manifest = None
+            keys = [key for key in self._entries() if key[1] is None or key[1] in buckets]
+            for (brand, _), items in self._read_many(keys):
+                for url in wanted.intersection(items):
+                    yield brand, url, items[url]
+
+    def products(self, brands: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        products: Dict[str, Dict[str, Any]] = {}
+        for shard, items in self.iter_shards(brands):
+            products.setdefault(shard["brand"], {}).update(items)
+        return products
+
+    def _key(self, brand: str, url: str, bucketed: bool) -> ShardKey:
+        return (brand, bucket_for(url)) if bucketed else (brand, None)
+
+    def upsert_products(
+        self, products: Dict[str, Dict[str, Any]], remove_urls: Iterable[str] = ()
+    ) -> List[str]:
+        """
+        Inserts or replaces {brand: {url: record}} and deletes `remove_urls` (e.g.
+        alias URLs of a merged product). Only the shards holding these URLs are
+        read, and only those that changed are written. Returns the shard names written.
+        """
+        entries = self._entries()
+        bucketed = {brand for brand, bucket in entries if bucket}
+        loaded: Dict[ShardKey, Dict[str, Any]] = {}
+        dirty: Set[ShardKey] = set()
+
+        def load(keys: List[ShardKey]) -> None:
+            missing = [key for key in dict.fromkeys(keys) if key not in loaded]
+            for key, items in self._read_many([key for key in missing if key in entries]):
+                loaded[key] = items
+            for key in missing:
+                loaded.setdefault(key, {})
+
+        remove_urls = list(remove_urls)
+        if remove_urls:
+            buckets = {bucket_for(url) for url in remove_urls}
+            load([key for key in entries if key[1] is None or key[1] in buckets])
+            for url in remove_urls:
+                for key, items in loaded.items():
+                    if key[1] in (None, bucket_for(url)) and items.pop(url, None) is not None:
+                        dirty.add(key)
+
+        load([
+            self._key(brand, url, brand in bucketed)
+            for brand, items in products.items()
+            for url in items
+        ])
+        for brand, items in products.items():
+            for url, product in items.items():
+                key = self._key(brand, url, brand in bucketed)
+                if loaded[key].get(url) != product:
+                    loaded[key][url] = product
+                    dirty.add(key)
+
+        return self._write(loaded, dirty)
+
+    def set_lastmod_by_slug(self, lastmod_by_slug: Dict[str, str]) -> List[str]:
+        """Sets `lastmod` on every product with a matching slug. Returns the shard names written."""
+        return self._set_lastmod(lambda url: lastmod_by_slug.get(normalize_slug(url)))
+
+    def set_lastmod_by_url(self, lastmod_by_url: Dict[str, str]) -> List[str]:
+        """Sets `lastmod` for products whose URL (without query string) is in the map."""
+        return self._set_lastmod(lambda url: lastmod_by_url.get(url.split("?")[0]))
+
+    def _set_lastmod(self, lastmod_for: Any) -> List[str]:
+        def update(url: str, product: Dict[str, Any]) -> bool:
+            lastmod = lastmod_for(url)
+            if lastmod is not None and product.get("lastmod") != lastmod:
+                product["lastmod"] = lastmod
+                return True
+            return False
+
+        return self._update_products(update)
+
+    def set_removed_by_slug(self, removed_at_by_slug: Dict[str, Optional[str]]) -> List[str]:
+        """
+        Tombstones (date) or restores (None) every product with a matching slug,
+        see product_schema.set_removed. Returns the shard names written.
+        """
+        def update(url: str, product: Dict[str, Any]) -> bool:
+            slug = normalize_slug(url)
+            return slug in removed_at_by_slug and set_removed(product, removed_at_by_slug[slug])
+
+        return self._update_products(update)
+
+    def _update_products(self, update: Callable[[str, Dict[str, Any]], bool]) -> List[str]:
+        """Applies `update(url, record)` to every product; rewrites the shards where it returned True."""
+        loaded: Dict[ShardKey, Dict[str, Any]] = {}
+        dirty: Set[ShardKey] = set()
+        for key, items in self._read_many(list(self._entries())):
+            for url, product in items.items():
+                if update(url, product):
+                    dirty.add(key)
+            # Unchanged shards are dropped right away, so memory holds only the dirty ones
+            if key in dirty:
+                loaded[key] = items
+        return self._write(loaded, dirty)
+
+    def _relayout(self, loaded: Dict[ShardKey, Dict[str, Any]], dirty: Set[ShardKey]) -> Set[ShardKey]:
+        """
+        Splits brands that grew past the bucket threshold into letter buckets, and
+        merges brands that shrank below it back into one shard. Returns the keys
+        that no longer exist.
+        """
+        entries = self._entries()
+        counts: Dict[str, int] = {}
+        for (brand, bucket), shard in entries.items():
+            counts[brand] = counts.get(brand, 0) + shard["products"]
+        for key in dirty:
+            counts[key[0]] = counts.get(key[0], 0) + len(loaded[key]) - entries.get(key, {}).get("products", 0)
+
+        obsolete: Set[ShardKey] = set()
+        for brand in {key[0] for key in dirty}:
+            keys = [key for key in entries if key[0] == brand]
+            was_bucketed = any(bucket for _, bucket in keys)
+            if (counts[brand] > self.bucket_threshold) == was_bucketed:
+                continue
+            for key, items in self._read_many([key for key in keys if key not in loaded]):
+                loaded[key] = items
+            merged: Dict[str, Any] = {}
+            for key in keys + [key for key in loaded if key[0] == brand and key not in keys]:
+                merged.update(loaded.pop(key, {}))
+                obsolete.add(key)
+            for url, product in merged.items():
+                key = self._key(brand, url, not was_bucketed)
+                loaded.setdefault(key, {})[url] = product
+                dirty.add(key)
+            dirty.difference_update(obsolete - set(loaded))
+            obsolete -= set(loaded)
+        return obsolete
+
+    def _write(self, loaded: Dict[ShardKey, Dict[str, Any]], dirty: Set[ShardKey]) -> List[str]:
+        if not dirty:
+            return []
+        # Brands keep their order (new ones go last, as in product_details.json), buckets are sorted
+        brand_order = {brand: position for position, brand in enumerate(dict.fromkeys(
+            [shard["brand"] for shard in self.manifest()["shards"]] + [key[0] for key in loaded]
+        ))}
+        obsolete = self._relayout(loaded, dirty)
+        emptied = {key for key in dirty if not loaded[key]}
+        obsolete |= emptied
+        dirty -= emptied
+        entries = self._entries()
+        # Shard files are never overwritten: each write adds new versions, which
+        # the new manifest points to, so pinned readers keep reading the old ones.
+        version = snapshot_version()
+
+        def write_shard(key: ShardKey) -> Dict[str, Any]:
+            brand, bucket = key
+            items = loaded[key]
+            name = shard_name(brand, bucket)
+            file = f"{name}.{version}.json"
+            data = {
+                "meta": {
+                    "brand": brand,
+                    "bucket": bucket,
+                    "total_products": len(items),
+                    "schema_version": catalog_schema_version({brand: items}),
+                },
+                "products": {brand: items},
+            }
+            size = serialization.dump(data, self.root / file, atomic=True)
+            return {
+                "name": name,
+                "brand": brand,
+                "bucket": bucket,
+                "file": file,
+                "products": len(items),
+                "bytes": size,
+                "schema_version": data["meta"]["schema_version"],
+            }
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        keys = [key for key in loaded if key in dirty]
+        if keys:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(keys))) as pool:
+                for key, entry in zip(keys, pool.map(write_shard, keys)):
+                    entries[key] = entry
+        for key in obsolete:
+            entries.pop(key, None)
+        self._write_manifest([
+            entries[key] for key in sorted(entries, key=lambda k: (brand_order[k[0]], k[1] or ""))
+        ])
+        self.prune()
+        return [shard_name(*key) for key in keys]
+
+    def prune(self) -> int:
+        """
+        Deletes shard files the manifest no longer lists. Skipped while a reader
+        holds a pin; the next write catches up. Returns the number of files deleted.
+        """
+        listed = {shard["file"] for shard in self.manifest()["shards"]}
+        with no_readers(self.root) as idle:
+            if not idle:
+                return 0
+            stale = [
+                path
+                for path in self.root.glob("*.json")
+                if SHARD_FILE.match(path.name) and path.name != MANIFEST_NAME and path.name not in listed
+            ]
+            for path in stale:
+                path.unlink(missing_ok=True)
+            return len(stale)
+
+    def _write_manifest(self, shards: List[Dict[str, Any]]) -> None:
+        brand_counts: Dict[str, int] = {}
+        for shard in shards:
+            brand_counts[shard["brand"]] = brand_counts.get(shard["brand"], 0) + shard["products"]
+        self._manifest = {
+            "meta": {
+                "generated_at": datetime.utcnow().isoformat(),
+                "total_products": sum(brand_counts.values()),
+                "brand_counts": brand_counts,
+                "schema_version": min((shard["schema_version"] for shard in shards), default=2),
+                "bucket_threshold": self.bucket_threshold,
+            },
+            "shards": shards,
+        }
+        serialization.dump(self._manifest, self.manifest_path, atomic=True)
+
+    def import_json(self, json_path: Path) -> List[str]:
+        """Upserts every product of a product_details.json. Returns the shard names written."""
+        return self.upsert_products(serialization.load(json_path).get("products", {}))
+
+    def export_json(self, json_path: Path) -> int:
+        """Writes the catalog as a single product_details.json (atomically). Returns the product count."""
+        products = self.products()
+        brand_counts = {brand: len(items) for brand, items in products.items()}
+        output = {
+            "meta": {
+                "generated_at": datetime.utcnow().isoformat(),
+                "total_products": sum(brand_counts.values()),
+                "brand_counts": brand_counts,
+                "schema_version": catalog_schema_version(products),
+            },
+            "products": products,
+        }
+        serialization.dump(output, json_path, atomic=True)
+        return output["meta"]["total_products"]
+
+
+def open_shards(root: Path = SHARD_DIR, legacy_json: Optional[Path] = None) -> ShardedCatalog:
+    """Opens the shard catalog, importing `legacy_json` the first time if there is no manifest yet."""
+    catalog = ShardedCatalog(root)
+    if not catalog.exists() and legacy_json is not None and legacy_json.exists():
+        catalog.import_json(legacy_json)
+    return catalog
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import or export the sharded product catalog")
+    parser.add_argument("--root", type=Path, default=SHARD_DIR, help="Shard directory (default: data/catalog)")
+    parser.add_argument("--import-json", type=Path, help="Upsert every product from a product_details.json")
+    parser.add_argument("--export-json", type=Path, help="Write the catalog as a single product_details.json")
+    parser.add_argument(
+        "--bucket-threshold",
+        type=int,
+        default=BUCKET_THRESHOLD,
+        help=f"Split brands with more products than this by first letter (default: {BUCKET_THRESHOLD})",
+    )
+    args = parser.parse_args()
+
+    catalog = ShardedCatalog(args.root, bucket_threshold=args.bucket_threshold)
+    if args.import_json:
+        written = catalog.import_json(args.import_json)
+        print(f"Imported {args.import_json} into {args.root} ({len(written)} shards written)")
+    if args.export_json:
+        total = catalog.export_json(args.export_json)
+        print(f"Exported {total} products to {args.export_json}")
+    print(f"{args.root} holds {catalog.count()} products in {len(catalog.shards())} shards")
+
+
+if __name__ == "__main__":
+    main()
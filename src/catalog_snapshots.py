@@ -0,0 +1,151 @@
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, List, Optional
+
+import serialization
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+SNAPSHOT_DIR_NAME = "snapshots"
+READERS_LOCK = ".readers.lock"
+# Snapshots kept besides the current one, for readers that pinned an older version.
+KEEP_SNAPSHOTS = 2
+
+
+def snapshot_version() -> str:
+    """Sortable UTC timestamp used to name a new snapshot."""
+    return datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+
+
+def fsync_dir(directory: Path) -> None:
+    """Makes renames inside `directory` durable; a no-op where directories cannot be opened."""
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def reader_pin(directory: Path) -> Iterator[None]:
+    """
+    Holds a shared lock on `directory` while a reader uses its snapshots.
+    Writers never wait for it: they only skip pruning while a reader holds it.
+    """
+    if fcntl is None or not directory.is_dir():
+        yield
+        return
+    with open(directory / READERS_LOCK, "a+b") as fp:
+        fcntl.flock(fp.fileno(), fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def no_readers(directory: Path) -> Iterator[bool]:
+    """Yields True if no reader holds a pin on `directory` (and keeps them out meanwhile)."""
+    if fcntl is None:
+        yield True
+        return
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / READERS_LOCK, "a+b") as fp:
+        try:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+def snapshot_dir(path: Path) -> Path:
+    """data/product_details.json -> data/snapshots/"""
+    return path.parent / SNAPSHOT_DIR_NAME
+
+
+def snapshots(path: Path) -> List[Path]:
+    """Every snapshot of `path`, oldest first."""
+    directory = snapshot_dir(path)
+    if not directory.exists():
+        return []
+    return sorted(directory.glob(f"{path.stem}.*{path.suffix}"))
+
+
+def point_to(pointer: Path, target: Path) -> None:
+    """Atomically makes `pointer` a relative symlink to `target`."""
+    tmp = pointer.with_name(f".{pointer.name}.tmp")
+    tmp.unlink(missing_ok=True)
+    os.symlink(os.path.relpath(target, pointer.parent), tmp)
+    os.replace(tmp, pointer)
+    fsync_dir(pointer.parent)
+
+
+def write_snapshot(obj: Any, path: Path, compact: Optional[bool] = None) -> Path:
+    """
+    Publishes `obj` as a new, immutable version of `path` and returns it.
+
+    The version is written to data/snapshots/<stem>.<version>.json (temp file,
+    fsync, rename), then `path` itself, the `current` pointer, is swapped to a
+    symlink to it in one rename. A reader that opened `path` before keeps the
+    version it opened. Old versions are pruned only while no reader holds a pin.
+    Where symlinks are not available, `path` is replaced atomically instead.
+    """
+    path = Path(path)
+    directory = snapshot_dir(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    snapshot = directory / f"{path.stem}.{snapshot_version()}{path.suffix}"
+    serialization.dump(obj, snapshot, compact=compact, atomic=True)
+    fsync_dir(directory)
+    try:
+        point_to(path, snapshot)
+    except OSError:
+        serialization.dump(obj, path, compact=compact, atomic=True)
+        snapshot.unlink(missing_ok=True)
+        return path
+    prune_snapshots(path)
+    return snapshot
+
+
+def prune_snapshots(path: Path, keep: int = KEEP_SNAPSHOTS) -> int:
+    """Deletes all but the current and `keep` newest older snapshots, unless a reader is active."""
+    current = current_snapshot(path).resolve()
+    with no_readers(snapshot_dir(path)) as idle:
+        if not idle:
+            return 0
+        older = [snapshot for snapshot in snapshots(path) if snapshot.resolve() != current]
+        stale = older[: max(len(older) - keep, 0)]
+        for snapshot in stale:
+            snapshot.unlink(missing_ok=True)
+        return len(stale)
+
+
+def current_snapshot(path: Path) -> Path:
+    """The file `path` currently points to (`path` itself if it is a plain file)."""
+    path = Path(path)
+    return path.resolve() if path.is_symlink() else path
+
+
+@contextmanager
+def pin_snapshot(path: Path) -> Iterator[Path]:
+    """
+    Resolves the current version of `path` once and keeps it from being pruned
+    until the block exits, so a long export reads one consistent snapshot while
+    the updater goes on publishing new ones.
+    """
+    path = Path(path)
+    with reader_pin(snapshot_dir(path)):
+        yield current_snapshot(path)
@@ -0,0 +1,306 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from catalog_snapshots import write_snapshot
+from content_fingerprint import Fingerprint, record_fingerprint
+from product_schema import catalog_schema_version, compact_record, set_removed
+import serialization
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CATALOG_DB = BASE_DIR / "data" / "catalog.sqlite3"
+BACKEND_ENV = "CATALOG_BACKEND"
+BACKENDS = ("json", "sqlite", "shards")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    url         TEXT PRIMARY KEY,
+    brand       TEXT NOT NULL,
+    slug        TEXT NOT NULL,
+    sku         TEXT,
+    lastmod     TEXT,
+    fingerprint TEXT NOT NULL,
+    data        TEXT NOT NULL,
+    updated_at  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_products_slug ON products (slug);
+CREATE INDEX IF NOT EXISTS idx_products_brand ON products (brand);
+CREATE INDEX IF NOT EXISTS idx_products_lastmod ON products (lastmod);
+CREATE INDEX IF NOT EXISTS idx_products_sku ON products (sku);
+"""
+
+UPSERT = """
+INSERT INTO products (url, brand, slug, sku, lastmod, fingerprint, data, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (url) DO UPDATE SET
+    brand = excluded.brand,
+    slug = excluded.slug,
+    sku = excluded.sku,
+    lastmod = COALESCE(excluded.lastmod, products.lastmod),
+    fingerprint = excluded.fingerprint,
+    data = excluded.data,
+    updated_at = excluded.updated_at
+WHERE products.fingerprint IS NOT excluded.fingerprint
+   OR products.brand IS NOT excluded.brand
+   OR (excluded.lastmod IS NOT NULL AND products.lastmod IS NOT excluded.lastmod)
+"""
+
+
+def catalog_backend() -> str:
+    """'json' (default), 'sqlite' or 'shards', from the CATALOG_BACKEND environment variable."""
+    backend = os.environ.get(BACKEND_ENV, "json").strip().lower() or "json"
+    if backend not in BACKENDS:
+        raise ValueError(f"{BACKEND_ENV} must be one of {', '.join(BACKENDS)}, not {backend!r}")
+    return backend
+
+
+def normalize_slug(url: str) -> str:
+    """.../371/slug/?c=123 -> slug, so the same product under different IDs matches."""
+    return url.split("?")[0].rstrip("/").split("/")[-1]
+
+
+class CatalogStore:
+    """
+    SQLite catalog with one row per product URL.
+
+    Records are stored compact (see product_schema) with `lastmod` kept in its own
+    column, so sitemap dates can be updated without rewriting the JSON. The
+    database runs in WAL mode: readers never block, and every write goes through
+    write(), which takes the write lock up front (BEGIN IMMEDIATE) so there is a
+    single writer at a time.
+    """
+
+    def __init__(self, path: Path = CATALOG_DB, timeout: float = 30.0) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=timeout, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "CatalogStore":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+
+    @staticmethod
+    def _row(brand: str, url: str, product: Dict[str, Any], now: str) -> Tuple[Any, ...]:
+        record = compact_record(product)
+        lastmod = record.pop("lastmod", None)
+        return (
+            url,
+            brand,
+            normalize_slug(url),
+            record.get("sku") or record.get("part_number"),
+            lastmod,
+            record_fingerprint(record),
+            serialization.dumps(record, compact=True).decode("utf-8"),
+            now,
+        )
+
+    def upsert_products(self, products: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Inserts or updates {brand: {url: record}}. Rows whose record fingerprint,
+        brand and lastmod are unchanged are left untouched. Returns rows written.
+        """
+        now = datetime.utcnow().isoformat()
+        rows = [
+            self._row(brand, url, product, now)
+            for brand, items in products.items()
+            for url, product in items.items()
+        ]
+        with self.write() as conn:
+            before = conn.total_changes
+            conn.executemany(UPSERT, rows)
+            return conn.total_changes - before
+
+    def remove_aliases(self, urls: Iterable[str]) -> int:
+        """Deletes the other rows of each product (same slug, different URL). Returns rows deleted."""
+        with self.write() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "DELETE FROM products WHERE slug = ? AND url != ?",
+                [(normalize_slug(url), url) for url in urls],
+            )
+            return conn.total_changes - before
+
+    def set_lastmod_by_slug(self, lastmod_by_slug: Dict[str, str]) -> int:
+        """Sets `lastmod` on every product with a matching slug. Returns rows changed."""
+        now = datetime.utcnow().isoformat()
+        with self.write() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "UPDATE products SET lastmod = ?, updated_at = ? WHERE slug = ? AND lastmod IS NOT ?",
+                [(lastmod, now, slug, lastmod) for slug, lastmod in lastmod_by_slug.items()],
+            )
+            return conn.total_changes - before
+
+    def set_lastmod_by_url(self, lastmod_by_url: Dict[str, str]) -> int:
+        """Sets `lastmod` for products whose URL (without query string) is in the map."""
+        now = datetime.utcnow().isoformat()
+        with self.write() as conn:
+            updates = []
+            for (url,) in conn.execute("SELECT url FROM products"):
+                lastmod = lastmod_by_url.get(url.split("?")[0])
+                if lastmod is not None:
+                    updates.append((lastmod, now, url, lastmod))
+            before = conn.total_changes
+            conn.executemany(
+                "UPDATE products SET lastmod = ?, updated_at = ? WHERE url = ? AND lastmod IS NOT ?",
+                updates,
+            )
+            return conn.total_changes - before
+
+    def set_removed_by_slug(self, removed_at_by_slug: Dict[str, Optional[str]]) -> int:
+        """
+        Tombstones (date) or restores (None) every product with a matching slug,
+        see product_schema.set_removed. Returns rows changed.
+        """
+        now = datetime.utcnow().isoformat()
+        with self.write() as conn:
+            updates = []
+            for slug, removed_at in removed_at_by_slug.items():
+                for url, data in conn.execute("SELECT url, data FROM products WHERE slug = ?", (slug,)).fetchall():
+                    record = serialization.loads(data)
+                    if set_removed(record, removed_at):
+                        updates.append((
+                            record_fingerprint(record),
+                            serialization.dumps(record, compact=True).decode("utf-8"),
+                            now,
+                            url,
+                        ))
+            conn.executemany(
+                "UPDATE products SET fingerprint = ?, data = ?, updated_at = ? WHERE url = ?", updates
+            )
+            return len(updates)
+
+    def lastmod_by_slug(self) -> Dict[str, List[Tuple[str, Optional[str]]]]:
+        """{slug: [(url, lastmod), ...]} straight from the indexed columns."""
+        index: Dict[str, List[Tuple[str, Optional[str]]]] = {}
+        for slug, url, lastmod in self._conn.execute(
+            "SELECT slug, url, lastmod FROM products ORDER BY slug"
+        ):
+            index.setdefault(slug, []).append((url, lastmod))
+        return index
+
+    def baseline(self, urls: Iterable[str]) -> Dict[str, Fingerprint]:
+        """
+        {url: Fingerprint} of the given URLs that are in the catalog, for the
+        scraper: the record fingerprint comes from its column, so no record is parsed.
+        """
+        urls = list(urls)
+        baseline: Dict[str, Fingerprint] = {}
+        for start in range(0, len(urls), 500):
+            chunk = urls[start:start + 500]
+            rows = self._conn.execute(
+                "SELECT url, json_extract(data, '$.meta.content_hash'), fingerprint FROM products"
+                f" WHERE url IN ({', '.join('?' for _ in chunk)})",
+                chunk,
+            )
+            for url, content_hash, fingerprint in rows:
+                baseline[url] = Fingerprint(content_hash, fingerprint)
+        return baseline
+
+    def iter_products(
+        self, brands: Optional[Iterable[str]] = None
+    ) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """Yields (brand, url, record) in insertion order, with `lastmod` restored."""
+        query = "SELECT brand, url, lastmod, data FROM products"
+        params: List[str] = []
+        if brands:
+            params = [brand.lower() for brand in brands]
+            query += f" WHERE lower(brand) IN ({', '.join('?' for _ in params)})"
+        for brand, url, lastmod, data in self._conn.execute(query + " ORDER BY rowid", params):
+            record = serialization.loads(data)
+            if lastmod is not None:
+                record["lastmod"] = lastmod
+            yield brand, url, record
+
+    def products(self, brands: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        products: Dict[str, Dict[str, Any]] = {}
+        for brand, url, record in self.iter_products(brands):
+            products.setdefault(brand, {})[url] = record
+        return products
+
+    def import_json(self, json_path: Path) -> int:
+        data = serialization.load(json_path)
+        return self.upsert_products(data.get("products", {}))
+
+    def export_json(self, json_path: Path) -> int:
+        """Publishes the catalog as a new snapshot of a legacy product_details.json. Returns the product count."""
+        products = self.products()
+        brand_counts = {brand: len(items) for brand, items in products.items()}
+        output = {
+            "meta": {
+                "generated_at": datetime.utcnow().isoformat(),
+                "total_products": sum(brand_counts.values()),
+                "brand_counts": brand_counts,
+                "schema_version": catalog_schema_version(products),
+            },
+            "products": products,
+        }
+        write_snapshot(output, json_path)
+        return output["meta"]["total_products"]
+
+    def last_write(self) -> Optional[str]:
+        return self._conn.execute("SELECT MAX(updated_at) FROM products").fetchone()[0]
+
+    def export_if_stale(self, json_path: Path) -> Optional[int]:
+        """Re-exports the legacy JSON only if rows were written after it was last saved."""
+        last_write = self.last_write()
+        if json_path.exists() and last_write is not None:
+            exported_at = datetime.utcfromtimestamp(json_path.stat().st_mtime).isoformat()
+            if last_write <= exported_at:
+                return None
+        return self.export_json(json_path)
+
+
+def open_catalog(db_path: Path = CATALOG_DB, legacy_json: Optional[Path] = None) -> CatalogStore:
+    """Opens the store, importing `legacy_json` the first time if the database is empty."""
+    store = CatalogStore(db_path)
+    if store.count() == 0 and legacy_json is not None and legacy_json.exists():
+        store.import_json(legacy_json)
+    return store
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import or export the SQLite product catalog")
+    parser.add_argument("--db", type=Path, default=CATALOG_DB, help="Catalog database (default: data/catalog.sqlite3)")
+    parser.add_argument("--import-json", type=Path, help="Upsert every product from a product_details.json")
+    parser.add_argument("--export-json", type=Path, help="Write the catalog as a legacy product_details.json")
+    args = parser.parse_args()
+
+    with CatalogStore(args.db) as store:
+        if args.import_json:
+            written = store.import_json(args.import_json)
+            print(f"Imported {args.import_json} into {args.db} ({written} rows changed)")
+        if args.export_json:
+            total = store.export_json(args.export_json)
+            print(f"Exported {total} products to {args.export_json}")
+        print(f"{args.db} holds {store.count()} products")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+from json_stream import iter_catalog
+from product_schema import compact_record, is_compact
+import serialization
+
+# Parts of a record that change on every scrape without the product changing.
+VOLATILE_FIELDS = ("lastmod",)
+VOLATILE_META_FIELDS = ("scraped_at", "content_hash", "fingerprint")
+
+
+class Fingerprint(NamedTuple):
+    content_hash: Optional[str]
+    record: str
+
+
+def page_hash(body: bytes) -> str:
+    """Hash of the raw page; equal hashes mean the page does not need parsing again."""
+    return hashlib.sha256(body).hexdigest()
+
+
+def record_fingerprint(product: Dict[str, Any]) -> str:
+    """
+    Stable hash of everything we export from a product record. Scrape timestamps,
+    sitemap lastmod and the fingerprints themselves are left out, so a page whose
+    markup changed without changing the product still gets the same fingerprint.
+    Legacy and compact records of the same product hash the same.
+    """
+    stable = {
+        key: value for key, value in compact_record(product).items() if key not in VOLATILE_FIELDS
+    }
+    meta = stable.get("meta")
+    if isinstance(meta, dict):
+        stable["meta"] = {
+            key: value for key, value in meta.items() if key not in VOLATILE_META_FIELDS
+        }
+    # Always stdlib json: the fingerprint must not change with the installed serializer.
+    canonical = json.dumps(stable, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def stamp_fingerprint(product: Dict[str, Any], content_hash: Optional[str]) -> str:
+    """Records the page hash and record fingerprint in the product's meta."""
+    fingerprint = record_fingerprint(product)
+    meta = product.setdefault("meta", {})
+    if content_hash is not None:
+        meta["content_hash"] = content_hash
+    meta["fingerprint"] = fingerprint
+    return fingerprint
+
+
+def load_baseline(json_path: Path, urls: Optional[Iterable[str]] = None) -> Dict[str, Fingerprint]:
+    """
+    Loads {url: Fingerprint} from an existing product_details.json, or from the
+    shards of a shard catalog manifest. Legacy records, and records saved before
+    fingerprints existed, get their record fingerprint computed here. `urls`
+    limits the baseline to these products: only the shards that can hold them
+    are read, and the JSON is streamed without keeping the other records.
+    """
+    # Imported here: catalog_shards imports catalog_store, which imports this module
+    from catalog_shards import ShardedCatalog, is_shard_catalog
+
+    if not json_path.exists():
+        return {}
+    wanted = set(urls) if urls is not None else None
+    if is_shard_catalog(json_path):
+        catalog = ShardedCatalog(json_path)
+        products = catalog.iter_products() if wanted is None else catalog.iter_products_for(wanted)
+    elif wanted is not None:
+        products = ((brand, url, product) for brand, url, product in iter_catalog(json_path) if url in wanted)
+    else:
+        data = serialization.load(json_path)
+        products = (
+            (brand, url, product)
+            for brand, items in data.get("products", {}).items()
+            for url, product in items.items()
+        )
+    baseline: Dict[str, Fingerprint] = {}
+    for _, url, product in products:
+        meta = product.get("meta") or {}
+        baseline[url] = Fingerprint(
+            meta.get("content_hash"),
+            (is_compact(product) and meta.get("fingerprint")) or record_fingerprint(product),
+        )
+    return baseline
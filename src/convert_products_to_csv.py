@@ -3,10 +3,31 @@ import csv
 import json
 import re
 import itertools
+import os
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from html import unescape
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+from catalog_shards import ShardedCatalog, is_shard_catalog
+from catalog_snapshots import pin_snapshot
+from catalog_store import CatalogStore
+from json_stream import iter_catalog
+from product_model import (
+    Availability,
+    Document,
+    GalleryImage,
+    Images,
+    InfoSection,
+    Price,
+    ProductRecord,
+    Variation,
+    as_record,
+)
+from product_schema import expand_products, is_removed
+import serialization
+
+CATALOG_SUFFIXES = {".sqlite3", ".sqlite", ".db"}
 
 try:
     from bs4 import BeautifulSoup  # type: ignore
@@ -82,6 +103,11 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--brand", nargs="*", help="Optional list of brands to include")
     parser.add_argument("--batch", type=int, default=0, help="Maximum number of rows per CSV file (0 for no limit)")
     parser.add_argument("--price-formula", type=str, help="Formula to adjust price (use 'x' for price, e.g. 'x * 1.2')", default="")
+    parser.add_argument(
+        "--in-memory",
+        action="store_true",
+        help="Load the whole catalog before converting instead of streaming it product by product",
+    )
     return parser.parse_args()
 
 
@@ -91,15 +117,21 @@ def load_products(path: Path) -> Dict[str, Dict[str, Any]]:
         if not path.exists():
             raise FileNotFoundError(f"Product file not found: {path.absolute()}")
         
-        with path.open("r", encoding="utf-8") as fp:
-            payload = json.load(fp)
+        if path.suffix in CATALOG_SUFFIXES:
+            with CatalogStore(path) as store:
+                payload = {"products": store.products()}
+        elif is_shard_catalog(path):
+            payload = {"products": ShardedCatalog(path).products()}
+        else:
+            payload = serialization.load(path)
         
         products = payload.get("products")
         if not isinstance(products, dict):
             raise ValueError("Invalid JSON structure: missing 'products' mapping")
         
         print(f"Successfully loaded {sum(len(items) for items in products.values())} products")
-        return products
+        # Compact (schema version 2) records are expanded to the shape build_row expects.
+        return expand_products(products)
     except FileNotFoundError as e:
         print(f"ERROR: {e}")
         raise
@@ -198,8 +230,8 @@ def html_to_plain(html: Optional[str]) -> str:
     return "\n".join(lines)
 
 
-def format_categories(product: Dict[str, Any]) -> str:
-    raw_path = product.get("category_path") or []
+def category_hierarchy(raw_path: Any, brand_value: Optional[str]) -> List[str]:
+    """["BMW", "X5"] -> ["BMW", "BMW > X5"], with the brand prepended when missing."""
     if isinstance(raw_path, list):
         categories = [str(item).strip() for item in raw_path if str(item).strip()]
     else:
@@ -215,7 +247,6 @@ def format_categories(product: Dict[str, Any]) -> str:
             corrected_categories.append(category)
     categories = corrected_categories
     
-    brand_value = product.get("brand")
     if brand_value:
         brand_title = str(brand_value).strip().title()
         if brand_title.lower() == "accessoires":
@@ -224,7 +255,7 @@ def format_categories(product: Dict[str, Any]) -> str:
         if brand_title and brand_title.lower() not in {item.lower() for item in categories}:
             categories.insert(0, brand_title)
     if not categories:
-        return ""
+        return []
     # Remove consecutive duplicates
     deduped_categories: List[str] = []
     for category in categories:
@@ -236,21 +267,36 @@ def format_categories(product: Dict[str, Any]) -> str:
     for category in deduped_categories:
         current.append(category)
         hierarchical.append(" > ".join(current))
+    return hierarchical
+
+
+def format_categories(product: ProductRecord) -> str:
+    """
+    Hierarchical categories of the product's own path. A product linked from
+    several categories gets the merged categories of all of its paths; only its
+    own path gets the brand prepended, the others carry their brand in the URL.
+    """
+    hierarchical = category_hierarchy(product.category_path or [], product.brand)
+    if isinstance(product.category_paths, list):
+        seen = {category.lower() for category in hierarchical}
+        for path in product.category_paths:
+            for category in category_hierarchy(path, None):
+                if category.lower() not in seen:
+                    seen.add(category.lower())
+                    hierarchical.append(category)
     return ", ".join(hierarchical)
 
 
-def build_images_field(product: Dict[str, Any]) -> str:
+def build_images_field(product: ProductRecord) -> str:
     urls: List[str] = []
-    image_urls = product.get("image_urls") or []
-    if isinstance(image_urls, list):
-        urls.extend([u for u in image_urls if u])
-    gallery = product.get("images", {}).get("gallery") if isinstance(product.get("images"), dict) else []
+    urls.extend([u for u in product.image_urls() if u])
+    gallery = product.images.gallery if isinstance(product.images, Images) else []
     if isinstance(gallery, list):
         for entry in gallery:
-            if not isinstance(entry, dict):
+            if not isinstance(entry, GalleryImage):
                 continue
             for key in ("primary", "original", "large", "small", "src"):
-                candidate = entry.get(key)
+                candidate = getattr(entry, key)
                 if candidate:
                     urls.append(candidate)
                     break
@@ -262,14 +308,16 @@ def build_images_field(product: Dict[str, Any]) -> str:
     return ", ".join(deduped)
 
 
-def pick_sku(product: Dict[str, Any]) -> str:
-    return coalesce(product.get("sku"), product.get("part_number"), product.get("product_id"))
+def pick_sku(product: ProductRecord) -> str:
+    return coalesce(product.sku, product.part_number, product.product_id)
 
 
-def stock_flag(product: Dict[str, Any]) -> str:
-    availability = product.get("availability") or {}
-    status = str(availability.get("status") or "").lower()
-    classes = [str(item).lower() for item in availability.get("classes") or []]
+def stock_flag(product: ProductRecord) -> str:
+    availability = product.availability
+    if not isinstance(availability, Availability):
+        availability = Availability()
+    status = str(availability.status or "").lower()
+    classes = [str(item).lower() for item in availability.classes or []]
     indicators = {status, *classes}
     return bool_flag(any(token in {"available", "instock", "in-stock"} for token in indicators))
 
@@ -291,7 +339,7 @@ def clean_description_html(html_content: str) -> str:
     return cleaned.strip()
 
 
-def get_product_info_descriptions(product: Dict[str, Any]) -> Tuple[str, str]:
+def get_product_info_descriptions(product: ProductRecord) -> Tuple[str, str]:
     """
     Returns (short_description, long_description) based on product_information entries.
     Logic:
@@ -303,44 +351,45 @@ def get_product_info_descriptions(product: Dict[str, Any]) -> Tuple[str, str]:
     - If only Overview: Short = "", Long = Overview.
     - If neither: Both empty.
     """
-    info = product.get("product_information") or []
+    info = product.product_information or []
     if not isinstance(info, list):
         info = []
         
-    overview_entry = next((item for item in info if isinstance(item, dict) and item.get("title", "").strip().lower() == "overview"), None)
-    description_entry = next((item for item in info if isinstance(item, dict) and item.get("title", "").strip().lower() == "description"), None)
+    overview_entry = next((item for item in info if isinstance(item, InfoSection) and (item.title or "").strip().lower() == "overview"), None)
+    description_entry = next((item for item in info if isinstance(item, InfoSection) and (item.title or "").strip().lower() == "description"), None)
 
-    has_overview = overview_entry and overview_entry.get("text", "").strip()
-    has_description = description_entry and description_entry.get("text", "").strip()
+    has_overview = overview_entry and (overview_entry.text or "").strip()
+    has_description = description_entry and (description_entry.text or "").strip()
 
     short_desc_html = ""
     long_desc_html = ""
 
     if has_overview and has_description:
-        short_desc_html = overview_entry.get("html", "")
-        long_desc_html = description_entry.get("html", "")
+        short_desc_html = overview_entry.html or ""
+        long_desc_html = description_entry.html or ""
     elif has_description:
-        long_desc_html = description_entry.get("html", "")
+        long_desc_html = description_entry.html or ""
     elif has_overview:
-        long_desc_html = overview_entry.get("html", "")
+        long_desc_html = overview_entry.html or ""
         
     return clean_description_html(short_desc_html), clean_description_html(long_desc_html)
 
 
-def download_fields(product: Dict[str, Any]) -> Dict[str, str]:
-    documents = product.get("documents") or []
+def download_fields(product: ProductRecord) -> Dict[str, str]:
+    documents = product.documents or []
     downloads: Dict[str, str] = {}
     if isinstance(documents, list):
-        limited = [doc for doc in documents if isinstance(doc, dict) and doc.get("url")][:2]
+        limited = [doc for doc in documents if isinstance(doc, Document) and doc.url][:2]
         for idx, doc in enumerate(limited, start=1):
             name_key = f"Download {idx} name"
             url_key = f"Download {idx} URL"
-            downloads[name_key] = doc.get("label") or doc.get("url") or ""
-            downloads[url_key] = doc.get("url") or ""
+            downloads[name_key] = doc.label or doc.url or ""
+            downloads[url_key] = doc.url or ""
     return downloads
 
 
-def build_row(product: Dict[str, Any], price_formula: str = "") -> List[Dict[str, str]]:
+def build_row(product: Union[ProductRecord, Dict[str, Any]], price_formula: str = "") -> List[Dict[str, str]]:
+    product = as_record(product)
     rows: List[Dict[str, str]] = []
     
     # --- Parent Product Row ---
@@ -348,7 +397,7 @@ def build_row(product: Dict[str, Any], price_formula: str = "") -> List[Dict[str
     parent_row["Type"] = "simple"  # Will change to 'variable' if variations exist
     sku = pick_sku(product)
     parent_row["SKU"] = sku
-    parent_row["Name"] = coalesce(product.get("title"))
+    parent_row["Name"] = coalesce(product.title)
     parent_row["Published"] = "1"
     parent_row["Is featured?"] = "0"
     parent_row["Visibility in catalog"] = "visible"
@@ -365,7 +414,7 @@ def build_row(product: Dict[str, Any], price_formula: str = "") -> List[Dict[str
     parent_row["Allow customer reviews?"] = "1"
     
     # Price handling with formula
-    raw_price = normalize_price(coalesce(product.get("price", {}).get("amount")))
+    raw_price = normalize_price(coalesce(product.price.amount if isinstance(product.price, Price) else None))
     if price_formula:
         parent_row["Regular price"] = apply_price_formula(raw_price, price_formula)
     else:
@@ -376,7 +425,7 @@ def build_row(product: Dict[str, Any], price_formula: str = "") -> List[Dict[str
     parent_row["Meta: _wpcom_is_markdown"] = "0"
     parent_row.update(download_fields(product))
     
-    variations = product.get("variations", [])
+    variations = product.variations
     
     if not variations or not isinstance(variations, list):
         rows.append(parent_row)
@@ -393,11 +442,11 @@ def build_row(product: Dict[str, Any], price_formula: str = "") -> List[Dict[str
     valid_variations = variations[:4]
     
     for idx, variation in enumerate(valid_variations, start=1):
-        if not isinstance(variation, dict):
+        if not isinstance(variation, Variation):
             continue
         
-        var_name = variation.get("name", "")
-        var_options = variation.get("options", [])
+        var_name = variation.name
+        var_options = variation.options
         
         if var_name and var_options:
             attr_names.append(var_name)
@@ -450,25 +499,194 @@ def filter_products(products: Dict[str, Dict[str, Any]], brands: Optional[List[s
         if brands_lower and brand.lower() not in brands_lower:
             continue
         for product in items.values():
-            if isinstance(product, dict):
+            if isinstance(product, dict) and not is_removed(product):
                 collected.append(product)
     return collected
 
 
+def iter_products(path: Path, brands: Optional[List[str]]) -> Iterator[ProductRecord]:
+    """
+    Streams products one at a time from a product_details.json (incremental parse),
+    a catalog database or a shard catalog (shards read ahead in parallel). Records
+    are not expanded: build_row only needs the image URLs, which ProductRecord
+    derives itself. Tombstoned products (no longer in the sitemap) are skipped.
+    """
+    print(f"Streaming products from: {path.absolute()}")
+    if not path.exists():
+        raise FileNotFoundError(f"Product file not found: {path.absolute()}")
+    if path.suffix in CATALOG_SUFFIXES:
+        with CatalogStore(path) as store:
+            for _, _, product in store.iter_products(brands):
+                if not is_removed(product):
+                    yield ProductRecord.from_dict(product)
+        return
+    if is_shard_catalog(path):
+        for _, _, product in ShardedCatalog(path).iter_products(brands):
+            if not is_removed(product):
+                yield ProductRecord.from_dict(product)
+        return
+    brands_lower = {brand.lower() for brand in brands} if brands else None
+    for _, _, product in iter_catalog(path, brands_lower):
+        if isinstance(product, dict) and not is_removed(product):
+            yield ProductRecord.from_dict(product)
+
+
+def partial_path(path: Path) -> Path:
+    """Temp file a CSV is written to before publish_file renames it into place."""
+    return path.with_name(f".{path.name}.tmp")
+
+
+def publish_file(fp: TextIO, path: Path) -> None:
+    """
+    Flushes, fsyncs and closes `fp` (opened on partial_path(path)), then renames
+    it over `path`, so the download API never serves a half-written CSV.
+    """
+    fp.flush()
+    os.fsync(fp.fileno())
+    fp.close()
+    os.replace(partial_path(path), path)
+
+
+def discard_file(fp: TextIO, path: Path) -> None:
+    """Closes `fp` (opened on partial_path(path)) and deletes it, leaving `path` as it was."""
+    fp.close()
+    partial_path(path).unlink(missing_ok=True)
+
+
+class BatchedCsvWriter:
+    """
+    Writes rows as they are produced, starting a new numbered file once `batch`
+    rows are written and the last row is a simple product (so a variable product
+    is never split from its variations). With batch=0 everything goes to `output`.
+    """
+
+    def __init__(self, output: Path, batch: int = 0) -> None:
+        self.output = output
+        self.batch = batch
+        self.batch_index = 1
+        self.total_rows = 0
+        self._fp: Optional[TextIO] = None
+        self._writer: Optional[csv.DictWriter] = None
+        self._path = output
+        self._rows = 0
+
+    def _open(self) -> None:
+        if self.batch > 0:
+            self._path = self.output.parent / f"{self.output.stem}_{self.batch_index}{self.output.suffix}"
+        self._fp = partial_path(self._path).open("w", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._fp, fieldnames=HEADER, extrasaction="ignore")
+        self._writer.writeheader()
+        self._rows = 0
+
+    def _close(self) -> None:
+        if self._fp is None:
+            return
+        publish_file(self._fp, self._path)
+        self._fp = None
+        if self.batch > 0:
+            print(f"Wrote batch {self.batch_index} with {self._rows} rows to {self._path}")
+            self.batch_index += 1
+        else:
+            print(f"Wrote {self._rows} rows to {self._path}")
+
+    def write_product(self, rows: List[Dict[str, str]]) -> None:
+        if self._fp is None:
+            self._open()
+        for row in rows:
+            self._writer.writerow(row)
+        self._rows += len(rows)
+        self.total_rows += len(rows)
+        if self.batch > 0 and self._rows >= self.batch and rows and rows[-1].get("Type") == "simple":
+            self._close()
+
+    def close(self) -> None:
+        self._close()
+
+    def abort(self) -> None:
+        """Drops the file being written without publishing it; files already published are kept."""
+        if self._fp is None:
+            return
+        discard_file(self._fp, self._path)
+        self._fp = None
+
+
+def convert_records(
+    products: Iterable[Union[ProductRecord, Dict[str, Any]]],
+    output: Path,
+    batch: int = 0,
+    price_formula: str = "",
+) -> int:
+    """Writes the rows of each product as it arrives (see BatchedCsvWriter). Returns the number of products."""
+    writer = BatchedCsvWriter(output, batch)
+    converted = 0
+    try:
+        for product in products:
+            writer.write_product(build_row(product, price_formula))
+            converted += 1
+    except BaseException:
+        # A half-written file must not replace the last complete one
+        writer.abort()
+        raise
+    writer.close()
+    return converted
+
+
+def convert_streaming(args: argparse.Namespace) -> int:
+    converted = convert_records(iter_products(args.input, args.brand), args.output, args.batch, args.price_formula)
+    if converted:
+        print(f"Converted {converted} products")
+    return converted
+
+
 def write_csv(path: Path, rows: Iterable[Dict[str, str]]) -> None:
-    with path.open("w", encoding="utf-8", newline="") as fp:
+    fp = partial_path(path).open("w", encoding="utf-8", newline="")
+    try:
         writer = csv.DictWriter(fp, fieldnames=HEADER, extrasaction="ignore")
         writer.writeheader()
         for row in rows:
             writer.writerow(row)
+    except BaseException:
+        discard_file(fp, path)
+        raise
+    publish_file(fp, path)
+
+
+def convert_catalog(
+    source: Path,
+    output: Path,
+    brands: Optional[List[str]] = None,
+    batch: int = 0,
+    price_formula: str = "",
+    in_memory: bool = False,
+) -> int:
+    """
+    Converts a catalog (product_details.json, catalog database or shard manifest)
+    to CSV, as the command line does. Returns the number of products converted.
+    """
+    args = argparse.Namespace(
+        input=source, output=output, brand=brands, batch=batch, price_formula=price_formula, in_memory=in_memory
+    )
+    # Read one snapshot of the catalog from start to end, even if the updater
+    # publishes a new one meanwhile (a no-op for files that are not snapshots)
+    with pin_snapshot(args.input) as snapshot:
+        args.input = snapshot
+        if args.in_memory:
+            return convert_in_memory(args)
+        return convert_streaming(args)
 
 
 def main() -> None:
     args = parse_args()
+    converted = convert_catalog(args.input, args.output, args.brand, args.batch, args.price_formula, args.in_memory)
+    if not converted:
+        raise SystemExit("No products matched the requested filters")
+
+
+def convert_in_memory(args: argparse.Namespace) -> int:
     products = load_products(args.input)
     filtered = filter_products(products, args.brand)
     if not filtered:
-        raise SystemExit("No products matched the requested filters")
+        return 0
     
     all_rows = []
     batch_index = 1
@@ -500,6 +718,7 @@ def main() -> None:
             # No batching, write to original output path
             write_csv(args.output, all_rows)
             print(f"Wrote {len(all_rows)} rows to {args.output}")
+    return len(filtered)
 
 
 if __name__ == "__main__":
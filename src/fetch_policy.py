@@ -0,0 +1,231 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, List, Optional, Tuple
+
+import requests
+
+from http_client import ResponseTooLarge
+
+PERMANENT_STATUSES = frozenset({400, 401, 403, 404, 405, 410, 451})
+THROTTLE_STATUSES = frozenset({429, 503})
+MAX_RETRY_AFTER = 300.0
+
+
+def response_status(exc: BaseException) -> Optional[int]:
+    response = getattr(exc, "response", None)
+    return response.status_code if response is not None else None
+
+
+def parse_retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds requested by a Retry-After header (delta-seconds or HTTP-date), if any."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return min(float(value), MAX_RETRY_AFTER)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return min(max((when - datetime.now(timezone.utc)).total_seconds(), 0.0), MAX_RETRY_AFTER)
+
+
+class RetryPolicy:
+    """
+    Decides whether and when a failed fetch is retried, based on the kind of error:
+
+    - 4xx such as 404/410 and oversized responses: permanent, never retried
+    - 429/503: retried after Retry-After when given, otherwise with backoff
+    - other 5xx, timeouts and connection errors: retried with jittered backoff
+    - anything that isn't a requests error (e.g. a parsing bug): not retried
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        max_throttled_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.max_throttled_attempts = max_throttled_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        # "Equal jitter": at least half the exponential delay, plus a random share of the rest.
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    @staticmethod
+    def is_transient(exc: BaseException) -> bool:
+        if not isinstance(exc, requests.RequestException) or isinstance(exc, ResponseTooLarge):
+            return False
+        status = response_status(exc)
+        return status is None or status not in PERMANENT_STATUSES
+
+    @staticmethod
+    def is_throttled(exc: BaseException) -> bool:
+        return response_status(exc) in THROTTLE_STATUSES
+
+    def retry_delay(self, exc: BaseException, attempt: int) -> Optional[float]:
+        """Returns the delay before the next attempt, or None to give up."""
+        if not self.is_transient(exc):
+            return None
+        if self.is_throttled(exc):
+            if attempt >= self.max_throttled_attempts:
+                return None
+            retry_after = parse_retry_after(exc)
+            return retry_after if retry_after is not None else self.backoff(attempt)
+        if attempt >= self.max_attempts:
+            return None
+        return self.backoff(attempt)
+
+
+class RetryQueue:
+    """
+    Thread-safe work queue where items can be scheduled for later.
+
+    Workers block in get() until an item is due. Once every item has been
+    marked task_done() without being rescheduled, get() returns None to all
+    waiting workers so they can exit.
+    """
+
+    def __init__(self, items: Optional[List[Any]] = None) -> None:
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._counter = itertools.count()
+        self._outstanding = 0
+        self._condition = threading.Condition()
+        for item in items or []:
+            self.put(item)
+
+    def put(self, item: Any, delay: float = 0.0) -> None:
+        with self._condition:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), item))
+            self._outstanding += 1
+            self._condition.notify()
+
+    def get(self) -> Optional[Any]:
+        with self._condition:
+            while True:
+                if self._outstanding == 0:
+                    return None
+                if self._heap:
+                    ready_at = self._heap[0][0]
+                    wait_for = ready_at - time.monotonic()
+                    if wait_for <= 0:
+                        return heapq.heappop(self._heap)[2]
+                    self._condition.wait(wait_for)
+                else:
+                    self._condition.wait()
+
+    def task_done(self) -> None:
+        with self._condition:
+            self._outstanding -= 1
+            if self._outstanding == 0:
+                self._condition.notify_all()
+
+    @property
+    def scheduled(self) -> int:
+        with self._condition:
+            return len(self._heap)
+
+
+class CircuitBreaker:
+    """
+    Pauses every fetcher when the recent transient error rate spikes
+    (e.g. a 429/503 storm) instead of burning retries on each URL.
+
+    Closed: requests flow, outcomes are recorded in a sliding window.
+    Open: before_request() blocks until the cooldown has passed.
+    Half-open: a single probe request is let through; success closes the
+    breaker, failure reopens it with a doubled cooldown.
+    """
+
+    def __init__(
+        self,
+        window: int = 40,
+        min_samples: int = 10,
+        error_threshold: float = 0.5,
+        cooldown: float = 30.0,
+        max_cooldown: float = 600.0,
+    ) -> None:
+        self.min_samples = min_samples
+        self.error_threshold = error_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._cooldown = cooldown
+        self._open_until: Optional[float] = None
+        self._probe_in_flight = False
+        self._condition = threading.Condition()
+        self.trips = 0
+
+    @property
+    def is_open(self) -> bool:
+        with self._condition:
+            return self._open_until is not None
+
+    def before_request(self) -> float:
+        """Blocks while the breaker is open. Returns the time spent waiting."""
+        waited = 0.0
+        with self._condition:
+            while self._open_until is not None:
+                remaining = self._open_until - time.monotonic()
+                if remaining <= 0 and not self._probe_in_flight:
+                    self._probe_in_flight = True
+                    break
+                timeout = remaining if remaining > 0 else None
+                start = time.monotonic()
+                self._condition.wait(timeout)
+                waited += time.monotonic() - start
+        return waited
+
+    def record_success(self) -> None:
+        with self._condition:
+            if self._probe_in_flight:
+                self._probe_in_flight = False
+                self._open_until = None
+                self._cooldown = self.base_cooldown
+                self._outcomes.clear()
+                self._condition.notify_all()
+            self._outcomes.append(True)
+
+    def record_failure(self, retry_after: Optional[float] = None) -> bool:
+        """Records a transient failure. Returns True if this tripped the breaker."""
+        with self._condition:
+            if self._probe_in_flight:
+                self._probe_in_flight = False
+                self._cooldown = min(self._cooldown * 2, self.max_cooldown)
+                self._trip(retry_after)
+                return True
+            self._outcomes.append(False)
+            if self._open_until is not None or len(self._outcomes) < self.min_samples:
+                return False
+            failures = self._outcomes.count(False)
+            if failures / len(self._outcomes) < self.error_threshold:
+                return False
+            self._trip(retry_after)
+            return True
+
+    def _trip(self, retry_after: Optional[float]) -> None:
+        cooldown = max(self._cooldown, retry_after or 0.0)
+        self._open_until = time.monotonic() + cooldown
+        self.trips += 1
+        self._condition.notify_all()
+
+    @property
+    def cooldown(self) -> float:
+        return self._cooldown
@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None  # type: ignore
+
+import serialization
+
+CODEC_EXTENSIONS = {"zstd": ".zst", "gzip": ".gz"}
+
+
+class ArchiveEntry(NamedTuple):
+    url: str
+    brand: str
+    hash: str
+
+
+def default_codec() -> str:
+    return "zstd" if zstandard is not None else "gzip"
+
+
+class HtmlArchive:
+    """
+    Content-addressed store of raw product pages.
+
+    Blobs live under objects/<aa>/<sha256>.zst (or .gz when zstandard isn't
+    installed) keyed by the hash of the uncompressed body, so identical pages are
+    stored once. index.jsonl maps URL -> (brand, hash); it is append-only and the
+    last line for a URL wins until compact() rewrites it.
+    """
+
+    def __init__(self, root: Path, codec: Optional[str] = None) -> None:
+        self.root = Path(root)
+        self.codec = codec or default_codec()
+        if self.codec == "zstd" and zstandard is None:
+            raise RuntimeError("zstd archive codec requires the 'zstandard' package")
+        self.objects_dir = self.root / "objects"
+        self.index_path = self.root / "index.jsonl"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = self._read_index()
+
+    @staticmethod
+    def hash_body(body: bytes) -> str:
+        return hashlib.sha256(body).hexdigest()
+
+    def _read_index(self) -> Dict[str, ArchiveEntry]:
+        index: Dict[str, ArchiveEntry] = {}
+        if not self.index_path.exists():
+            return index
+        with self.index_path.open("r", encoding="utf-8") as fp:
+            for line in fp:
+                try:
+                    entry = serialization.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                index[entry["url"]] = ArchiveEntry(entry["url"], entry["brand"], entry["hash"])
+        return index
+
+    def _blob_path(self, digest: str, codec: str) -> Path:
+        return self.objects_dir / digest[:2] / f"{digest}{CODEC_EXTENSIONS[codec]}"
+
+    def _find_blob(self, digest: str) -> Optional[Path]:
+        for codec in CODEC_EXTENSIONS:
+            path = self._blob_path(digest, codec)
+            if path.exists():
+                return path
+        return None
+
+    def _compress(self, body: bytes) -> bytes:
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=10).compress(body)
+        return gzip.compress(body, compresslevel=6)
+
+    def store(self, url: str, brand: str, body: bytes) -> str:
+        digest = self.hash_body(body)
+        if self._find_blob(digest) is None:
+            path = self._blob_path(digest, self.codec)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(self._compress(body))
+            os.replace(tmp_path, path)
+        with self._lock:
+            current = self._index.get(url)
+            if current is None or current.hash != digest or current.brand != brand:
+                entry = ArchiveEntry(url, brand, digest)
+                self._index[url] = entry
+                with self.index_path.open("a", encoding="utf-8") as fp:
+                    record = {**entry._asdict(), "stored_at": datetime.utcnow().isoformat()}
+                    fp.write(serialization.dumps(record, compact=True).decode("utf-8") + "\n")
+        return digest
+
+    def load(self, digest: str) -> bytes:
+        path = self._find_blob(digest)
+        if path is None:
+            raise FileNotFoundError(f"Archived page {digest} is missing")
+        data = path.read_bytes()
+        if path.suffix == CODEC_EXTENSIONS["zstd"]:
+            if zstandard is None:
+                raise RuntimeError(f"{path.name} needs the 'zstandard' package to decompress")
+            return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+        return gzip.decompress(data)
+
+    def entries(self) -> List[ArchiveEntry]:
+        with self._lock:
+            return list(self._index.values())
+
+    def links_by_brand(self) -> Dict[str, List[str]]:
+        links: Dict[str, List[str]] = {}
+        for entry in self.entries():
+            links.setdefault(entry.brand, []).append(entry.url)
+        return links
+
+    def compact(self) -> int:
+        """Rewrites the index with one line per URL and deletes unreferenced blobs."""
+        with self._lock:
+            tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+            with tmp_path.open("w", encoding="utf-8") as fp:
+                for entry in self._index.values():
+                    fp.write(serialization.dumps(entry._asdict(), compact=True).decode("utf-8") + "\n")
+            os.replace(tmp_path, self.index_path)
+            referenced = {entry.hash for entry in self._index.values()}
+        removed = 0
+        for path in self.objects_dir.glob("*/*"):
+            if path.name.split(".", 1)[0] not in referenced and not path.name.endswith(".tmp"):
+                path.unlink()
+                removed += 1
+        return removed
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+import serialization
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class CacheEntry(NamedTuple):
+    url: str
+    body: bytes
+    encoding: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+    @property
+    def text(self) -> str:
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+
+class ResponseCache:
+    """
+    Persistent HTTP response cache keyed by URL.
+
+    Each entry is a body file plus a small JSON sidecar holding the validators
+    (ETag / Last-Modified) needed for conditional requests. The body file's mtime
+    doubles as the last-used timestamp, and the least recently used entries are
+    evicted once the total body size exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._sizes: Dict[str, int] = {}
+        self._total = 0
+        for body_path in self.directory.glob("*/*.body"):
+            try:
+                size = body_path.stat().st_size
+            except OSError:
+                continue
+            self._sizes[body_path.stem] = size
+            self._total += size
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str):
+        bucket = self.directory / key[:2]
+        return bucket / f"{key}.body", bucket / f"{key}.json"
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        body_path, meta_path = self._paths(self.key_for(url))
+        try:
+            meta = serialization.loads(meta_path.read_bytes())
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url:
+            return None
+        return CacheEntry(
+            url=url,
+            body=body,
+            encoding=meta.get("encoding"),
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+        )
+
+    @staticmethod
+    def conditional_headers(entry: CacheEntry) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def touch(self, url: str) -> None:
+        body_path, _ = self._paths(self.key_for(url))
+        try:
+            os.utime(body_path)
+        except OSError:
+            pass
+
+    def store(
+        self,
+        url: str,
+        body: bytes,
+        encoding: Optional[str],
+        etag: Optional[str],
+        last_modified: Optional[str],
+    ) -> bool:
+        """Stores a response. Responses without validators are not worth caching."""
+        if not etag and not last_modified:
+            return False
+        if len(body) > self.max_bytes:
+            return False
+        key = self.key_for(url)
+        body_path, meta_path = self._paths(key)
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "url": url,
+            "encoding": encoding,
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": time.time(),
+        }
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_body = body_path.with_name(body_path.name + suffix)
+        tmp_meta = meta_path.with_name(meta_path.name + suffix)
+        tmp_body.write_bytes(body)
+        tmp_meta.write_bytes(serialization.dumps(meta, compact=True))
+        os.replace(tmp_body, body_path)
+        os.replace(tmp_meta, meta_path)
+        with self._lock:
+            self._total += len(body) - self._sizes.get(key, 0)
+            self._sizes[key] = len(body)
+            if self._total > self.max_bytes:
+                self._evict_locked()
+        return True
+
+    def _evict_locked(self) -> None:
+        entries = []
+        for key in self._sizes:
+            body_path, _ = self._paths(key)
+            try:
+                entries.append((body_path.stat().st_mtime, key))
+            except OSError:
+                entries.append((0.0, key))
+        entries.sort()
+        # Evict down to 90% of the budget so we don't evict on every store.
+        target = int(self.max_bytes * 0.9)
+        for _, key in entries:
+            if self._total <= target:
+                break
+            body_path, meta_path = self._paths(key)
+            for path in (meta_path, body_path):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+            self._total -= self._sizes.pop(key)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
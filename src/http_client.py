@@ -0,0 +1,184 @@
+import io
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+import requests
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
+
+try:  # urllib3 only decodes brotli responses when one of these is installed
+    import brotli  # type: ignore  # noqa: F401
+
+    HAS_BROTLI = True
+except ImportError:  # pragma: no cover - optional dependency
+    try:
+        import brotlicffi  # type: ignore  # noqa: F401
+
+        HAS_BROTLI = True
+    except ImportError:
+        HAS_BROTLI = False
+
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 20.0
+DEFAULT_TIMEOUT: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT)
+DEFAULT_POOL_SIZE = 8
+MAX_RESPONSE_BYTES = 50 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br" if HAS_BROTLI else "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+
+class ResponseTooLarge(requests.RequestException):
+    """Raised when a response body exceeds the configured size cap."""
+
+
+def create_session(pool_size: int = DEFAULT_POOL_SIZE) -> Session:
+    """
+    Session with keep-alive connections pooled per host. `pool_size` should be at
+    least the number of threads sharing the session so none of them has to open
+    (and TLS-handshake) a throwaway connection.
+    """
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_shared_session: Optional[Session] = None
+_shared_lock = threading.Lock()
+
+
+def shared_session() -> Session:
+    """Process-wide session for code paths that fetch one URL at a time."""
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            _shared_session = create_session()
+        return _shared_session
+
+
+def _check_declared_length(response: Response, url: str, max_bytes: int) -> None:
+    declared = response.headers.get("Content-Length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        response.close()
+        raise ResponseTooLarge(
+            f"{url} declares {int(declared)} bytes, above the {max_bytes} byte limit",
+            response=response,
+        )
+
+
+def get(
+    url: str,
+    session: Optional[Session] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+    max_bytes: int = MAX_RESPONSE_BYTES,
+) -> Response:
+    """
+    GET with separate connect/read timeouts and a cap on the decoded body size.
+    The body is read in chunks, so an oversized response is abandoned as soon as
+    it crosses `max_bytes` instead of being buffered whole.
+    """
+    session = session or shared_session()
+    response = session.get(url, headers=headers, timeout=timeout, stream=True)
+    _check_declared_length(response, url, max_bytes)
+    body = bytearray()
+    for chunk in response.iter_content(CHUNK_SIZE):
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            response.close()
+            raise ResponseTooLarge(
+                f"{url} is larger than the {max_bytes} byte limit", response=response
+            )
+    # Hand the capped body back through the normal Response API (.content, .text).
+    response._content = bytes(body)  # pylint: disable=protected-access
+    return response
+
+
+def download(
+    url: str,
+    destination: Path,
+    session: Optional[Session] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+    max_bytes: int = MAX_RESPONSE_BYTES,
+) -> Response:
+    """Streams a response to `destination` (via a temp file) under the same size cap."""
+    session = session or shared_session()
+    with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        _check_declared_length(response, url, max_bytes)
+        tmp_path = destination.with_name(destination.name + ".tmp")
+        written = 0
+        try:
+            with tmp_path.open("wb") as fp:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    written += len(chunk)
+                    if written > max_bytes:
+                        raise ResponseTooLarge(
+                            f"{url} is larger than the {max_bytes} byte limit", response=response
+                        )
+                    fp.write(chunk)
+            os.replace(tmp_path, destination)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+    return response
+
+
+class _CappedBody(io.RawIOBase):
+    """The decoded body of a streamed response as a file object, under a size cap."""
+
+    def __init__(self, response: Response, url: str, max_bytes: int) -> None:
+        self._response = response
+        self._url = url
+        self._max_bytes = max_bytes
+        self._read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:  # type: ignore[override]
+        data = self._response.raw.read(len(buffer), decode_content=True)
+        self._read += len(data)
+        if self._read > self._max_bytes:
+            raise ResponseTooLarge(
+                f"{self._url} is larger than the {self._max_bytes} byte limit", response=self._response
+            )
+        buffer[: len(data)] = data
+        return len(data)
+
+
+@contextmanager
+def open_stream(
+    url: str,
+    session: Optional[Session] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+    max_bytes: int = MAX_RESPONSE_BYTES,
+) -> Iterator[Tuple[Response, BinaryIO]]:
+    """
+    Yields (response, body) where `body` is a buffered file object reading the
+    response as it arrives (Content-Encoding decoded), so a consumer can parse a
+    large document without holding it in memory or writing it to disk. The same
+    size cap as get() applies.
+    """
+    session = session or shared_session()
+    with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        _check_declared_length(response, url, max_bytes)
+        yield response, io.BufferedReader(_CappedBody(response, url, max_bytes), CHUNK_SIZE)
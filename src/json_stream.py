@@ -0,0 +1,112 @@
+import json
+from pathlib import Path
+from typing import Any, Iterator, Optional, Set, TextIO, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+WHITESPACE = " \t\n\r"
+
+
+class _StreamReader:
+    """
+    Incremental JSON reader over a text file. Only the part of the document that
+    is currently being decoded is kept in memory; each value is decoded with the
+    stdlib decoder once enough of it has been buffered.
+    """
+
+    def __init__(self, fp: TextIO, chunk_size: int = CHUNK_SIZE) -> None:
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, min_size: int) -> bool:
+        """Reads until at least `min_size` characters are buffered past the cursor. False at EOF."""
+        if self._pos > self._chunk_size:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        while len(self._buf) - self._pos < min_size and not self._eof:
+            chunk = self._fp.read(max(self._chunk_size, min_size))
+            if not chunk:
+                self._eof = True
+                break
+            self._buf += chunk
+        return len(self._buf) - self._pos >= min_size
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill(1):
+                raise ValueError("Unexpected end of JSON document")
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON document, found {found!r}")
+        self._pos += 1
+
+    def accept(self, char: str) -> bool:
+        if self.peek() == char:
+            self._pos += 1
+            return True
+        return False
+
+    def value(self) -> Any:
+        """Decodes the next complete JSON value."""
+        self.peek()
+        want = self._chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            else:
+                # A number or literal that ends with the buffer may continue in the next chunk.
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            self._fill(len(self._buf) - self._pos + want)
+            want *= 2
+
+    def members(self) -> Iterator[str]:
+        """Iterates the keys of the object at the cursor; the caller consumes each value."""
+        self.expect("{")
+        if self.accept("}"):
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.accept("}"):
+                return
+            self.expect(",")
+
+
+def iter_catalog(
+    path: Path, brands: Optional[Set[str]] = None
+) -> Iterator[Tuple[str, str, Any]]:
+    """
+    Yields (brand, url, product) from a product_details.json one product at a
+    time, without loading the whole file. `brands` (lower-case) limits the output.
+    """
+    with path.open("r", encoding="utf-8") as fp:
+        reader = _StreamReader(fp)
+        found_products = False
+        for key in reader.members():
+            if key != "products":
+                reader.value()
+                continue
+            found_products = True
+            for brand in reader.members():
+                for url in reader.members():
+                    product = reader.value()
+                    if brands is None or brand.lower() in brands:
+                        yield brand, url, product
+        if not found_products:
+            raise ValueError("Invalid JSON structure: missing 'products' mapping")
@@ -0,0 +1,494 @@
+import re
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Union
+from urllib.parse import urljoin
+
+from lxml import etree
+
+# Single-pass extraction engine for product pages.
+#
+# The BeautifulSoup path in scrape_products runs ~25 independent select/select_one
+# calls, each walking the full tree. Here the document is walked exactly once to
+# bucket the anchor elements by class / itemprop / property, and the few nested
+# lookups that remain run precompiled XPath expressions on those small subtrees.
+# Text and inner-HTML helpers mirror BeautifulSoup's get_text/decode_contents so
+# both engines produce the same records. One known difference: libxml2 fills
+# valueless boolean attributes (`<input disabled>`) with their own name, where
+# BeautifulSoup keeps them empty.
+
+ANCHOR_CLASSES = frozenset(
+    {
+        "product--title",
+        "montage-std-value",
+        "product--delivery",
+        "delivery-sign",
+        "breadcrumb--list",
+        "product--price",
+        "product--eu-tire-label-table",
+        "accordion__container",
+        "image--element",
+        "ac--multimedia",
+        "ac--questions__address",
+        "ac--document",
+        "configurator--variant",
+    }
+)
+ANCHOR_ITEMPROPS = frozenset({"tail_number", "sku", "productID", "price", "priceCurrency"})
+ANCHOR_PROPERTIES = frozenset(
+    {"og:image", "product:price", "product:price:currency", "product:product_link"}
+)
+
+
+def _has_class_xpath(axis: str, css_class: str, tag: str = "*") -> etree.XPath:
+    return etree.XPath(
+        f"{axis}{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {css_class} ')]"
+    )
+
+
+_DELIVERY_TEXT = _has_class_xpath(".//", "delivery--text")
+_BREADCRUMB_ITEMS = etree.XPath(".//li[@itemprop='itemListElement']")
+_BREADCRUMB_ANCHOR = etree.XPath(".//a[@itemprop='item']")
+_BREADCRUMB_POSITION = etree.XPath(".//meta[@itemprop='position']")
+_ROWS = etree.XPath(".//tr")
+_CELLS = etree.XPath(".//td")
+_ACCORDION_BTN = _has_class_xpath(".//", "accordion__btn")
+_ACCORDION_PANEL = _has_class_xpath(".//", "accordion__panel")
+_FIRST_IMG = etree.XPath(".//img")
+_MEDIA_URL_BLOCKS = etree.XPath(".//*[@data-media-url]")
+_LINKS_WITH_HREF = etree.XPath(".//a[@href]")
+_VARIANT_GROUPS = _has_class_xpath(".//", "variant--group")
+_VARIANT_NAME = _has_class_xpath(".//", "variant--name")
+_VARIANT_LABELS = etree.XPath(
+    ".//*[contains(concat(' ', normalize-space(@class), ' '), ' variant--option ')]"
+    "//label[contains(concat(' ', normalize-space(@class), ' '), ' radio-label ')]"
+)
+_IN_PRODUCT_DELIVERY = etree.XPath(
+    "boolean(ancestor::*[contains(concat(' ', normalize-space(@class), ' '), ' product--delivery ')])"
+)
+_IN_MULTIMEDIA = etree.XPath(
+    "boolean(ancestor::*[contains(concat(' ', normalize-space(@class), ' '), ' ac--multimedia ')])"
+)
+_IN_BREADCRUMB_LIST = etree.XPath(
+    "boolean(ancestor::ul[contains(concat(' ', normalize-space(@class), ' '), ' breadcrumb--list ')])"
+)
+
+# Strings BeautifulSoup does not report from get_text().
+NON_TEXT_TAGS = frozenset({"script", "style", "template", "rt", "rp"})
+RAW_TEXT_TAGS = frozenset({"script", "style"})
+PRESERVE_WHITESPACE_TAGS = frozenset({"pre", "textarea"})
+ASCII_SPACES = " \n\t\x0c\r"
+VOID_TAGS = frozenset(
+    {
+        "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link",
+        "menuitem", "meta", "param", "source", "track", "wbr", "basefont", "bgsound",
+        "command", "frame", "image", "isindex", "nextid", "spacer",
+    }
+)
+MULTI_VALUED_ATTRIBUTES = {
+    "*": {"class", "accesskey", "dropzone"},
+    "a": {"rel", "rev"},
+    "link": {"rel", "rev"},
+    "td": {"headers"},
+    "th": {"headers"},
+    "form": {"accept-charset"},
+    "object": {"archive"},
+    "area": {"rel"},
+    "icon": {"sizes"},
+    "iframe": {"sandbox"},
+    "output": {"for"},
+}
+CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_\-]+)""", re.IGNORECASE)
+
+_parsers = threading.local()
+
+
+def _utf8_parser() -> etree.HTMLParser:
+    parser = getattr(_parsers, "utf8", None)
+    if parser is None:
+        parser = etree.HTMLParser(encoding="utf-8")
+        _parsers.utf8 = parser
+    return parser
+
+
+def parse_document(html: Union[bytes, str]) -> Optional[etree._Element]:
+    """Parses raw bytes without decoding them in Python first (UTF-8 unless declared otherwise)."""
+    if isinstance(html, bytes):
+        declared = CHARSET_RE.search(html[:2048])
+        if declared is None or declared.group(1).lower() in (b"utf-8", b"utf8"):
+            return etree.fromstring(html, _utf8_parser())
+    return etree.HTML(html)
+
+
+def _collapse(text: str, preserve: bool) -> str:
+    # BeautifulSoup collapses whitespace-only strings outside <pre>/<textarea>.
+    if preserve or text.strip(ASCII_SPACES):
+        return text
+    return "\n" if "\n" in text else " "
+
+
+def iter_strings(element: etree._Element, preserve: bool = False) -> Iterator[str]:
+    preserve = preserve or element.tag in PRESERVE_WHITESPACE_TAGS
+    if element.text and element.tag not in NON_TEXT_TAGS:
+        yield _collapse(element.text, preserve)
+    for child in element:
+        if isinstance(child.tag, str) and child.tag not in NON_TEXT_TAGS:
+            yield from iter_strings(child, preserve)
+        if child.tail:
+            yield _collapse(child.tail, preserve)
+
+
+def get_text(element: etree._Element, separator: str = "", strip: bool = False) -> str:
+    if not strip:
+        return separator.join(iter_strings(element))
+    return separator.join(s for s in (s.strip() for s in iter_strings(element)) if s)
+
+
+def stripped_strings(element: etree._Element) -> List[str]:
+    return [s for s in (s.strip() for s in iter_strings(element)) if s]
+
+
+def element_text(element: Optional[etree._Element], separator: str = " ") -> Optional[str]:
+    if element is None:
+        return None
+    return get_text(element, separator).strip() or None
+
+
+def class_list(element: etree._Element) -> List[str]:
+    return (element.get("class") or "").split()
+
+
+def _escape_text(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _quote_attribute(value: str) -> str:
+    value = _escape_text(value)
+    if '"' in value:
+        if "'" in value:
+            return '"' + value.replace('"', "&quot;") + '"'
+        return "'" + value + "'"
+    return '"' + value + '"'
+
+
+def _attribute_value(tag: str, name: str, value: str) -> str:
+    if name in MULTI_VALUED_ATTRIBUTES["*"] or name in MULTI_VALUED_ATTRIBUTES.get(tag, ()):
+        return " ".join(value.split())
+    return value
+
+
+def _serialize(element: etree._Element, parts: List[str], preserve: bool) -> None:
+    tag = element.tag
+    if tag is etree.Comment:
+        parts.append(f"<!--{element.text or ''}-->")
+        return
+    if tag is etree.ProcessingInstruction:
+        parts.append(f"<?{element.target} {element.text or ''}>")
+        return
+    if not isinstance(tag, str):
+        return
+    attributes = "".join(
+        f" {name}={_quote_attribute(_attribute_value(tag, name, value))}"
+        for name, value in sorted(element.attrib.items())
+    )
+    if tag in VOID_TAGS and not element.text and len(element) == 0:
+        parts.append(f"<{tag}{attributes}/>")
+        return
+    parts.append(f"<{tag}{attributes}>")
+    _serialize_contents(element, parts, preserve)
+    parts.append(f"</{tag}>")
+
+
+def _serialize_contents(element: etree._Element, parts: List[str], preserve: bool) -> None:
+    raw = element.tag in RAW_TEXT_TAGS
+    preserve = preserve or element.tag in PRESERVE_WHITESPACE_TAGS
+    if element.text:
+        text = _collapse(element.text, preserve)
+        parts.append(text if raw else _escape_text(text))
+    for child in element:
+        _serialize(child, parts, preserve)
+        if child.tail:
+            tail = _collapse(child.tail, preserve)
+            parts.append(tail if raw else _escape_text(tail))
+
+
+def decode_contents(element: etree._Element) -> str:
+    """Inner HTML serialized the way BeautifulSoup's decode_contents() does."""
+    parts: List[str] = []
+    preserve = any(ancestor.tag in PRESERVE_WHITESPACE_TAGS for ancestor in element.iterancestors())
+    _serialize_contents(element, parts, preserve)
+    return "".join(parts)
+
+
+def _outermost(elements: List[etree._Element], inside: etree.XPath) -> List[etree._Element]:
+    return [element for element in elements if not inside(element)]
+
+
+def _unique(elements: Iterator[etree._Element]) -> List[etree._Element]:
+    seen = set()
+    result = []
+    for element in elements:
+        if element not in seen:
+            seen.add(element)
+            result.append(element)
+    return result
+
+
+class _Anchors:
+    """Anchor elements collected during the single walk, in document order."""
+
+    def __init__(self, root: etree._Element) -> None:
+        self.by_class: Dict[str, List[etree._Element]] = {name: [] for name in ANCHOR_CLASSES}
+        self.by_itemprop: Dict[str, List[etree._Element]] = {name: [] for name in ANCHOR_ITEMPROPS}
+        self.meta_property: Dict[str, etree._Element] = {}
+        self.breadcrumb_items: List[etree._Element] = []
+        for element in root.iter(etree.Element):
+            css_class = element.get("class")
+            if css_class:
+                for token in css_class.split():
+                    bucket = self.by_class.get(token)
+                    if bucket is not None and (not bucket or bucket[-1] is not element):
+                        bucket.append(element)
+            itemprop = element.get("itemprop")
+            if itemprop is not None:
+                if itemprop in self.by_itemprop:
+                    self.by_itemprop[itemprop].append(element)
+                elif itemprop == "itemListElement" and element.tag == "li":
+                    self.breadcrumb_items.append(element)
+            if element.tag == "meta":
+                prop = element.get("property")
+                if prop in ANCHOR_PROPERTIES and prop not in self.meta_property:
+                    self.meta_property[prop] = element
+
+    def first(self, css_class: str, *also: str) -> Optional[etree._Element]:
+        for element in self.by_class[css_class]:
+            if all(extra in class_list(element) for extra in also):
+                return element
+        return None
+
+    def itemprop(self, name: str, tag: Optional[str] = None) -> Optional[etree._Element]:
+        for element in self.by_itemprop[name]:
+            if tag is None or element.tag == tag:
+                return element
+        return None
+
+    def meta_content(self, prop: str) -> Optional[str]:
+        element = self.meta_property.get(prop)
+        return element.get("content") if element is not None else None
+
+
+def _mounting_time(anchors: _Anchors) -> Dict[str, Any]:
+    block = anchors.first("montage-std-value")
+    if block is None:
+        return {}
+    raw_text = " ".join(stripped_strings(block))
+    numeric_value: Optional[float] = None
+    for token in raw_text.replace(",", ".").split():
+        try:
+            numeric_value = float(token)
+            break
+        except ValueError:
+            continue
+    return {"raw": raw_text or None, "hours": numeric_value}
+
+
+def _availability(anchors: _Anchors) -> Dict[str, Any]:
+    availability: Dict[str, Any] = {}
+    delivery_text = None
+    for container in _outermost(anchors.by_class["product--delivery"], _IN_PRODUCT_DELIVERY):
+        matches = _DELIVERY_TEXT(container)
+        if matches:
+            delivery_text = matches[0]
+            break
+    if delivery_text is not None:
+        availability["message"] = " ".join(stripped_strings(delivery_text))
+        classes = class_list(delivery_text)
+        availability["classes"] = classes
+        for css_class in classes:
+            if css_class.startswith("delivery--text-"):
+                availability["status"] = css_class.replace("delivery--text-", "")
+                break
+    delivery_sign = anchors.first("delivery-sign")
+    if delivery_sign is not None:
+        availability["badge"] = get_text(delivery_sign, strip=True)
+    return availability
+
+
+def _breadcrumbs(anchors: _Anchors) -> List[Dict[str, Any]]:
+    breadcrumbs: List[Dict[str, Any]] = []
+    for li in anchors.breadcrumb_items:
+        if not _IN_BREADCRUMB_LIST(li):
+            continue
+        anchor = next(iter(_BREADCRUMB_ANCHOR(li)), None)
+        if anchor is not None:
+            title = get_text(anchor, strip=True)
+            href = anchor.get("href") or ""
+        else:
+            title = get_text(li, strip=True)
+            href = ""
+        position = next(iter(_BREADCRUMB_POSITION(li)), None)
+        position_value: Optional[int] = None
+        if position is not None and position.get("content"):
+            try:
+                position_value = int(position.get("content"))
+            except ValueError:
+                position_value = None
+        breadcrumbs.append({"title": title, "url": href, "position": position_value})
+    return breadcrumbs
+
+
+def _price(anchors: _Anchors) -> Dict[str, Any]:
+    price_meta = anchors.itemprop("price", "meta")
+    currency_meta = anchors.itemprop("priceCurrency", "meta")
+    price_block = anchors.first("product--price", "price--default")
+    return {
+        "amount": price_meta.get("content") if price_meta is not None else None,
+        "currency": currency_meta.get("content") if currency_meta is not None else None,
+        "display": " ".join(stripped_strings(price_block)) if price_block is not None else None,
+    }
+
+
+def _eu_tire_label(anchors: _Anchors) -> List[Dict[str, str]]:
+    table = anchors.first("product--eu-tire-label-table")
+    if table is None:
+        return []
+    entries: List[Dict[str, str]] = []
+    current: Optional[Dict[str, str]] = None
+    for row in _ROWS(table):
+        cells = _CELLS(row)
+        if not cells:
+            continue
+        first_cell = cells[0]
+        if "is--bold" in class_list(first_cell) or "rowspan" in first_cell.attrib:
+            current = {"label": get_text(first_cell, " ", strip=True).rstrip(":")}
+            entries.append(current)
+            detail_cells = cells[1:]
+        else:
+            detail_cells = cells
+        if current is None or len(detail_cells) < 2:
+            continue
+        key_text = get_text(detail_cells[0], " ", strip=True).rstrip(":")
+        current[key_text] = get_text(detail_cells[1], " ", strip=True)
+    return entries
+
+
+def _product_information(anchors: _Anchors) -> List[Dict[str, str]]:
+    sections: List[Dict[str, str]] = []
+    for container in anchors.by_class["accordion__container"]:
+        panel = next(iter(_ACCORDION_PANEL(container)), None)
+        if panel is None:
+            continue
+        title_elem = next(iter(_ACCORDION_BTN(container)), None)
+        sections.append(
+            {
+                "title": get_text(title_elem, strip=True) if title_elem is not None else "",
+                "text": get_text(panel, "\n", strip=True),
+                "html": decode_contents(panel).strip(),
+            }
+        )
+    return sections
+
+
+def _images(anchors: _Anchors) -> Dict[str, Any]:
+    image_entries: List[Dict[str, Optional[str]]] = []
+    seen = set()
+    for wrapper in anchors.by_class["image--element"]:
+        entry = {
+            "small": wrapper.get("data-img-small"),
+            "large": wrapper.get("data-img-large"),
+            "original": wrapper.get("data-img-original"),
+            "alt": wrapper.get("data-alt"),
+        }
+        img_tag = next(iter(_FIRST_IMG(wrapper)), None)
+        if img_tag is not None:
+            entry["src"] = img_tag.get("src")
+            entry["srcset"] = img_tag.get("srcset")
+        key = tuple(entry.get(field) for field in ("small", "large", "original", "src"))
+        if key in seen:
+            continue
+        seen.add(key)
+        primary_url = entry.get("original") or entry.get("large") or entry.get("small") or entry.get("src")
+        if primary_url:
+            entry["primary"] = primary_url
+        image_entries.append(entry)
+    if not image_entries:
+        og_image = anchors.meta_content("og:image")
+        if og_image:
+            image_entries.append({"original": og_image, "primary": og_image})
+    return {"count": len(image_entries), "gallery": image_entries}
+
+
+def _documents(anchors: _Anchors) -> List[Dict[str, str]]:
+    documents: List[Dict[str, str]] = []
+    seen_urls = set()
+    containers = _outermost(anchors.by_class["ac--multimedia"], _IN_MULTIMEDIA)
+    for block in _unique(b for c in containers for b in _MEDIA_URL_BLOCKS(c)):
+        url = block.get("data-media-url")
+        if url and url not in seen_urls:
+            seen_urls.add(url)
+            documents.append({"url": url, "label": get_text(block, strip=True)})
+    for link in _unique(a for c in containers for a in _LINKS_WITH_HREF(c)):
+        href = link.get("href")
+        if not href:
+            continue
+        url = urljoin("https://www.ac-schnitzer.de", href)
+        if url in seen_urls:
+            continue
+        seen_urls.add(url)
+        documents.append({"url": url, "label": get_text(link, strip=True)})
+    return documents
+
+
+def _variations(anchors: _Anchors) -> List[Dict[str, Any]]:
+    variations: List[Dict[str, Any]] = []
+    configurator = anchors.first("configurator--variant")
+    if configurator is None:
+        return variations
+    for group in _VARIANT_GROUPS(configurator):
+        name_elem = next(iter(_VARIANT_NAME(group)), None)
+        if name_elem is None:
+            continue
+        options = []
+        for label in _unique(iter(_VARIANT_LABELS(group))):
+            option_text = get_text(label, strip=True)
+            if option_text:
+                options.append(option_text)
+        if options:
+            variations.append({"name": get_text(name_elem, strip=True), "options": options})
+    return variations
+
+
+def extract_fields(html: Union[bytes, str]) -> Dict[str, Any]:
+    """
+    Extracts the raw page fields consumed by scrape_products.build_product_record,
+    using one walk over the document.
+    """
+    root = parse_document(html)
+    if root is None:
+        root = etree.HTML("<html></html>")
+    anchors = _Anchors(root)
+
+    title_elem = anchors.first("product--title")
+    tail_number_elem = anchors.itemprop("tail_number")
+    sku_elem = anchors.itemprop("sku")
+    product_id_elem = anchors.itemprop("productID", "meta")
+
+    return {
+        "title": get_text(title_elem, strip=True) if title_elem is not None else None,
+        "part_number": get_text(tail_number_elem, strip=True) if tail_number_elem is not None else None,
+        "sku": get_text(sku_elem, strip=True) if sku_elem is not None else None,
+        "product_id": product_id_elem.get("content") if product_id_elem is not None else None,
+        "price": _price(anchors),
+        "availability": _availability(anchors),
+        "mounting_time": _mounting_time(anchors),
+        "breadcrumbs": _breadcrumbs(anchors),
+        "product_information": _product_information(anchors),
+        "documents": _documents(anchors),
+        "manufacturer_info": element_text(anchors.first("ac--questions__address"), separator="\n"),
+        "eu_tire_label": _eu_tire_label(anchors),
+        "images": _images(anchors),
+        "ac_document": element_text(anchors.first("ac--document")),
+        "variations": _variations(anchors),
+        "og_price": anchors.meta_content("product:price"),
+        "og_currency": anchors.meta_content("product:price:currency"),
+        "og_product_url": anchors.meta_content("product:product_link"),
+    }
@@ -0,0 +1,72 @@
+import argparse
+from pathlib import Path
+from typing import Any, Dict
+
+from rich.console import Console
+from rich.panel import Panel
+
+from catalog_snapshots import write_snapshot
+from content_fingerprint import record_fingerprint
+from product_schema import (
+    LEGACY_SCHEMA_VERSION,
+    SCHEMA_VERSION,
+    compact_products,
+    expand_products,
+)
+import serialization
+
+console = Console()
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PRODUCT_DETAILS_FILE = BASE_DIR / "data" / "product_details.json"
+
+
+def migrate_catalog(data: Dict[str, Any], expand: bool = False) -> Dict[str, Any]:
+    products = data.get("products", {})
+    migrated = expand_products(products) if expand else compact_products(products)
+    for items in migrated.values():
+        for product in items.values():
+            meta = product.get("meta")
+            if isinstance(meta, dict) and "fingerprint" in meta:
+                meta["fingerprint"] = record_fingerprint(product)
+    meta = dict(data.get("meta") or {})
+    meta["schema_version"] = LEGACY_SCHEMA_VERSION if expand else SCHEMA_VERSION
+    return {**data, "meta": meta, "products": migrated}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Convert product_details.json between the legacy and compact record schema"
+    )
+    parser.add_argument("--input", type=Path, default=PRODUCT_DETAILS_FILE)
+    parser.add_argument("--output", type=Path, default=None, help="Output file (default: rewrite --input)")
+    parser.add_argument(
+        "--expand",
+        action="store_true",
+        help="Write the legacy schema with every derived field stored (default: compact)",
+    )
+    args = parser.parse_args()
+
+    output = args.output or args.input
+    size_before = args.input.stat().st_size
+    data = serialization.load(args.input)
+    migrated = migrate_catalog(data, expand=args.expand)
+    if output.is_symlink():
+        write_snapshot(migrated, output)
+    else:
+        serialization.dump(migrated, output, atomic=True)
+
+    size_after = output.stat().st_size
+    total = sum(len(items) for items in migrated["products"].values())
+    console.print(
+        Panel(
+            f"Migrated {total} products to schema version {migrated['meta']['schema_version']}\n"
+            f"{args.input.name}: {size_before / (1024 * 1024):.1f} MB -> "
+            f"{output.name}: {size_after / (1024 * 1024):.1f} MB",
+            border_style="green",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import argparse
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from rich.console import Console
+from rich.table import Table
+
+from catalog_shards import ShardedCatalog, is_shard_catalog
+from catalog_store import normalize_slug
+from json_stream import iter_catalog
+
+console = Console()
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+HISTORY_DIR = BASE_DIR / "data" / "price_history"
+COLUMNS = ["run_date", "slug", "sku", "amount", "currency", "status", "scraped_at"]
+# A new row is only appended when one of these differs from the slug's last row.
+TRACKED = ["amount", "currency", "status"]
+FIELDS = ("amount", "status")
+
+
+def history_row(url: str, product: Dict[str, Any]) -> Dict[str, Any]:
+    price = product.get("price") if isinstance(product.get("price"), dict) else {}
+    availability = product.get("availability") if isinstance(product.get("availability"), dict) else {}
+    meta = product.get("meta") if isinstance(product.get("meta"), dict) else {}
+    return {
+        "slug": normalize_slug(url),
+        "sku": product.get("sku") or product.get("part_number"),
+        "amount": price.get("amount"),
+        "currency": price.get("currency"),
+        "status": availability.get("status"),
+        "scraped_at": meta.get("scraped_at"),
+    }
+
+
+def history_frame(products: Iterable[Tuple[str, Dict[str, Any]]]) -> pd.DataFrame:
+    """One row per (url, record); a product stored under several URLs keeps its first row."""
+    rows = [history_row(url, product) for url, product in products if isinstance(product, dict)]
+    frame = pd.DataFrame(rows, columns=COLUMNS[1:])
+    frame["amount"] = pd.to_numeric(frame["amount"], errors="coerce").astype("float64")
+    for column in ("slug", "sku", "currency", "status", "scraped_at"):
+        frame[column] = frame[column].astype("object")
+    return frame.drop_duplicates("slug", keep="first")
+
+
+def has_history(history_dir: Path = HISTORY_DIR) -> bool:
+    return any(history_dir.glob("month=*/*.parquet"))
+
+
+def read_history(history_dir: Path = HISTORY_DIR, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Every recorded row, oldest run first."""
+    columns = columns or COLUMNS
+    if "run_date" not in columns:
+        columns = ["run_date"] + columns
+    if not has_history(history_dir):
+        return pd.DataFrame(columns=columns)
+    frame = pd.read_parquet(history_dir, columns=columns)
+    # Files are read in name order, so runs of the same day stay in run order
+    return frame.sort_values("run_date", kind="stable").reset_index(drop=True)
+
+
+def compact_months(history_dir: Path = HISTORY_DIR, current_month: Optional[str] = None) -> int:
+    """
+    Merges the run files of every month before `current_month` into a single
+    file, so a query over years of daily runs opens a few dozen files instead of
+    one per run. Returns the number of months compacted.
+    """
+    current_month = current_month or date.today().isoformat()[:7]
+    compacted = 0
+    for partition in sorted(history_dir.glob("month=*")):
+        files = sorted(partition.glob("*.parquet"))
+        if partition.name[len("month="):] >= current_month or len(files) < 2:
+            continue
+        frame = pd.concat([pd.read_parquet(path) for path in files], ignore_index=True)
+        _write_part(partition, "compacted", frame)
+        for path in files:
+            if path.name != "compacted.parquet":
+                path.unlink()
+        compacted += 1
+    return compacted
+
+
+def _write_part(partition: Path, name: str, frame: pd.DataFrame) -> None:
+    partition.mkdir(parents=True, exist_ok=True)
+    # Dot files are skipped by the Parquet reader, so a partial write is never read
+    tmp = partition / f".{name}.parquet"
+    frame.to_parquet(tmp, index=False)
+    tmp.replace(partition / f"{name}.parquet")
+
+
+def latest_state(history: pd.DataFrame) -> pd.DataFrame:
+    """The last recorded row of every slug, indexed by slug."""
+    return history.drop_duplicates("slug", keep="last").set_index("slug")
+
+
+def record_run(
+    products: Iterable[Tuple[str, Dict[str, Any]]],
+    history_dir: Path = HISTORY_DIR,
+    run_date: Optional[str] = None,
+) -> int:
+    """
+    Appends a Parquet file to the `month=` partition of `run_date` for the
+    products whose amount, currency or stock status differ from their last
+    recorded row (or that have none yet). Returns the number of rows written.
+    """
+    frame = history_frame(products)
+    state = latest_state(read_history(history_dir, ["slug"] + TRACKED))
+    if len(state):
+        previous = state.reindex(frame["slug"])[TRACKED].reset_index(drop=True)
+        current = frame[TRACKED].reset_index(drop=True)
+        # NaN != NaN, so missing values on both sides count as equal
+        same = (previous.eq(current) | (previous.isna() & current.isna())).all(axis=1)
+        frame = frame[~same.to_numpy()]
+    if frame.empty:
+        return 0
+
+    run_date = run_date or date.today().isoformat()
+    frame.insert(0, "run_date", run_date)
+    # Names sort in run order within the month ("compacted" sorts before them)
+    name = f"run-{run_date}-{datetime.utcnow().strftime('%H%M%S%f')}"
+    _write_part(history_dir / f"month={run_date[:7]}", name, frame)
+    compact_months(history_dir)
+    return len(frame)
+
+
+def changes_since(since: str, field: str = "amount", history_dir: Path = HISTORY_DIR) -> pd.DataFrame:
+    """
+    Rows recorded on or after `since` (YYYY-MM-DD) whose `field` ("amount" or
+    "status") differs from the slug's previous row, with the old and new value.
+    """
+    if field not in FIELDS:
+        raise ValueError(f"field must be one of {', '.join(FIELDS)}, not {field!r}")
+    history = read_history(history_dir)
+    previous = history.groupby("slug", sort=False)[field].shift()
+    changed = (
+        (history["run_date"] >= since)
+        & previous.notna()
+        & history[field].notna()
+        & (history[field] != previous)
+    )
+    result = history.loc[changed, ["run_date", "slug", "sku", "currency", "scraped_at"]].copy()
+    result.insert(2, f"old_{field}", previous[changed])
+    result.insert(3, f"new_{field}", history.loc[changed, field])
+    return result.reset_index(drop=True)
+
+
+def iter_catalog_products(path: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(url, record) pairs of a product_details.json or a shard catalog."""
+    if is_shard_catalog(path):
+        products = ShardedCatalog(path).iter_products()
+    else:
+        products = iter_catalog(path)
+    for _, url, product in products:
+        yield url, product
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record and query the price and stock history")
+    parser.add_argument("--history", type=Path, default=HISTORY_DIR, help="History directory (default: data/price_history)")
+    parser.add_argument("--record", type=Path, help="Record a product_details.json or shard manifest as a run")
+    parser.add_argument("--run-date", help="Run date of --record (default: today)")
+    parser.add_argument("--since", help="List changes recorded on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--field", choices=FIELDS, default="amount", help="Field to compare for --since")
+    parser.add_argument("--csv", type=Path, help="Write the --since result to a CSV file")
+    args = parser.parse_args()
+
+    if args.record:
+        written = record_run(iter_catalog_products(args.record), args.history, args.run_date)
+        console.print(f"[green]Recorded {written} changed products from {args.record}[/green]")
+
+    if args.since:
+        changes = changes_since(args.since, args.field, args.history)
+        if args.csv:
+            changes.to_csv(args.csv, index=False)
+            console.print(f"[green]Wrote {len(changes)} changes to {args.csv}[/green]")
+            return
+        table = Table(title=f"{args.field} changes since {args.since} ({len(changes)})")
+        for column in changes.columns:
+            table.add_column(column)
+        for row in changes.head(50).itertuples(index=False):
+            table.add_row(*("" if pd.isna(value) else str(value) for value in row))
+        console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+import serialization
+
+DEFAULT_FSYNC_EVERY = 25
+# Fields set by run_updates after scraping rather than parsed from the page.
+CARRY_OVER_FIELDS = ("lastmod",)
+
+
+def journal_path_for(output_file: Path) -> Path:
+    """product_details.json -> product_details.jsonl next to it."""
+    return output_file.with_suffix(".jsonl")
+
+
+def iter_journal(path: Path) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Yields (brand, url, product) for every complete journal line.
+    A line cut short by a crash is skipped instead of failing the whole read.
+    """
+    if not path.exists():
+        return
+    with path.open("r", encoding="utf-8") as fp:
+        for line in fp:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = serialization.loads(line)
+            except json.JSONDecodeError:
+                continue
+            yield entry["brand"], entry["url"], entry["product"]
+
+
+def journaled_urls(path: Path) -> Set[str]:
+    return {url for _, url, _ in iter_journal(path)}
+
+
+class ProductJournal:
+    """
+    Append-only JSONL journal of parsed products.
+
+    Each product is written as one line as soon as it is parsed, so a crash only
+    loses the pages that were in flight. Lines are flushed immediately and fsynced
+    every `fsync_every` entries; later entries for the same URL win on compaction.
+    """
+
+    def __init__(self, path: Path, fsync_every: int = DEFAULT_FSYNC_EVERY) -> None:
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self._fp = None
+        self._unsynced = 0
+        self.appended = 0
+
+    def __enter__(self) -> "ProductJournal":
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        needs_newline = False
+        if self.path.exists() and self.path.stat().st_size > 0:
+            with self.path.open("rb") as fp:
+                fp.seek(-1, os.SEEK_END)
+                needs_newline = fp.read(1) != b"\n"
+        self._fp = self.path.open("a", encoding="utf-8")
+        if needs_newline:
+            # Terminate a line torn by a crash so the next entry starts cleanly.
+            self._fp.write("\n")
+
+    def append(self, brand: str, url: str, product: Dict[str, Any]) -> None:
+        line = serialization.dumps(
+            {"brand": brand, "url": url, "product": product}, compact=True
+        ).decode("utf-8")
+        self._fp.write(line + "\n")
+        self._fp.flush()
+        self.appended += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        if self._fp is not None and self._unsynced:
+            os.fsync(self._fp.fileno())
+            self._unsynced = 0
+
+    def close(self) -> None:
+        if self._fp is not None:
+            self.sync()
+            self._fp.close()
+            self._fp = None
+
+
+def compact_journal(
+    journal_path: Path,
+    products: Dict[str, Dict[str, Any]],
+    carry_over: Iterable[str] = CARRY_OVER_FIELDS,
+) -> Optional[int]:
+    """
+    Folds journal entries into `products[brand][url]`. Returns the number applied.
+    Fields in `carry_over` are kept from the previous record when the new one lacks them.
+    Records stored under the other `category_urls` of a product are dropped, so
+    each product is stored once.
+    """
+    if not journal_path.exists():
+        return None
+    applied = 0
+    for brand, url, product in iter_journal(journal_path):
+        brand_products = products.setdefault(brand, {})
+        previous = brand_products.get(url) or {}
+        for field in carry_over:
+            if field in previous and field not in product:
+                product[field] = previous[field]
+        for alias in product.get("category_urls") or ():
+            if alias != url:
+                for items in products.values():
+                    items.pop(alias, None)
+        brand_products[url] = product
+        applied += 1
+    return applied
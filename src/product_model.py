@@ -0,0 +1,324 @@
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable, ClassVar, Dict, FrozenSet, List, Optional, Tuple, Type, TypeVar
+
+
+class _Missing:
+    """Marks a key that was absent from the source dict, so it is not written back."""
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __reduce__(self) -> str:
+        return "MISSING"
+
+
+MISSING: Any = _Missing()
+
+R = TypeVar("R", bound="_Record")
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
+def _intern_value(value: Any) -> Any:
+    if type(value) is list:
+        return [_intern_value(item) for item in value]
+    return _intern(value)
+
+
+def _nested(record_type: Type["_Record"]) -> Callable[[Any], Any]:
+    from_dict = record_type.from_dict
+
+    def convert(value: Any) -> Any:
+        if type(value) is dict:
+            return from_dict(value)
+        if type(value) is list:
+            return [from_dict(item) if type(item) is dict else item for item in value]
+        return value
+
+    return convert
+
+
+def _to_value(value: Any) -> Any:
+    if isinstance(value, _Record):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [item.to_dict() if isinstance(item, _Record) else item for item in value]
+    return value
+
+
+@dataclass(slots=True)
+class _Record:
+    """
+    Base for the slotted record types. Conversion is lossless: keys missing from
+    the source stay MISSING and are not written back, unknown keys are kept in
+    `extras`, and values of an unexpected type are stored as they are. A source
+    whose keys are not in the declared order (e.g. a legacy record) remembers its
+    order in `key_order`.
+    """
+
+    # JSON key order of the declared fields.
+    KEYS: ClassVar[Tuple[str, ...]] = ()
+    # {key: record type} for fields holding a nested record (or a list of them).
+    NESTED: ClassVar[Dict[str, Type["_Record"]]] = {}
+    # Keys whose string values (or lists of them) are interned.
+    INTERNED: ClassVar[FrozenSet[str]] = frozenset()
+    # Built for each subclass: {key: (position, conversion applied by from_dict or None)}.
+    _converters: ClassVar[Dict[str, Tuple[int, Optional[Callable[[Any], Any]]]]] = {}
+
+    extras: Optional[Dict[str, Any]] = None
+    key_order: Optional[Tuple[str, ...]] = None
+
+    def __init_subclass__(cls) -> None:
+        cls._converters = {
+            key: (
+                position,
+                _intern_value if key in cls.INTERNED
+                else _nested(cls.NESTED[key]) if key in cls.NESTED
+                else None,
+            )
+            for position, key in enumerate(cls.KEYS)
+        }
+
+    @classmethod
+    def from_dict(cls: Type[R], data: Dict[str, Any]) -> R:
+        converters = cls._converters
+        record = cls.__new__(cls)
+        for key in cls.KEYS:
+            setattr(record, key, MISSING)
+        extras: Optional[Dict[str, Any]] = None
+        ordered = True
+        last = -1
+        for key, value in data.items():
+            entry = converters.get(key)
+            if entry is None:
+                if extras is None:
+                    extras = {}
+                extras[key] = value
+                continue
+            position, convert = entry
+            if position < last or extras is not None:
+                ordered = False
+            last = position
+            setattr(record, key, convert(value) if convert is not None else value)
+        record.extras = extras
+        record.key_order = None if ordered else tuple(data)
+        return record
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        for key in self.KEYS:
+            value = getattr(self, key)
+            if value is not MISSING:
+                data[key] = _to_value(value)
+        if self.extras:
+            data.update(self.extras)
+        if self.key_order is not None:
+            ordered = {key: data[key] for key in self.key_order if key in data}
+            ordered.update(data)  # keys set since loading go last, as on a dict
+            return ordered
+        return data
+
+
+@dataclass(slots=True)
+class Breadcrumb(_Record):
+    KEYS: ClassVar[Tuple[str, ...]] = ("title", "url", "position")
+    INTERNED: ClassVar[FrozenSet[str]] = frozenset({"title", "url"})
+
+    title: Any = MISSING
+    url: Any = MISSING
+    position: Any = MISSING
+
+
+@dataclass(slots=True)
+class Price(_Record):
+    KEYS: ClassVar[Tuple[str, ...]] = ("amount", "currency", "display")
+    INTERNED: ClassVar[FrozenSet[str]] = frozenset({"currency"})
+
+    amount: Any = MISSING
+    currency: Any = MISSING
+    display: Any = MISSING
+
+
+@dataclass(slots=True)
+class Availability(_Record):
+    KEYS: ClassVar[Tuple[str, ...]] = ("message", "classes", "status", "badge")
+    INTERNED: ClassVar[FrozenSet[str]] = frozenset({"message", "classes", "status", "badge"})
+
+    message: Any = MISSING
+    classes: Any = MISSING
+    status: Any = MISSING
+    badge: Any = MISSING
+
+
+@dataclass(slots=True)
+class MountingTime(_Record):
+    KEYS: ClassVar[Tuple[str, ...]] = ("raw", "hours")
+
+    raw: Any = MISSING
+    hours: Any = MISSING
+
+
+@dataclass(slots=True)
+class InfoSection(_Record):
+    KEYS: ClassVar[Tuple[str, ...]] = ("title", "text", "html")
+    INTERNED: ClassVar[FrozenSet[str]] = frozenset({"title"})
+
+    title: Any = MISSING
+    text: Any = MISSING
+    html: Any = MISSING
+
+
+@dataclass(slots=True)
+class GalleryImage(_Record):
+    KEYS: ClassVar[Tuple[str, ...]] = ("small", "large", "original", "alt", "src", "srcset", "primary")
+
+    small: Any = MISSING
+    large: Any = MISSING
+    original: Any = MISSING
+    alt: Any = MISSING
+    src: Any = MISSING
+    srcset: Any = MISSING
+    primary: Any = MISSING
+
+
+@dataclass(slots=True)
+class Images(_Record):
+    KEYS: ClassVar[Tuple[str, ...]] = ("count", "gallery")
+    NESTED: ClassVar[Dict[str, Type[_Record]]] = {"gallery": GalleryImage}
+
+    count: Any = MISSING
+    gallery: Any = MISSING
+
+
+@dataclass(slots=True)
+class Document(_Record):
+    KEYS: ClassVar[Tuple[str, ...]] = ("url", "label")
+    INTERNED: ClassVar[FrozenSet[str]] = frozenset({"label"})
+
+    url: Any = MISSING
+    label: Any = MISSING
+
+
+@dataclass(slots=True)
+class Variation(_Record):
+    KEYS: ClassVar[Tuple[str, ...]] = ("name", "options")
+    INTERNED: ClassVar[FrozenSet[str]] = frozenset({"name", "options"})
+
+    name: Any = MISSING
+    options: Any = MISSING
+
+
+@dataclass(slots=True)
+class PriceMeta(_Record):
+    KEYS: ClassVar[Tuple[str, ...]] = ("og_price", "og_currency", "og_product_url")
+    INTERNED: ClassVar[FrozenSet[str]] = frozenset({"og_currency"})
+
+    og_price: Any = MISSING
+    og_currency: Any = MISSING
+    og_product_url: Any = MISSING
+
+
+@dataclass(slots=True)
+class RecordMeta(_Record):
+    KEYS: ClassVar[Tuple[str, ...]] = ("scraped_at", "price_meta", "content_hash", "fingerprint", "removed_at")
+    NESTED: ClassVar[Dict[str, Type[_Record]]] = {"price_meta": PriceMeta}
+
+    scraped_at: Any = MISSING
+    price_meta: Any = MISSING
+    content_hash: Any = MISSING
+    fingerprint: Any = MISSING
+    # Set once the product left the sitemap (see product_schema.set_removed).
+    removed_at: Any = MISSING
+
+
+@dataclass(slots=True)
+class ProductRecord(_Record):
+    """
+    One product in the compact (schema version 2) shape, see product_schema.
+    Brand, category and breadcrumb strings are interned, so the thousands of
+    records sharing them hold one copy. Legacy (version 1) derived fields are
+    kept in `extras` like any other unknown key.
+    """
+
+    KEYS: ClassVar[Tuple[str, ...]] = (
+        "brand",
+        "url",
+        "title",
+        "breadcrumbs",
+        "category_path",
+        "category_urls",
+        "category_paths",
+        "part_number",
+        "sku",
+        "product_id",
+        "price",
+        "availability",
+        "mounting_time",
+        "product_information",
+        "images",
+        "documents",
+        "manufacturer_info",
+        "ac_document",
+        "eu_tire_label",
+        "variations",
+        "meta",
+        "lastmod",
+    )
+    NESTED: ClassVar[Dict[str, Type[_Record]]] = {
+        "breadcrumbs": Breadcrumb,
+        "price": Price,
+        "availability": Availability,
+        "mounting_time": MountingTime,
+        "product_information": InfoSection,
+        "images": Images,
+        "documents": Document,
+        "variations": Variation,
+        "meta": RecordMeta,
+    }
+    INTERNED: ClassVar[FrozenSet[str]] = frozenset({"brand", "category_path", "category_paths"})
+
+    brand: Any = MISSING
+    url: Any = MISSING
+    title: Any = MISSING
+    breadcrumbs: Any = MISSING
+    category_path: Any = MISSING
+    # Only on products linked from several categories: every URL and its path.
+    category_urls: Any = MISSING
+    category_paths: Any = MISSING
+    part_number: Any = MISSING
+    sku: Any = MISSING
+    product_id: Any = MISSING
+    price: Any = MISSING
+    availability: Any = MISSING
+    mounting_time: Any = MISSING
+    product_information: Any = MISSING
+    images: Any = MISSING
+    documents: Any = MISSING
+    manufacturer_info: Any = MISSING
+    ac_document: Any = MISSING
+    eu_tire_label: Any = MISSING
+    variations: Any = MISSING
+    meta: Any = MISSING
+    lastmod: Any = MISSING
+
+    def image_urls(self) -> List[str]:
+        """The stored legacy `image_urls`, or the gallery primaries they are derived from."""
+        if self.extras and "image_urls" in self.extras:
+            stored = self.extras["image_urls"]
+            return stored if isinstance(stored, list) else []
+        gallery = self.images.gallery if isinstance(self.images, Images) else None
+        if not isinstance(gallery, list):
+            return []
+        return [entry.primary for entry in gallery if isinstance(entry, GalleryImage) and entry.primary]
+
+
+def as_record(product: Any) -> ProductRecord:
+    return product if isinstance(product, ProductRecord) else ProductRecord.from_dict(product)
@@ -0,0 +1,237 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Version 1 stored every derived field; version 2 ("compact") derives them on read.
+LEGACY_SCHEMA_VERSION = 1
+SCHEMA_VERSION = 2
+
+# (derived field, field it follows in the legacy key order)
+DERIVED_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("descriptions", "mounting_time"),
+    ("image_urls", "images"),
+    ("document_urls", "documents"),
+)
+DERIVED_META_FIELDS: Tuple[Tuple[str, str], ...] = (("eu_tire_label_html", "price_meta"),)
+
+
+def text_to_html(text: str) -> str:
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines:
+        return ""
+    return "<br>".join(lines)
+
+
+def render_eu_tire_label_html(entries: List[Dict[str, str]]) -> Optional[str]:
+    if not entries:
+        return None
+    html_parts = [
+        "<table>",
+        "<thead><tr><th>Category</th><th>Position</th><th>Value</th></tr></thead>",
+        "<tbody>",
+    ]
+    for entry in entries:
+        label = entry.get("label", "")
+        for key, value in entry.items():
+            if key == "label" or not value:
+                continue
+            html_parts.append(
+                f"<tr><td>{label}</td><td>{key}</td><td>{value}</td></tr>"
+            )
+    html_parts.append("</tbody></table>")
+    return "".join(html_parts)
+
+
+def build_description_content(
+    product_information: List[Dict[str, str]],
+    eu_tire_label_html: Optional[str],
+    documents: List[Dict[str, str]],
+    manufacturer_info: Optional[str],
+    product_url: str,
+) -> Dict[str, Optional[str]]:
+    short_html: Optional[str] = None
+    short_text: Optional[str] = None
+    sections_html: List[str] = []
+
+    for section in product_information:
+        title = section.get("title")
+        section_html = (section.get("html") or "").strip()
+        section_text = section.get("text") or ""
+        if not section_html and section_text:
+            section_html = text_to_html(section_text)
+        if not short_html and section_html:
+            short_html = section_html
+            short_text = section_text or None
+        if title:
+            sections_html.append(f"<h3>{title}</h3>")
+        if section_html:
+            sections_html.append(section_html)
+
+    if eu_tire_label_html:
+        sections_html.append("<h3>EU Tire Label</h3>")
+        sections_html.append(eu_tire_label_html)
+
+    doc_items: List[str] = []
+    for doc in documents:
+        url = doc.get("url")
+        label = doc.get("label") or url
+        if not url:
+            continue
+        doc_items.append(f'<li><a href="{url}">{label}</a></li>')
+    if doc_items:
+        sections_html.append("<h3>Documentation</h3>")
+        sections_html.append(f"<ul>{''.join(doc_items)}</ul>")
+
+    if manufacturer_info:
+        sections_html.append("<h3>Manufacturer Information</h3>")
+        sections_html.append(text_to_html(manufacturer_info))
+
+    if product_url:
+        sections_html.append(
+            f'<p><a href="{product_url}">Original AC Schnitzer listing</a></p>'
+        )
+
+    full_html = "\n".join(sections_html).strip()
+
+    return {
+        "short_html": short_html or None,
+        "short_text": short_text,
+        "full_html": full_html or None,
+    }
+
+
+def derive_image_urls(product: Dict[str, Any]) -> List[str]:
+    gallery = (product.get("images") or {}).get("gallery") or []
+    return [entry.get("primary") for entry in gallery if entry.get("primary")]
+
+
+def derive_document_urls(product: Dict[str, Any]) -> List[str]:
+    return [doc["url"] for doc in product.get("documents") or [] if doc.get("url")]
+
+
+def derive_eu_tire_label_html(product: Dict[str, Any]) -> Optional[str]:
+    return render_eu_tire_label_html(product.get("eu_tire_label") or [])
+
+
+def derive_descriptions(product: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    return build_description_content(
+        product_information=product.get("product_information") or [],
+        eu_tire_label_html=derive_eu_tire_label_html(product),
+        documents=product.get("documents") or [],
+        manufacturer_info=product.get("manufacturer_info"),
+        product_url=product.get("url") or "",
+    )
+
+
+DERIVERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "descriptions": derive_descriptions,
+    "image_urls": derive_image_urls,
+    "document_urls": derive_document_urls,
+}
+META_DERIVERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "eu_tire_label_html": derive_eu_tire_label_html,
+}
+
+
+def is_compact(product: Dict[str, Any]) -> bool:
+    return not any(field in product for field in DERIVERS)
+
+
+def _insert_derived(
+    source: Dict[str, Any],
+    product: Dict[str, Any],
+    derivers: Dict[str, Callable[[Dict[str, Any]], Any]],
+    anchors: Tuple[Tuple[str, str], ...],
+) -> Dict[str, Any]:
+    """Copies `source`, placing each missing derived field right after its anchor key."""
+    missing = {field: anchor for field, anchor in anchors if field not in source}
+    if not missing:
+        return source
+    derived = {field: derivers[field](product) for field in missing}
+    result: Dict[str, Any] = {}
+    for key, value in source.items():
+        result[key] = value
+        for field, anchor in missing.items():
+            if anchor == key:
+                result[field] = derived[field]
+    for field in missing:
+        result.setdefault(field, derived[field])
+    return result
+
+
+def compact_record(product: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Drops the fields that expand_record() can rebuild. A stored value that differs
+    from what would be derived (e.g. a record edited by hand) is kept, so
+    compacting never loses data.
+    """
+    compact = {
+        key: value
+        for key, value in product.items()
+        if key not in DERIVERS or value != DERIVERS[key](product)
+    }
+    meta = product.get("meta")
+    if isinstance(meta, dict):
+        compact["meta"] = {
+            key: value
+            for key, value in meta.items()
+            if key not in META_DERIVERS or value != META_DERIVERS[key](product)
+        }
+    return compact
+
+
+def expand_record(product: Dict[str, Any]) -> Dict[str, Any]:
+    """Presents a record in the legacy (version 1) shape, deriving any missing fields."""
+    expanded = _insert_derived(product, product, DERIVERS, DERIVED_FIELDS)
+    meta = expanded.get("meta")
+    if isinstance(meta, dict):
+        expanded_meta = _insert_derived(meta, product, META_DERIVERS, DERIVED_META_FIELDS)
+        if expanded_meta is not meta:
+            expanded = dict(expanded)
+            expanded["meta"] = expanded_meta
+    return expanded
+
+
+def catalog_schema_version(products: Dict[str, Dict[str, Any]]) -> int:
+    """SCHEMA_VERSION when every record is compact, LEGACY_SCHEMA_VERSION otherwise."""
+    for items in products.values():
+        if not all(is_compact(product) for product in items.values()):
+            return LEGACY_SCHEMA_VERSION
+    return SCHEMA_VERSION
+
+
+def compact_products(products: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    return {
+        brand: {url: compact_record(product) for url, product in items.items()}
+        for brand, items in products.items()
+    }
+
+
+def expand_products(products: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    return {
+        brand: {url: expand_record(product) for url, product in items.items()}
+        for brand, items in products.items()
+    }
+
+
+def is_removed(product: Dict[str, Any]) -> bool:
+    """True for a tombstoned product, one that has left the sitemap (kept, but not exported)."""
+    meta = product.get("meta")
+    return isinstance(meta, dict) and bool(meta.get("removed_at"))
+
+
+def set_removed(product: Dict[str, Any], removed_at: Optional[str]) -> bool:
+    """
+    Tombstones a product in place with the date it left the sitemap, or with None
+    lifts its tombstone. Returns True if the record changed.
+    """
+    meta = product.get("meta")
+    if removed_at is None:
+        if not isinstance(meta, dict) or "removed_at" not in meta:
+            return False
+        del meta["removed_at"]
+        return True
+    if isinstance(meta, dict) and meta.get("removed_at"):
+        return False  # keep the date it was first removed
+    if not isinstance(meta, dict):
+        meta = product["meta"] = {}
+    meta["removed_at"] = removed_at
+    return True
@@ -0,0 +1,73 @@
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """Classic token bucket: refills `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1.0) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Blocks until `tokens` are available. Returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                sleep_for = (tokens - self._tokens) / self.rate
+            time.sleep(sleep_for)
+            waited += sleep_for
+
+
+class HostRateLimiter:
+    """
+    Keeps one token bucket per host so concurrent workers stay polite
+    towards each server while requests to different hosts don't wait on each other.
+    A rate of None disables limiting entirely.
+    """
+
+    def __init__(self, rate: Optional[float], burst: float = 1.0) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_delay(cls, delay: float, burst: float = 1.0) -> "HostRateLimiter":
+        """Builds a limiter that averages one request per `delay` seconds per host."""
+        return cls(rate=1.0 / delay if delay > 0 else None, burst=burst)
+
+    def bucket_for(self, url: str) -> Optional[TokenBucket]:
+        if self.rate is None:
+            return None
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url: str) -> float:
+        bucket = self.bucket_for(url)
+        if bucket is None:
+            return 0.0
+        return bucket.acquire()
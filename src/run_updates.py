@@ -1,20 +1,27 @@
-import gzip
+import argparse
 import json
-import os
-import shutil
-import subprocess
 import sys
-import xml.etree.ElementTree as ET
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-import requests
 from rich.console import Console
 from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn, TimeElapsedColumn
 from rich.theme import Theme
 
+import http_client
+import serialization
+from catalog_snapshots import write_snapshot
+from catalog_shards import SHARD_DIR, open_shards
+from catalog_store import CATALOG_DB, catalog_backend, normalize_slug, open_catalog
+from content_fingerprint import Fingerprint, load_baseline
+from product_model import ProductRecord
+from product_schema import set_removed
+from sitemap_diff import SitemapDiff, catalog_snapshot, diff_snapshots, iter_snapshot, save_snapshot, sitemap_snapshot
+from sitemap_diff import SNAPSHOT_FILE as SITEMAP_SNAPSHOT_FILE
+from sitemap_fetch import SitemapSet, fetch_sitemaps, prune_cache
+from slug_index import SlugIndex, load_slug_index, slug_index_path
+
 # Define custom theme
 custom_theme = Theme({
     "info": "cyan",
@@ -27,88 +34,72 @@ custom_theme = Theme({
 console = Console(theme=custom_theme)
 
 # Constants
+# The shop's sitemap. A sitemap index works too (--sitemap): its children are
+# fetched concurrently. Switch the default to the shop's index once its URL is confirmed.
 SITEMAP_URL = "https://www.ac-schnitzer.de/web/sitemap/shop-3/sitemap-1.xml.gz"
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
 OUTPUT_DIR = BASE_DIR / "output"
-SRC_DIR = BASE_DIR / "src"
 
-SITEMAP_GZ = DATA_DIR / "sitemap-1.xml.gz"
-SITEMAP_XML = DATA_DIR / "sitemap-1.xml"
 PRODUCT_DETAILS_FILE = DATA_DIR / "product_details.json"
-UPDATED_PRODUCTS_JSON = DATA_DIR / "updated_products.json"
-UPDATED_PRODUCT_DETAILS_JSON = DATA_DIR / "updated_product_details.json"
+# Scrape journal of the products a run scraped; it outlives an interrupted run, which the next one resumes
+SCRAPE_JOURNAL = DATA_DIR / "updated_product_details.jsonl"
 UPDATED_CSV = OUTPUT_DIR / "woocommerce_products_updated.csv"
+# ETag / Last-Modified / sha256 of every sitemap (index and children) the last completed run used
+SITEMAP_STATE_FILE = DATA_DIR / "sitemap_state.json"
 
-def download_sitemap():
-    """Downloads the sitemap gz file."""
-    console.print(f"[info]Downloading sitemap from {SITEMAP_URL}...[/info]")
+def load_sitemap_state() -> Dict[str, Any]:
+    """{sitemap url: validators} of the last completed run."""
     try:
-        response = requests.get(SITEMAP_URL, stream=True)
-        response.raise_for_status()
-        with open(SITEMAP_GZ, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        console.print("[success]Sitemap downloaded successfully.[/success]")
-        return True
-    except Exception as e:
-        console.print(f"[error]Failed to download sitemap: {e}[/error]")
-        return False
+        return serialization.load(SITEMAP_STATE_FILE)
+    except (OSError, ValueError):
+        return {}
+
+def save_sitemap_state(validators: Dict[str, Dict[str, Any]]) -> None:
+    """Stores the validators of every sitemap once a run has fully processed them."""
+    if not validators:
+        return
+    serialization.dump(validators, SITEMAP_STATE_FILE, atomic=True)
+    # Children that left the index no longer need their cached URLs
+    prune_cache(list(validators))
 
-def extract_sitemap():
-    """Extracts the sitemap gz file and deletes the archive."""
-    console.print("[info]Extracting sitemap...[/info]")
+def record_sitemap(sitemaps: SitemapSet, snapshot: List[Tuple[str, str]]) -> None:
+    """
+    Remembers the sitemaps a run completed with: their validators for the next
+    conditional download and their snapshot for the next diff.
+    """
+    save_snapshot(snapshot, SITEMAP_SNAPSHOT_FILE)
+    save_sitemap_state(sitemaps.validators)
+
+def fetch_sitemap(source: str = SITEMAP_URL, state: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, str], Optional[SitemapSet]]:
+    """
+    Streams the sitemap index and all of its child sitemaps (concurrently,
+    decompressed and parsed as they download) and returns {url: lastmod} of the
+    product pages, with the fetched set. `state` holds the validators of the last
+    run: children answering 304 or hashing the same are read from their cache,
+    and if none changed, `sitemaps.unchanged` is set.
+    """
+    console.print(f"[info]Streaming sitemaps from {source}...[/info]")
     try:
-        with gzip.open(SITEMAP_GZ, 'rb') as f_in:
-            with open(SITEMAP_XML, 'wb') as f_out:
-                shutil.copyfileobj(f_in, f_out)
-        
-        # Remove the gz file
-        os.remove(SITEMAP_GZ)
-        console.print("[success]Sitemap extracted and gz file deleted.[/success]")
-        return True
+        sitemaps = fetch_sitemaps(source, state)
     except Exception as e:
-        console.print(f"[error]Failed to extract sitemap: {e}[/error]")
-        return False
-
-def parse_sitemap(xml_path: Path) -> Dict[str, str]:
-    """Parses the sitemap.xml and returns a dictionary of {url: lastmod}."""
-    if not xml_path.exists():
-        console.print(f"[error]Error: {xml_path} not found.[/error]")
-        return {}
+        console.print(f"[error]Failed to read sitemap: {e}[/error]")
+        return {}, None
 
     url_map = {}
     skipped_categories = 0
-    try:
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
-        
-        # Handle namespace
-        ns = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-        
-        # Find all url entries
-        urls = root.findall('ns:url', ns)
-        
-        for url_entry in urls:
-            loc = url_entry.find('ns:loc', ns)
-            lastmod = url_entry.find('ns:lastmod', ns)
-            
-            if loc is not None and lastmod is not None:
-                url = loc.text.strip()
-                
-                # Skip category/listing pages
-                if is_category_page(url):
-                    skipped_categories += 1
-                    continue
-                    
-                url_map[url] = lastmod.text.strip()
-                
+    for url, lastmod in sitemaps.urls.items():
+        # Skip category/listing pages
+        if is_category_page(url):
+            skipped_categories += 1
+            continue
+        url_map[url] = lastmod
+
+    changed = sitemaps.sitemap_count - sitemaps.unchanged_count
+    console.print(f"[info]{changed} of {sitemaps.sitemap_count} sitemap files changed since the last run.[/info]")
+    if not sitemaps.unchanged:
         console.print(f"[success]Parsed {len(url_map)} product URLs from sitemap (skipped {skipped_categories} category pages).[/success]")
-        return url_map
-
-    except Exception as e:
-        console.print(f"[error]Error parsing XML: {e}[/error]")
-        return {}
+    return url_map, sitemaps
 
 def normalize_url(url: str) -> str:
     """
@@ -120,11 +111,7 @@ def normalize_url(url: str) -> str:
     .../372/slug/ -> slug
     """
     try:
-        # Strip query params and trailing slash
-        clean_path = url.split('?')[0].rstrip('/')
-        # Get the last segment (slug)
-        slug = clean_path.split('/')[-1]
-        return slug
+        return normalize_slug(url)
     except Exception:
         return url
 
@@ -154,107 +141,120 @@ def is_category_page(url: str) -> bool:
     except Exception:
         return False
 
-def get_existing_products(json_path: Path) -> Dict[str, List[str]]:
+def get_existing_products(json_path: Path) -> SlugIndex:
     """
-    Loads existing products from json.
-    Returns a dict mapping normalized_url -> list of original_urls.
+    Loads the slug index of the existing products: normalized_url -> original
+    urls and newest lastmod. Only the small sidecar index is read; the catalog
+    is streamed once to rebuild it if it is missing or stale.
     """
+    if catalog_backend() == "sqlite":
+        return get_existing_products_from_catalog(json_path)
+    if catalog_backend() == "shards":
+        # Same index, stamped against the shard manifest instead of the JSON file
+        json_path = open_shards(SHARD_DIR, legacy_json=json_path).manifest_path
+
     console.print(f"[info]Checking for existing products at: {json_path.absolute()}[/info]")
     
     if not json_path.exists():
         console.print(f"[warning]{json_path} not found. Assuming no existing products.[/warning]")
-        return {}
+        return SlugIndex()
     
     try:
-        console.print(f"[info]Loading existing products from {json_path.name}...[/info]")
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        products_map = {}
-        if 'products' in data:
-            for brand, items in data['products'].items():
-                for url, details in items.items():
-                    norm_url = normalize_url(url)
-                    if norm_url not in products_map:
-                        products_map[norm_url] = []
-                    # Store tuple of (original_url, details) or just original_url?
-                    # We need details to check lastmod.
-                    # Let's store the details directly in a wrapper or just reference the dict in memory?
-                    # Since we loaded 'data' into memory, we can store references to the 'details' dict.
-                    products_map[norm_url].append({'url': url, 'details': details})
-        
-        console.print(f"[success]Loaded {len(products_map)} unique products from existing database.[/success]")
-        return products_map
+        index, rebuilt = load_slug_index(json_path)
+        if rebuilt:
+            console.print(f"[info]Rebuilt slug index {slug_index_path(json_path).name} from {json_path.name}[/info]")
+        console.print(f"[success]Loaded {len(index)} unique products from existing database.[/success]")
+        return index
     except json.JSONDecodeError as e:
         console.print(f"[error]Error parsing JSON from {json_path}: {e}[/error]")
-        return {}
+        return SlugIndex()
     except Exception as e:
         console.print(f"[error]Error loading existing products from {json_path.absolute()}: {e}[/error]")
-        return {}
+        return SlugIndex()
+
+def get_existing_products_from_catalog(json_path: Path) -> SlugIndex:
+    """Same index as get_existing_products, read from the slug/lastmod columns of the SQLite catalog."""
+    console.print(f"[info]Loading existing products from catalog {CATALOG_DB.name}...[/info]")
+    index = SlugIndex()
+    with open_catalog(CATALOG_DB, legacy_json=json_path) as store:
+        for entries in store.lastmod_by_slug().values():
+            for url, lastmod in entries:
+                index.add(url, lastmod)
+    console.print(f"[success]Loaded {len(index)} unique products from catalog.[/success]")
+    return index
+
+def identify_updates(sitemap_urls: Dict[str, str], existing_index: SlugIndex) -> List[str]:
+    """
+    Identifies URLs that need to be scraped: one URL per new product, or per
+    known product whose sitemap lastmod is newer than any stored one. Runs as
+    one vectorized pandas merge of the sitemap against the slug index (see
+    update_detection).
+    """
+    # Imported here, like price_history: only runs whose sitemap changed need pandas
+    import update_detection
 
-def identify_updates(sitemap_urls: Dict[str, str], existing_products_map: Dict[str, List[Dict]]) -> List[str]:
-    """Identifies URLs that need to be scraped."""
-    updates = []
-    seen_normalized = set()
-    
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        TaskProgressColumn(),
-        console=console
-    ) as progress:
-        task = progress.add_task("[cyan]Checking for updates...", total=len(sitemap_urls))
-        
-        for url, lastmod in sitemap_urls.items():
-            norm_url = normalize_url(url)
-            
-            # Deduplication: If we've already marked this product (normalized) for update, skip other variations
-            if norm_url in seen_normalized:
-                progress.advance(task)
-                continue
-            
-            if norm_url in existing_products_map:
-                # Check against all matching existing products (usually just one)
-                # If ANY of them is up-to-date, we might consider it up-to-date?
-                # Or if ALL are stale?
-                # Usually there's one match.
-                
-                needs_update = False
-                # If we find a match, we compare dates.
-                # If sitemap date > existing date, we update.
-                
-                # We assume the sitemap URL corresponds to the "current" version of the product.
-                # We check the max lastmod of existing matches?
-                
-                # Let's check if *any* existing match has the same or newer date.
-                is_up_to_date = False
-                for entry in existing_products_map[norm_url]:
-                    existing_lastmod = entry['details'].get('lastmod')
-                    if existing_lastmod and lastmod and existing_lastmod >= lastmod:
-                        is_up_to_date = True
-                        break
-                
-                if not is_up_to_date:
-                    updates.append(url)
-                    seen_normalized.add(norm_url)
-            else:
-                # New product
-                updates.append(url)
-                seen_normalized.add(norm_url)
-            
-            progress.advance(task)
-            
-    return updates
+    with console.status(f"[cyan]Checking {len(sitemap_urls)} sitemap URLs for updates...[/cyan]"):
+        return update_detection.identify_updates(sitemap_urls, existing_index)
+
+def diff_sitemap(sitemap_urls: Dict[str, str], existing_index: SlugIndex) -> Tuple[SitemapDiff, List[Tuple[str, str]]]:
+    """
+    Merge-diffs the sitemap against the snapshot saved by the last completed run
+    (the catalog itself on the first run). Returns the diff and the sitemap's own
+    snapshot, to save once this run completes.
+    """
+    current = sitemap_snapshot(sitemap_urls)
+    if SITEMAP_SNAPSHOT_FILE.exists():
+        changes = diff_snapshots(iter_snapshot(SITEMAP_SNAPSHOT_FILE), current)
+    else:
+        # Category pages never make it into sitemap_urls, so leave them out of both sides
+        baseline = [item for item in catalog_snapshot(existing_index) if not is_category_page(item[0])]
+        changes = diff_snapshots(baseline, current)
+    console.print(f"[info]Sitemap diff: {changes.summary()} products.[/info]")
+    return changes, current
+
+def slug_index_for(json_path: Path, data: Dict) -> SlugIndex:
+    """The saved slug index of json_path, or one built from its already loaded data."""
+    index = SlugIndex.read(slug_index_path(json_path), json_path)
+    if index is None:
+        index = SlugIndex.from_products(
+            (url, details)
+            for items in data.get('products', {}).values()
+            for url, details in items.items()
+        )
+    return index
+
+def update_product_details_lastmod(json_path: Path, sitemap_urls: Dict[str, str], removed_at_by_slug: Optional[Dict[str, Optional[str]]] = None) -> bool:
+    """
+    Updates the lastmod dates in the main product_details.json file, and
+    tombstones (or restores) the products in `removed_at_by_slug`.
+    Returns False if the catalog could not be updated.
+    """
+    removed_at_by_slug = removed_at_by_slug or {}
+    if catalog_backend() == "sqlite":
+        try:
+            with open_catalog(CATALOG_DB, legacy_json=json_path) as store:
+                updated_count = store.set_lastmod_by_slug(
+                    {normalize_url(url): lastmod for url, lastmod in sitemap_urls.items()}
+                )
+                console.print(f"[success]Updated lastmod dates for {updated_count} products in {CATALOG_DB.name}[/success]")
+                if removed_at_by_slug:
+                    marked = store.set_removed_by_slug(removed_at_by_slug)
+                    console.print(f"[info]Tombstoned or restored {marked} products in {CATALOG_DB.name}[/info]")
+                # Legacy JSON export for the converter and batch export; skipped when nothing changed.
+                if store.export_if_stale(json_path) is not None:
+                    console.print(f"[info]Exported catalog to {json_path.name}[/info]")
+        except Exception as e:
+            console.print(f"[error]Failed to update lastmod in {CATALOG_DB.name}: {e}[/error]")
+            return False
+        return True
+    if catalog_backend() == "shards":
+        return update_shards_lastmod(json_path, sitemap_urls, removed_at_by_slug)
 
-def update_product_details_lastmod(json_path: Path, sitemap_urls: Dict[str, str]):
-    """Updates the lastmod dates in the main product_details.json file."""
     if not json_path.exists():
-        return
+        return True
 
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = serialization.load(json_path)
             
         # Build a map of normalized sitemap URLs to (original_sitemap_url, lastmod)
         sitemap_norm_map = {}
@@ -262,10 +262,14 @@ def update_product_details_lastmod(json_path: Path, sitemap_urls: Dict[str, str]
             sitemap_norm_map[normalize_url(url)] = lastmod
 
         updated_count = 0
+        marked_count = 0
         if 'products' in data:
             for brand, items in data['products'].items():
                 for url, details in items.items():
                     norm_url = normalize_url(url)
+
+                    if norm_url in removed_at_by_slug and set_removed(details, removed_at_by_slug[norm_url]):
+                        marked_count += 1
                     
                     if norm_url in sitemap_norm_map:
                         new_lastmod = sitemap_norm_map[norm_url]
@@ -275,35 +279,112 @@ def update_product_details_lastmod(json_path: Path, sitemap_urls: Dict[str, str]
                             details['lastmod'] = new_lastmod
                             updated_count += 1
 
-        with open(json_path, 'w', encoding='utf-8', newline='') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-            f.flush()
-            os.fsync(f.fileno())
+        index = slug_index_for(json_path, data)
+        for norm_url, lastmod in sitemap_norm_map.items():
+            index.set_lastmod(norm_url, lastmod)
+
+        write_snapshot(data, json_path)
+        index.save(slug_index_path(json_path), json_path)
             
         console.print(f"[success]Updated lastmod dates for {updated_count} products in {json_path.name}[/success]")
+        if marked_count:
+            console.print(f"[info]Tombstoned or restored {marked_count} products in {json_path.name}[/info]")
             
     except Exception as e:
         console.print(f"[error]Failed to update lastmod in product_details.json: {e}[/error]")
+        return False
+    return True
 
-def merge_updates(main_file: Path, updates_file: Path, sitemap_urls: Dict[str, str]):
-    """Merges scraped updates into the main product details file."""
+def update_shards_lastmod(json_path: Path, sitemap_urls: Dict[str, str], removed_at_by_slug: Optional[Dict[str, Optional[str]]] = None) -> bool:
+    """update_product_details_lastmod for the shard catalog: only shards with a changed lastmod or tombstone are rewritten."""
+    try:
+        catalog = open_shards(SHARD_DIR, legacy_json=json_path)
+        index, _ = load_slug_index(catalog.manifest_path)
+        sitemap_norm_map = {normalize_url(url): lastmod for url, lastmod in sitemap_urls.items()}
+        written = catalog.set_lastmod_by_slug(sitemap_norm_map)
+        if written:
+            for norm_url, lastmod in sitemap_norm_map.items():
+                index.set_lastmod(norm_url, lastmod)
+            index.save(slug_index_path(catalog.manifest_path), catalog.manifest_path)
+        console.print(f"[success]Updated lastmod dates in {len(written)} of {len(catalog.shards())} shards[/success]")
+        if removed_at_by_slug:
+            marked = catalog.set_removed_by_slug(removed_at_by_slug)
+            if marked:
+                # The manifest was rewritten; keep the slug index stamped against it
+                index.save(slug_index_path(catalog.manifest_path), catalog.manifest_path)
+            console.print(f"[info]Tombstoned or restored products in {len(marked)} shards[/info]")
+    except Exception as e:
+        console.print(f"[error]Failed to update lastmod in the shard catalog: {e}[/error]")
+        return False
+    return True
+
+def stamp_sitemap_lastmod(updates: Dict, sitemap_urls: Dict[str, str]) -> None:
+    """Sets each scraped record's lastmod from the sitemap, in place, normalizing it through ProductRecord."""
+    sitemap_norm_map = {normalize_url(url): lastmod for url, lastmod in sitemap_urls.items()}
+    for brand, items in updates.items():
+        for url, details in items.items():
+            record = ProductRecord.from_dict(details)
+            lastmod = sitemap_norm_map.get(normalize_url(url))
+            if lastmod:
+                record.lastmod = lastmod
+            items[url] = record.to_dict()
+
+def merge_updates(main_file: Path, updates: Dict[str, Dict[str, Any]], sitemap_urls: Dict[str, str]) -> bool:
+    """
+    Merges scraped updates ({brand: {url: product}}) into the main product details file.
+    Returns False if the merge failed.
+    With the SQLite backend only changed rows are upserted; the legacy JSON is
+    re-exported by update_product_details_lastmod, which the pipeline runs next.
+    With the shard backend only the shards holding changed products are rewritten.
+    """
     console.print(Panel("[bold magenta]Merging Updates into Main Database...[/bold magenta]"))
-    
-    if not updates_file.exists():
-        console.print(f"[error]Updates file {updates_file} not found. Skipping merge.[/error]")
-        return
+
+    if catalog_backend() == "sqlite":
+        try:
+            stamp_sitemap_lastmod(updates, sitemap_urls)
+            with open_catalog(CATALOG_DB, legacy_json=main_file) as store:
+                written = store.upsert_products(updates)
+                # Each product is stored once: drop its rows under other URLs
+                written += store.remove_aliases(url for items in updates.values() for url in items)
+            total = sum(len(items) for items in updates.values())
+            console.print(f"[success]Merged {total} products into {CATALOG_DB.name} ({written} rows changed)[/success]")
+        except Exception as e:
+            console.print(f"[error]Failed to merge updates: {e}[/error]")
+            return False
+        return True
+
+    if catalog_backend() == "shards":
+        try:
+            stamp_sitemap_lastmod(updates, sitemap_urls)
+            catalog = open_shards(SHARD_DIR, legacy_json=main_file)
+            index, _ = load_slug_index(catalog.manifest_path)
+            # Each product is stored once: drop its records under other URLs
+            stale_urls = []
+            for items in updates.values():
+                for url, details in items.items():
+                    stale = index.remove(normalize_url(url))
+                    stale_urls.extend(u for u in (stale.urls if stale else []) if u != url)
+                    index.add_product(url, details)
+            written = catalog.upsert_products(updates, remove_urls=stale_urls)
+            index.save(slug_index_path(catalog.manifest_path), catalog.manifest_path)
+            total = sum(len(items) for items in updates.values())
+            console.print(
+                f"[success]Merged {total} products into {SHARD_DIR.name}/ "
+                f"({len(written)} of {len(catalog.shards())} shards rewritten)[/success]"
+            )
+        except Exception as e:
+            console.print(f"[error]Failed to merge updates: {e}[/error]")
+            return False
+        return True
 
     try:
         # Load main file
         if main_file.exists():
-            with open(main_file, 'r', encoding='utf-8') as f:
-                main_data = json.load(f)
+            main_data = serialization.load(main_file)
         else:
             main_data = {"meta": {}, "products": {}}
 
-        # Load updates file
-        with open(updates_file, 'r', encoding='utf-8') as f:
-            updates_data = json.load(f)
+        index = slug_index_for(main_file, main_data)
 
         merged_count = 0
         
@@ -312,113 +393,99 @@ def merge_updates(main_file: Path, updates_file: Path, sitemap_urls: Dict[str, s
         for url, lastmod in sitemap_urls.items():
             sitemap_norm_map[normalize_url(url)] = lastmod
 
-        if 'products' in updates_data:
-            for brand, items in updates_data['products'].items():
-                if brand not in main_data['products']:
-                    main_data['products'][brand] = {}
+        for brand, items in updates.items():
+            if brand not in main_data['products']:
+                main_data['products'][brand] = {}
+
+            for url, details in items.items():
+                record = ProductRecord.from_dict(details)
                 
-                for url, details in items.items():
-                    # Update the product data
-                    main_data['products'][brand][url] = details
-                    
-                    # Ensure lastmod is set correctly from sitemap
-                    norm_url = normalize_url(url)
-                    if norm_url in sitemap_norm_map:
-                        main_data['products'][brand][url]['lastmod'] = sitemap_norm_map[norm_url]
-                        # console.print(f"[debug]Set lastmod for {norm_url}[/debug]") # Too verbose
-                    else:
-                        console.print(f"[warning]Could not find lastmod for {url} (norm: {norm_url})[/warning]")
-                    
-                    merged_count += 1
+                # Ensure lastmod is set correctly from sitemap
+                norm_url = normalize_url(url)
+                if norm_url in sitemap_norm_map:
+                    record.lastmod = sitemap_norm_map[norm_url]
+                    # console.print(f"[debug]Set lastmod for {norm_url}[/debug]") # Too verbose
+                else:
+                    console.print(f"[warning]Could not find lastmod for {url} (norm: {norm_url})[/warning]")
+                
+                # Each product is stored once: drop its records under other URLs
+                stale = index.remove(norm_url)
+                for stale_url in (stale.urls if stale else []):
+                    if stale_url != url:
+                        for brand_items in main_data['products'].values():
+                            brand_items.pop(stale_url, None)
+                
+                # Update the product data
+                main_data['products'][brand][url] = record.to_dict()
+                index.add_product(url, main_data['products'][brand][url])
+                merged_count += 1
 
         # Update meta
         main_data['meta']['generated_at'] = datetime.utcnow().isoformat()
         main_data['meta']['total_products'] = sum(len(items) for items in main_data['products'].values())
         main_data['meta']['brand_counts'] = {b: len(i) for b, i in main_data['products'].items()}
 
-        # Save main file
-        with open(main_file, 'w', encoding='utf-8', newline='') as f:
-            json.dump(main_data, f, indent=2, ensure_ascii=False)
-            f.flush()
-            os.fsync(f.fileno())
+        # Publish a new snapshot of the main file, then the slug index describing it
+        write_snapshot(main_data, main_file)
+        index.save(slug_index_path(main_file), main_file)
             
         console.print(f"[success]Merged {merged_count} products into {main_file.name}[/success]")
 
     except Exception as e:
         console.print(f"[error]Failed to merge updates: {e}[/error]")
+        return False
+    return True
 
-def main():
-    console.print(Panel.fit("[bold blue]AC Schnitzer Update Workflow[/bold blue]", subtitle="v1.4"))
-    
-    # 1. Download and Extract Sitemap
-    if not download_sitemap():
-        return
-    if not extract_sitemap():
-        return
-        
-    # 2. Parse Sitemap
-    sitemap_urls = parse_sitemap(SITEMAP_XML)
-    if not sitemap_urls:
-        console.print("[error]No URLs found in sitemap. Aborting.[/error]")
-        return
-
-    # 3. Load Existing Products
-    existing_products_map = get_existing_products(PRODUCT_DETAILS_FILE)
-    
-    # 4. Identify Updates
-    updated_urls = identify_updates(sitemap_urls, existing_products_map)
-    
-    if not updated_urls:
-        console.print("[success]No updates found. All products are up to date.[/success]")
-        # Still update lastmod in main file just in case
-        update_product_details_lastmod(PRODUCT_DETAILS_FILE, sitemap_urls)
-        return
+def record_price_history(updates: Dict[str, Dict[str, Any]]):
+    """
+    Appends the price and stock changes of this run's scraped products ({brand: {url: product}}) to the Parquet history in
+    data/price_history. The first run records the whole catalog as it was
+    before the merge, so later changes have a previous value.
+    """
+    # Imported here: pandas alone takes longer to import than a run whose
+    # sitemap did not change takes end to end
+    import price_history
 
-    console.print(f"[highlight]Found {len(updated_urls)} products to update/add.[/highlight]")
-    
-    # 5. Save Updated Products List
-    with open(UPDATED_PRODUCTS_JSON, 'w', encoding='utf-8') as f:
-        json.dump({"products": updated_urls}, f, indent=2)
-    console.print(f"[info]Saved updated product list to {UPDATED_PRODUCTS_JSON.name}[/info]")
-
-    # 6. Run Scraper
-    console.print(Panel("[bold magenta]Starting Scraper for Updated Products...[/bold magenta]"))
-    scrape_cmd = [
-        sys.executable,
-        str(SRC_DIR / "scrape_products.py"),
-        "--input_links", str(UPDATED_PRODUCTS_JSON),
-        "--output", str(UPDATED_PRODUCT_DETAILS_JSON)
-    ]
-    
     try:
-        subprocess.run(scrape_cmd, check=True)
-    except subprocess.CalledProcessError as e:
-        console.print(f"[error]Scraping failed: {e}[/error]")
-        return
+        if not price_history.has_history():
+            catalog = baseline_path()
+            if catalog.exists():
+                seeded = price_history.record_run(price_history.iter_catalog_products(catalog))
+                console.print(f"[info]Started price history with {seeded} products from {catalog.name}[/info]")
+        written = price_history.record_run(
+            (url, details) for items in updates.values() for url, details in items.items()
+        )
+        console.print(f"[info]Recorded {written} price/stock changes in {price_history.HISTORY_DIR.name}/[/info]")
+    except Exception as e:
+        console.print(f"[error]Failed to record price history: {e}[/error]")
 
-    # 7. Merge Updates into Main DB
-    merge_updates(PRODUCT_DETAILS_FILE, UPDATED_PRODUCT_DETAILS_JSON, sitemap_urls)
-    
-    # 8. Update lastmod in main file (after successful scrape and merge)
-    update_product_details_lastmod(PRODUCT_DETAILS_FILE, sitemap_urls)
-
-    # 9. Run Converter
-    console.print(Panel("[bold magenta]Converting Updated Products to CSV...[/bold magenta]"))
-    convert_cmd = [
-        sys.executable,
-        str(SRC_DIR / "convert_products_to_csv.py"),
-        "--input", str(UPDATED_PRODUCT_DETAILS_JSON),
-        "--output", str(UPDATED_CSV)
-    ]
-    
-    try:
-        subprocess.run(convert_cmd, check=True)
-        console.print(f"[success]Successfully generated {UPDATED_CSV.name}[/success]")
-    except subprocess.CalledProcessError as e:
-        console.print(f"[error]Conversion failed: {e}[/error]")
-        return
+def baseline_path() -> Path:
+    """The catalog the scraper compares against: the shard manifest with the shard backend."""
+    if catalog_backend() == "shards":
+        return open_shards(SHARD_DIR, legacy_json=PRODUCT_DETAILS_FILE).manifest_path
+    return PRODUCT_DETAILS_FILE
+
+def load_scrape_baseline(urls: List[str]) -> Dict[str, Fingerprint]:
+    """
+    The scraper's {url: Fingerprint} for the products to scrape only. The
+    sqlite backend reads them from the catalog's fingerprint column.
+    """
+    if catalog_backend() == "sqlite":
+        with open_catalog(CATALOG_DB, legacy_json=PRODUCT_DETAILS_FILE) as store:
+            return store.baseline(urls)
+    return load_baseline(baseline_path(), urls)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Scrape and convert the products that changed in the sitemap")
+    parser.add_argument("--force", action="store_true", help="Process the sitemap even if it did not change since the last run")
+    parser.add_argument("--sitemap", default=SITEMAP_URL, help=f"Sitemap or sitemap index URL, or a local file (default: {SITEMAP_URL})")
+    args = parser.parse_args(argv)
+
+    # Imported here: update_pipeline builds its stages from the helpers in this module
+    from update_pipeline import run_update
 
-    console.print(Panel.fit("[bold green]Update Workflow Completed Successfully![/bold green]"))
+    return run_update(args.sitemap, force=args.force)
 
 if __name__ == "__main__":
-    main()
+    if not main().ok:
+        sys.exit(1)
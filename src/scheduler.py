@@ -1,6 +1,6 @@
 import schedule
 import time
-import run_updates
+import update_pipeline
 import sys
 import logging
 
@@ -10,9 +10,12 @@ logging.basicConfig(stream=sys.stdout, level=logging.INFO, format='%(asctime)s -
 def job():
     logging.info("Starting scheduled daily update...")
     try:
-        # Call the main function of your existing script
-        run_updates.main()
-        logging.info("Daily update finished successfully.")
+        # Runs the whole update in this process (see update_pipeline)
+        result = update_pipeline.run_update()
+        if result.ok:
+            logging.info(f"Daily update finished successfully ({result.status}).")
+        else:
+            logging.error("Daily update failed. See the log above for details.")
     except Exception as e:
         logging.error(f"Daily update failed: {e}")
 
@@ -8,10 +8,13 @@ from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn
 from rich.table import Table
 
+from http_client import create_session, get as http_get
+import serialization
+
 # Initialize Rich console
 console = Console()
 
-def find_last_page(base_url, brand, headers):
+def find_last_page(base_url, brand, headers, session):
     """
     Finds the last page number for a brand that has products.
     First finds the highest page that returns 200, then finds the last page with products within that range.
@@ -35,7 +38,7 @@ def find_last_page(base_url, brand, headers):
             progress.update(task, description=f"Testing page {mid} for 200")
             
             try:
-                response = requests.get(url, timeout=10, headers=headers)
+                response = http_get(url, session=session, headers=headers)
                 if response.status_code == 404:
                     console.print(f"  ➡️ Page {mid}: [yellow]Not found (404)[/yellow]. Max page is lower.")
                     end = mid - 1
@@ -64,7 +67,7 @@ def find_last_page(base_url, brand, headers):
             url = f"{base_url}/{brand}/?p={page}"
             
             try:
-                response = requests.get(url, timeout=10, headers=headers)
+                response = http_get(url, session=session, headers=headers)
                 if response.status_code == 404:
                     console.print(f"  ➡️ Page {page}: [yellow]Not found (404)[/yellow].")
                     continue
@@ -112,18 +115,17 @@ def scrape_product_links(output_file="product_links.json"):
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
         'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate',
-        'Connection': 'keep-alive',
         'Upgrade-Insecure-Requests': '1',
     }
+    # One keep-alive session for every listing page; compression and timeouts come from http_client.
+    session = create_session(pool_size=1)
     base_url = "https://www.ac-schnitzer.de/en"
     brands = ["bmw", "mini", "toyota", "accessoires"]
     
     try:
-        with open(output_file, 'r') as f:
-            output_data = json.load(f)
-            product_links = output_data.get("product_links", {brand: [] for brand in brands})
-            console.print(f"✅ [green]Loaded existing links from {output_file}.[/green]")
+        output_data = serialization.load(output_file)
+        product_links = output_data.get("product_links", {brand: [] for brand in brands})
+        console.print(f"✅ [green]Loaded existing links from {output_file}.[/green]")
     except (FileNotFoundError, json.JSONDecodeError):
         product_links = {brand: [] for brand in brands}
         console.print(f"📝 [yellow]No existing file found at {output_file} or file is empty. Starting fresh.[/yellow]")
@@ -134,7 +136,7 @@ def scrape_product_links(output_file="product_links.json"):
         start_page = scrape_config["start_page_per_brand"].get(brand, scrape_config["start_page_per_brand"]["default"])
         max_pages_to_scrape = scrape_config["max_pages_per_brand"].get(brand, scrape_config["max_pages_per_brand"]["default"])
         
-        total_pages = find_last_page(base_url, brand, headers)
+        total_pages = find_last_page(base_url, brand, headers, session)
         
         if max_pages_to_scrape is None:
             max_pages_to_scrape = total_pages
@@ -156,7 +158,7 @@ def scrape_product_links(output_file="product_links.json"):
                 url = f"{base_url}/{brand}/?p={page}"
                 
                 try:
-                    response = requests.get(url, timeout=10, headers=headers)
+                    response = http_get(url, session=session, headers=headers)
                     if response.status_code == 404:
                         console.print(f"    - Page {page}: [yellow]Not found (404).[/yellow] Assuming end of category.")
                         break
@@ -187,8 +189,7 @@ def scrape_product_links(output_file="product_links.json"):
         console.print(f"💾 [bold]Finished scraping for {brand}. Saving data...[/bold]")
         link_counts = {brand: len(links) for brand, links in product_links.items()}
         output_data = {"link_counts": link_counts, "product_links": product_links}
-        with open(output_file, 'w') as f:
-            json.dump(output_data, f, indent=4)
+        serialization.dump(output_data, output_file)
         console.print(f"...{output_file} saved.")
 
     console.print(Panel("[bold green]🎉 Scraping complete for all brands! 🎉[/bold green]", expand=False))
@@ -1,13 +1,17 @@
 import argparse
 import json
+import multiprocessing
+import os
+import queue
 import re
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
 from urllib.parse import urljoin, urlparse
 
-import requests
 from bs4 import BeautifulSoup
 from requests import Session
 from rich.console import Console
@@ -20,22 +24,34 @@ from rich.progress import (
     TimeElapsedColumn,
 )
 
+import lxml_extractor
+from catalog_snapshots import write_snapshot
+from catalog_store import normalize_slug
+from content_fingerprint import Fingerprint, load_baseline, page_hash, stamp_fingerprint
+from fetch_policy import CircuitBreaker, RetryPolicy, RetryQueue, parse_retry_after
+from html_archive import HtmlArchive
+from http_cache import DEFAULT_MAX_BYTES as DEFAULT_CACHE_BYTES
+from http_cache import ResponseCache
+from http_client import create_session, get as http_get
+from product_journal import ProductJournal, compact_journal, journal_path_for, journaled_urls
+from product_model import ProductRecord
+from product_schema import catalog_schema_version
+from rate_limiter import HostRateLimiter
+import serialization
+
 console = Console()
 
 BASE_DIR = Path(__file__).resolve().parent
 PRODUCT_LINKS_FILE = BASE_DIR / "product_links.json"
 OUTPUT_FILE = BASE_DIR / "product_details.json"
-DEFAULT_HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-        "(KHTML, like Gecko) Chrome/118.0.0.0 Safari/537.36"
-    ),
-    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-    "Accept-Language": "en-US,en;q=0.9",
-    "Connection": "keep-alive",
-}
-REQUEST_TIMEOUT = 20
+CACHE_DIR = BASE_DIR.parent / "data" / "http_cache"
+ARCHIVE_DIR = BASE_DIR.parent / "data" / "html_archive"
 DEFAULT_DELAY = 0.5
+DEFAULT_CONCURRENCY = 4
+DEFAULT_BURST = 2
+DEFAULT_PARSE_WORKERS = os.cpu_count() or 1
+DEFAULT_QUEUE_SIZE = 32
+DEFAULT_ENGINE = "soup"
 
 
 def element_text(element, separator: str = " ") -> Optional[str]:
@@ -78,40 +94,19 @@ def derive_category_path(product_url: str) -> List[str]:
     return category_segments
 
 
-def text_to_html(text: str) -> str:
-    lines = [line.strip() for line in text.splitlines() if line.strip()]
-    if not lines:
-        return ""
-    return "<br>".join(lines)
-
-
 def load_links(file_path: Path) -> Dict[str, List[str]]:
     if not file_path.exists():
         raise FileNotFoundError(
             f"Could not find {file_path}. Run scrape_links.py before this script."
         )
-    with file_path.open("r", encoding="utf-8") as fp:
-        data = json.load(fp)
+    data = serialization.load(file_path)
     
     # Check if we have the standard structure or the updated_products structure
     if "product_links" in data:
         product_links = data.get("product_links")
     elif "products" in data:
-        # Handle updated_products.json structure which is just a list of urls under "products" key
-        # We need to infer brand or put them all under a generic brand
-        # For simplicity, let's try to infer brand from URL or put in "mixed"
-        product_links = {}
-        for url in data["products"]:
-            # Simple brand inference
-            brand = "unknown"
-            if "bmw" in url.lower(): brand = "bmw"
-            elif "mini" in url.lower(): brand = "mini"
-            elif "toyota" in url.lower(): brand = "toyota"
-            elif "accessoires" in url.lower(): brand = "accessoires"
-            
-            if brand not in product_links:
-                product_links[brand] = []
-            product_links[brand].append(url)
+        # A plain list of urls under "products" (as in updated_products.json)
+        product_links = group_links_by_brand(data["products"])
     else:
         raise ValueError("Invalid input file structure: missing 'product_links' or 'products' key")
         
@@ -121,11 +116,53 @@ def load_links(file_path: Path) -> Dict[str, List[str]]:
     return {brand: list(links) for brand, links in product_links.items()}
 
 
-def init_output(file_path: Path) -> Dict[str, Any]:
-    if file_path.exists():
+def group_links_by_brand(urls: List[str]) -> Dict[str, List[str]]:
+    """Groups a flat list of product URLs by a brand inferred from the URL ("unknown" if none matches)."""
+    product_links: Dict[str, List[str]] = {}
+    for url in urls:
+        # Simple brand inference
+        brand = "unknown"
+        if "bmw" in url.lower(): brand = "bmw"
+        elif "mini" in url.lower(): brand = "mini"
+        elif "toyota" in url.lower(): brand = "toyota"
+        elif "accessoires" in url.lower(): brand = "accessoires"
+
+        if brand not in product_links:
+            product_links[brand] = []
+        product_links[brand].append(url)
+    return product_links
+
+
+def collapse_links(
+    links_by_brand: Dict[str, List[str]]
+) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """
+    Collapses the URLs of one product (same slug under other category paths or
+    IDs, see normalize_slug) to the first one seen, so it is scraped and stored
+    once. Returns the canonical links per brand and {canonical url: every URL of
+    the product, canonical first}.
+    """
+    canonical_by_slug: Dict[str, str] = {}
+    category_urls: Dict[str, List[str]] = {}
+    collapsed: Dict[str, List[str]] = {}
+    for brand, urls in links_by_brand.items():
+        kept = collapsed.setdefault(brand, [])
+        for url in urls:
+            slug = normalize_slug(url)
+            canonical = canonical_by_slug.get(slug)
+            if canonical is None:
+                canonical_by_slug[slug] = url
+                category_urls[url] = [url]
+                kept.append(url)
+            elif url not in category_urls[canonical]:
+                category_urls[canonical].append(url)
+    return collapsed, category_urls
+
+
+def init_output(file_path: Optional[Path]) -> Dict[str, Any]:
+    if file_path is not None and file_path.exists():
         try:
-            with file_path.open("r", encoding="utf-8") as fp:
-                existing = json.load(fp)
+            existing = serialization.load(file_path)
             products = existing.get("products", {})
         except (json.JSONDecodeError, OSError):
             console.print(
@@ -144,24 +181,34 @@ def init_output(file_path: Path) -> Dict[str, Any]:
     }
 
 
-def fetch_page(session: Session, url: str, delay: float, retries: int = 3) -> str:
-    last_exception: Optional[Exception] = None
-    for attempt in range(1, retries + 1):
-        try:
-            response = session.get(url, timeout=REQUEST_TIMEOUT)
-            response.raise_for_status()
-            time.sleep(delay)
-            return response.text
-        except requests.RequestException as exc:
-            last_exception = exc
-            sleep_for = min(2 ** attempt, 10)
-            console.print(
-                f"    - [yellow]Attempt {attempt} failed for {url} ({exc}). Retrying in {sleep_for:.1f}s[/yellow]"
-            )
-            time.sleep(sleep_for)
-    if last_exception:
-        raise last_exception
-    raise RuntimeError("Unexpected error fetching page")
+def fetch_page(
+    session: Session,
+    url: str,
+    rate_limiter: Optional[HostRateLimiter] = None,
+    cache: Optional[ResponseCache] = None,
+) -> bytes:
+    """
+    Single fetch attempt. Failures are raised to the caller, which decides
+    whether to reschedule the URL (see fetch_policy.RetryPolicy).
+    """
+    cached = cache.get(url) if cache is not None else None
+    headers = ResponseCache.conditional_headers(cached) if cached else None
+    if rate_limiter is not None:
+        rate_limiter.acquire(url)
+    response = http_get(url, session=session, headers=headers)
+    if response.status_code == 304 and cached is not None:
+        cache.touch(url)
+        return cached.body
+    response.raise_for_status()
+    if cache is not None:
+        cache.store(
+            url,
+            response.content,
+            encoding=response.encoding,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+    return response.content
 
 
 def parse_mounting_time(soup: BeautifulSoup) -> Dict[str, Any]:
@@ -265,26 +312,6 @@ def parse_eu_tire_label(soup: BeautifulSoup) -> List[Dict[str, str]]:
     return entries
 
 
-def render_eu_tire_label_html(entries: List[Dict[str, str]]) -> Optional[str]:
-    if not entries:
-        return None
-    html_parts = [
-        "<table>",
-        "<thead><tr><th>Category</th><th>Position</th><th>Value</th></tr></thead>",
-        "<tbody>",
-    ]
-    for entry in entries:
-        label = entry.get("label", "")
-        for key, value in entry.items():
-            if key == "label" or not value:
-                continue
-            html_parts.append(
-                f"<tr><td>{label}</td><td>{key}</td><td>{value}</td></tr>"
-            )
-    html_parts.append("</tbody></table>")
-    return "".join(html_parts)
-
-
 def parse_product_information(soup: BeautifulSoup) -> List[Dict[str, str]]:
     sections: List[Dict[str, str]] = []
     for container in soup.select(".accordion__container"):
@@ -369,64 +396,6 @@ def parse_manufacturer_info(soup: BeautifulSoup) -> Optional[str]:
     return element_text(address_block, separator="\n")
 
 
-def build_description_content(
-    product_information: List[Dict[str, str]],
-    eu_tire_label_html: Optional[str],
-    documents: List[Dict[str, str]],
-    manufacturer_info: Optional[str],
-    product_url: str,
-) -> Dict[str, Optional[str]]:
-    short_html: Optional[str] = None
-    short_text: Optional[str] = None
-    sections_html: List[str] = []
-
-    for section in product_information:
-        title = section.get("title")
-        section_html = (section.get("html") or "").strip()
-        section_text = section.get("text") or ""
-        if not section_html and section_text:
-            section_html = text_to_html(section_text)
-        if not short_html and section_html:
-            short_html = section_html
-            short_text = section_text or None
-        if title:
-            sections_html.append(f"<h3>{title}</h3>")
-        if section_html:
-            sections_html.append(section_html)
-
-    if eu_tire_label_html:
-        sections_html.append("<h3>EU Tire Label</h3>")
-        sections_html.append(eu_tire_label_html)
-
-    doc_items: List[str] = []
-    for doc in documents:
-        url = doc.get("url")
-        label = doc.get("label") or url
-        if not url:
-            continue
-        doc_items.append(f'<li><a href="{url}">{label}</a></li>')
-    if doc_items:
-        sections_html.append("<h3>Documentation</h3>")
-        sections_html.append(f"<ul>{''.join(doc_items)}</ul>")
-
-    if manufacturer_info:
-        sections_html.append("<h3>Manufacturer Information</h3>")
-        sections_html.append(text_to_html(manufacturer_info))
-
-    if product_url:
-        sections_html.append(
-            f'<p><a href="{product_url}">Original AC Schnitzer listing</a></p>'
-        )
-
-    full_html = "\n".join(sections_html).strip()
-
-    return {
-        "short_html": short_html or None,
-        "short_text": short_text,
-        "full_html": full_html or None,
-    }
-
-
 def parse_variations(soup: BeautifulSoup) -> List[Dict[str, Any]]:
     variations: List[Dict[str, Any]] = []
     configurator = soup.select_one(".configurator--variant")
@@ -462,72 +431,111 @@ def parse_variations(soup: BeautifulSoup) -> List[Dict[str, Any]]:
     return variations
 
 
-def parse_product_page(html: str, url: str, brand: str) -> Dict[str, Any]:
+def extract_fields_soup(html: Union[bytes, str]) -> Dict[str, Any]:
     soup = BeautifulSoup(html, "lxml")
     title_elem = soup.select_one(".product--title")
-    title = title_elem.get_text(strip=True) if title_elem else None
-
     tail_number_elem = soup.select_one("[itemprop='tail_number']")
     sku_elem = soup.select_one("[itemprop='sku']")
     product_id_elem = soup.select_one("meta[itemprop='productID']")
-
-    price = parse_price(soup)
-    availability = parse_availability(soup)
-    mounting = parse_mounting_time(soup)
-    breadcrumbs = parse_breadcrumbs(soup)
-    product_info = parse_product_information(soup)
-    category_path = derive_category_path(url)
-    documents = parse_documents(soup)
-    manufacturer_info = parse_manufacturer_info(soup)
-    eu_tire_label_entries = parse_eu_tire_label(soup)
-    eu_tire_label_html = render_eu_tire_label_html(eu_tire_label_entries)
-    descriptions = build_description_content(
-        product_information=product_info,
-        eu_tire_label_html=eu_tire_label_html,
-        documents=documents,
-        manufacturer_info=manufacturer_info,
-        product_url=url,
-    )
-    images = parse_images(soup)
-    image_urls = [entry.get("primary") for entry in images["gallery"] if entry.get("primary")]
-    ac_document_text = element_text(soup.select_one(".ac--document"))
-    variations = parse_variations(soup)
     og_price_meta = soup.select_one("meta[property='product:price']")
     og_currency_meta = soup.select_one("meta[property='product:price:currency']")
     og_url_meta = soup.select_one("meta[property='product:product_link']")
 
     return {
-        "brand": brand,
-        "url": url,
-        "title": title,
-        "breadcrumbs": breadcrumbs,
-        "category_path": category_path,
+        "title": title_elem.get_text(strip=True) if title_elem else None,
         "part_number": tail_number_elem.get_text(strip=True) if tail_number_elem else None,
         "sku": sku_elem.get_text(strip=True) if sku_elem else None,
         "product_id": product_id_elem.get("content") if product_id_elem else None,
-        "price": price,
-        "availability": availability,
-        "mounting_time": mounting,
-        "descriptions": descriptions,
-        "product_information": product_info,
-        "images": images,
-        "image_urls": image_urls,
-        "documents": documents,
-        "document_urls": [doc["url"] for doc in documents if doc.get("url")],
-        "manufacturer_info": manufacturer_info,
-        "ac_document": ac_document_text,
-        "eu_tire_label": eu_tire_label_entries,
-        "variations": variations,
+        "price": parse_price(soup),
+        "availability": parse_availability(soup),
+        "mounting_time": parse_mounting_time(soup),
+        "breadcrumbs": parse_breadcrumbs(soup),
+        "product_information": parse_product_information(soup),
+        "documents": parse_documents(soup),
+        "manufacturer_info": parse_manufacturer_info(soup),
+        "eu_tire_label": parse_eu_tire_label(soup),
+        "images": parse_images(soup),
+        "ac_document": element_text(soup.select_one(".ac--document")),
+        "variations": parse_variations(soup),
+        "og_price": og_price_meta.get("content") if og_price_meta else None,
+        "og_currency": og_currency_meta.get("content") if og_currency_meta else None,
+        "og_product_url": og_url_meta.get("content") if og_url_meta else None,
+    }
+
+
+EXTRACTION_ENGINES: Dict[str, Callable[[Union[bytes, str]], Dict[str, Any]]] = {
+    "soup": extract_fields_soup,
+    "lxml": lxml_extractor.extract_fields,
+}
+
+
+def derive_category_paths(category_urls: List[str]) -> List[List[str]]:
+    paths: List[List[str]] = []
+    for category_url in category_urls:
+        path = derive_category_path(category_url)
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+
+def build_product_record(
+    fields: Dict[str, Any], url: str, brand: str, category_urls: Optional[List[str]] = None
+) -> ProductRecord:
+    """
+    Builds a compact (schema version 2) record. Descriptions, image/document URL
+    lists and the EU tire label HTML are derived on read, see product_schema.
+    A product linked from several categories also lists every URL and path.
+    """
+    record: Dict[str, Any] = {
+        "brand": brand,
+        "url": url,
+        "title": fields["title"],
+        "breadcrumbs": fields["breadcrumbs"],
+        "category_path": derive_category_path(url),
+    }
+    if category_urls and len(category_urls) > 1:
+        record["category_urls"] = list(category_urls)
+        record["category_paths"] = derive_category_paths(category_urls)
+    record.update({
+        "part_number": fields["part_number"],
+        "sku": fields["sku"],
+        "product_id": fields["product_id"],
+        "price": fields["price"],
+        "availability": fields["availability"],
+        "mounting_time": fields["mounting_time"],
+        "product_information": fields["product_information"],
+        "images": fields["images"],
+        "documents": fields["documents"],
+        "manufacturer_info": fields["manufacturer_info"],
+        "ac_document": fields["ac_document"],
+        "eu_tire_label": fields["eu_tire_label"],
+        "variations": fields["variations"],
         "meta": {
             "scraped_at": datetime.utcnow().isoformat(),
             "price_meta": {
-                "og_price": og_price_meta.get("content") if og_price_meta else None,
-                "og_currency": og_currency_meta.get("content") if og_currency_meta else None,
-                "og_product_url": og_url_meta.get("content") if og_url_meta else None,
+                "og_price": fields["og_price"],
+                "og_currency": fields["og_currency"],
+                "og_product_url": fields["og_product_url"],
             },
-            "eu_tire_label_html": eu_tire_label_html,
         },
-    }
+    })
+    return ProductRecord.from_dict(record)
+
+
+def parse_product_page(
+    html: Union[bytes, str],
+    url: str,
+    brand: str,
+    engine: str = DEFAULT_ENGINE,
+    content_hash: Optional[str] = None,
+    category_urls: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    fields = EXTRACTION_ENGINES[engine](html)
+    product = build_product_record(fields, url, brand, category_urls).to_dict()
+    if content_hash is None and isinstance(html, bytes):
+        content_hash = page_hash(html)
+    stamp_fingerprint(product, content_hash)
+    return product
 
 
 def update_output_structure(output: Dict[str, Any]) -> None:
@@ -537,12 +545,16 @@ def update_output_structure(output: Dict[str, Any]) -> None:
     output["meta"]["generated_at"] = datetime.utcnow().isoformat()
     output["meta"]["total_products"] = total_products
     output["meta"]["brand_counts"] = brand_counts
+    output["meta"]["schema_version"] = catalog_schema_version(products)
 
 
 def save_output(file_path: Path, output: Dict[str, Any]) -> None:
     update_output_structure(output)
-    with file_path.open("w", encoding="utf-8") as fp:
-        json.dump(output, fp, indent=2)
+    if file_path.is_symlink():
+        # The catalog is published as snapshots (see catalog_snapshots): add a version
+        write_snapshot(output, file_path)
+    else:
+        serialization.dump(output, file_path, atomic=True)
     console.print(
         Panel(
             f"Saved product details to [bold]{file_path.name}[/bold]",
@@ -551,6 +563,33 @@ def save_output(file_path: Path, output: Dict[str, Any]) -> None:
     )
 
 
+def compact_output(
+    output_file: Optional[Path],
+    journal_path: Path,
+    skipped: Optional[int] = None,
+    failed: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Builds the output from the previous contents of the output JSON plus the
+    scrape journal, then drops the journal. Returns the output; it is only saved
+    if `output_file` is given. `failed` lists the URLs that could not be scraped.
+    """
+    output = init_output(output_file)
+    applied = compact_journal(journal_path, output.setdefault("products", {}))
+    if skipped is not None:
+        output["meta"]["skipped_unchanged"] = skipped
+    if failed:
+        output["meta"]["failed_urls"] = failed
+    if output_file is not None:
+        save_output(output_file, output)
+    else:
+        update_output_structure(output)
+    if applied is not None:
+        console.print(f"[dim]Compacted {applied} journal entries from {journal_path.name}[/dim]")
+        journal_path.unlink()
+    return output
+
+
 def iterate_links(
     links_by_brand: Dict[str, List[str]],
     brands: List[str],
@@ -571,74 +610,425 @@ def iterate_links(
     return queue
 
 
-def scrape_products(
+class PageResult(NamedTuple):
+    index: int
+    brand: str
+    url: str
+    html: Optional[bytes] = None
+    product: Optional[Dict[str, Any]] = None
+    error: Optional[Exception] = None
+    skipped: bool = False
+    category_urls: Optional[List[str]] = None
+
+
+def start_fetchers(
+    session: Session,
+    tasks: List[Dict[str, Any]],
+    rate_limiter: HostRateLimiter,
+    html_queue: "queue.Queue[PageResult]",
+    concurrency: int,
+    cache: Optional[ResponseCache] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+    archive: Optional[HtmlArchive] = None,
+) -> List[threading.Thread]:
+    """
+    Starts `concurrency` fetcher threads that push raw HTML (or the final fetch error)
+    into `html_queue`. The queue is bounded, so fetchers block once the parsers fall behind.
+
+    Failed fetches are not retried inline: they go back onto a delayed retry queue
+    so the fetcher moves on to the next URL, and a shared circuit breaker pauses
+    all fetchers when transient errors pile up.
+    """
+    retry_policy = retry_policy or RetryPolicy()
+    breaker = breaker or CircuitBreaker()
+    work = RetryQueue([(index, item, 1) for index, item in enumerate(tasks)])
+
+    def fetch(index: int, item: Dict[str, Any], attempt: int) -> None:
+        brand = item["brand"]
+        url = item["url"]
+        breaker.before_request()
+        try:
+            html = fetch_page(session, url, rate_limiter, cache)
+        except Exception as exc:  # pylint: disable=broad-except
+            if retry_policy.is_transient(exc):
+                if breaker.record_failure(parse_retry_after(exc)):
+                    console.print(
+                        f"    [red]Error rate too high, pausing all fetchers for {breaker.cooldown:.0f}s[/red]"
+                    )
+            else:
+                breaker.record_success()
+            delay = retry_policy.retry_delay(exc, attempt)
+            if delay is not None:
+                console.print(
+                    f"    - [yellow]Attempt {attempt} failed for {url} ({exc}). Retrying in {delay:.1f}s[/yellow]"
+                )
+                work.put((index, item, attempt + 1), delay)
+            else:
+                html_queue.put(PageResult(index, brand, url, error=exc))
+        else:
+            breaker.record_success()
+            if archive is not None:
+                try:
+                    archive.store(url, brand, html)
+                except Exception as exc:  # pylint: disable=broad-except
+                    # The page is still parsed; only its raw HTML is not kept
+                    console.print(f"    [yellow]Could not archive {url}: {exc}[/yellow]")
+            html_queue.put(
+                PageResult(index, brand, url, html=html, category_urls=item.get("category_urls"))
+            )
+
+    def worker() -> None:
+        while True:
+            job = work.get()
+            if job is None:
+                return
+            index, item, attempt = job
+            try:
+                fetch(index, item, attempt)
+            except Exception as exc:  # pylint: disable=broad-except
+                # parse_results waits for one result per task: never leave one without
+                html_queue.put(PageResult(index, item["brand"], item["url"], error=exc))
+            finally:
+                work.task_done()
+
+    threads = [
+        threading.Thread(target=worker, name=f"fetcher-{idx}", daemon=True)
+        for idx in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def parse_results(
+    html_queue: "queue.Queue[PageResult]",
+    total: int,
+    parse_workers: int,
+    max_in_flight: int,
+    engine: str = DEFAULT_ENGINE,
+    baseline: Optional[Dict[str, Fingerprint]] = None,
+) -> Iterator[PageResult]:
+    """
+    Consumes fetched pages from `html_queue`, parses them on a process pool and
+    yields one PageResult per task in the original task order.
+    With parse_workers=0 pages are parsed inline on the calling thread.
+
+    With a `baseline` of known fingerprints, pages whose raw HTML is unchanged are
+    not parsed at all, and parsed records identical to the baseline are marked
+    skipped as well.
+    """
+    ready: Dict[int, PageResult] = {}
+    next_index = 0
+    received = 0
+
+    def parsed(page: PageResult, product: Dict[str, Any]) -> PageResult:
+        known = baseline.get(page.url) if baseline else None
+        unchanged = known is not None and product["meta"]["fingerprint"] == known.record
+        return page._replace(html=None, product=product, skipped=unchanged)
+
+    def collect(page: PageResult, future: "Future[Dict[str, Any]]") -> PageResult:
+        try:
+            return parsed(page, future.result())
+        except Exception as exc:  # pylint: disable=broad-except
+            return page._replace(html=None, error=exc)
+
+    # Spawned, not forked: the fetcher threads (and, in-process, the caller's
+    # threads) are running by now, and a forked child inherits any lock they hold
+    pool = (
+        ProcessPoolExecutor(max_workers=parse_workers, mp_context=multiprocessing.get_context("spawn"))
+        if parse_workers > 0
+        else None
+    )
+    in_flight: Dict["Future[Dict[str, Any]]", PageResult] = {}
+    try:
+        while received < total or in_flight:
+            for future in [f for f in in_flight if f.done()]:
+                page = in_flight.pop(future)
+                ready[page.index] = collect(page, future)
+            while next_index in ready:
+                yield ready.pop(next_index)
+                next_index += 1
+
+            if received < total and len(in_flight) < max_in_flight:
+                page = html_queue.get()
+                received += 1
+                content_hash = page_hash(page.html) if page.html is not None else None
+                known = baseline.get(page.url) if baseline else None
+                if page.error is not None:
+                    ready[page.index] = page
+                elif (
+                    known is not None
+                    and known.content_hash == content_hash
+                    and len(page.category_urls or ()) <= 1
+                ):
+                    # Products with several category URLs are always parsed: their
+                    # URL list may have changed even when the page did not.
+                    ready[page.index] = page._replace(html=None, skipped=True)
+                elif pool is None:
+                    try:
+                        product = parse_product_page(
+                            page.html, page.url, page.brand, engine, content_hash, page.category_urls
+                        )
+                        ready[page.index] = parsed(page, product)
+                    except Exception as exc:  # pylint: disable=broad-except
+                        ready[page.index] = page._replace(html=None, error=exc)
+                else:
+                    future = pool.submit(
+                        parse_product_page,
+                        page.html,
+                        page.url,
+                        page.brand,
+                        engine,
+                        content_hash,
+                        page.category_urls,
+                    )
+                    in_flight[future] = page
+            elif in_flight:
+                wait(in_flight, return_when=FIRST_COMPLETED)
+        while next_index in ready:
+            yield ready.pop(next_index)
+            next_index += 1
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def start_archive_loader(
+    archive: HtmlArchive,
+    tasks: List[Dict[str, Any]],
+    html_queue: "queue.Queue[PageResult]",
+) -> threading.Thread:
+    """Feeds archived pages into `html_queue` in place of the network fetchers."""
+    hashes = {entry.url: entry.hash for entry in archive.entries()}
+
+    def loader() -> None:
+        for index, item in enumerate(tasks):
+            brand = item["brand"]
+            url = item["url"]
+            try:
+                html = archive.load(hashes[url])
+                html_queue.put(
+                    PageResult(index, brand, url, html=html, category_urls=item.get("category_urls"))
+                )
+            except Exception as exc:  # pylint: disable=broad-except
+                html_queue.put(PageResult(index, brand, url, error=exc))
+
+    thread = threading.Thread(target=loader, name="archive-loader", daemon=True)
+    thread.start()
+    return thread
+
+
+def pending_tasks(
     links_by_brand: Dict[str, List[str]],
     brands: List[str],
     max_links: Optional[int],
     offset: int,
-    delay: float,
-    output_file: Path = OUTPUT_FILE,
+    journal_path: Path,
+    resume: bool,
+) -> List[Dict[str, Any]]:
+    """
+    Tasks for the selected brands, one per product: URLs of the same product are
+    collapsed first, so --offset and --max count products rather than links.
+    """
+    selected = {brand: links_by_brand.get(brand, []) for brand in brands}
+    collapsed, category_urls = collapse_links(selected)
+    total_links = sum(len(urls) for urls in selected.values())
+    total_products = sum(len(urls) for urls in collapsed.values())
+    if total_products < total_links:
+        console.print(
+            f"[cyan]{total_links} links point to {total_products} distinct products; "
+            f"each is scraped once[/cyan]"
+        )
+    tasks = iterate_links(collapsed, brands, offset, max_links)
+    for item in tasks:
+        item["category_urls"] = category_urls[item["url"]]
+    if resume:
+        done = journaled_urls(journal_path)
+        tasks = [item for item in tasks if item["url"] not in done]
+        console.print(f"[cyan]Resuming: {len(done)} products already in {journal_path.name}[/cyan]")
+    return tasks
+
+
+def journal_results(
+    results: Iterator[PageResult], total_tasks: int, journal_path: Path
+) -> Tuple[List[str], List[str], int]:
+    """
+    Appends every changed product to the journal as it arrives.
+    Returns the error messages, the URLs that failed and the number of unchanged pages skipped.
+    """
+    errors: List[str] = []
+    failed: List[str] = []
+    skipped = 0
+    with ProductJournal(journal_path) as journal, Progress(
+        SpinnerColumn(),
+        TextColumn("{task.description}"),
+        BarColumn(),
+        TextColumn("{task.completed}/{task.total}"),
+        TimeElapsedColumn(),
+        console=console,
+    ) as progress:
+        task_id = progress.add_task("Scraping products", total=total_tasks)
+        for result in results:
+            progress.update(task_id, description=f"{result.brand.upper()} :: {result.url}")
+            if result.error is not None:
+                error_msg = f"{result.brand}:{result.url} -> {result.error}"
+                console.print(f"    [red]Failed to scrape {result.url}: {result.error}[/red]")
+                errors.append(error_msg)
+                failed.append(result.url)
+            elif result.skipped:
+                skipped += 1
+            else:
+                journal.append(result.brand, result.url, result.product)
+            progress.advance(task_id)
+    return errors, failed, skipped
+
+
+def report_run(
+    elapsed: float, total_tasks: int, errors: List[str], skipped: int = 0, verb: str = "Scraped"
 ) -> None:
-    output = init_output(output_file)
-    products = output.setdefault("products", {})
+    summary = f"Completed in {elapsed:.1f}s. {verb} {total_tasks - len(errors)} of {total_tasks} pages."
+    if skipped:
+        summary += f" {skipped} unchanged products skipped."
+    console.print(Panel(summary, border_style="blue"))
+    if errors:
+        error_table = "\n".join(errors[:10])
+        console.print(
+            Panel(
+                f"Encountered {len(errors)} errors (showing up to 10):\n{error_table}",
+                border_style="red",
+            )
+        )
+
 
-    tasks = iterate_links(links_by_brand, brands, offset, max_links)
+def scrape_products(
+    links_by_brand: Dict[str, List[str]],
+    brands: List[str],
+    max_links: Optional[int],
+    offset: int,
+    delay: float,
+    output_file: Optional[Path] = OUTPUT_FILE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    parse_workers: int = DEFAULT_PARSE_WORKERS,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    cache: Optional[ResponseCache] = None,
+    engine: str = DEFAULT_ENGINE,
+    journal_file: Optional[Path] = None,
+    resume: bool = False,
+    archive: Optional[HtmlArchive] = None,
+    baseline: Optional[Dict[str, Fingerprint]] = None,
+) -> Dict[str, Any]:
+    """
+    Scrapes the selected products and returns the output ({"meta", "products"});
+    meta.failed_urls lists the pages that could not be fetched or parsed.
+    With output_file=None nothing is written but the journal, which journal_file
+    then names; the caller takes the products from the return value.
+    """
+    journal_path = journal_file or journal_path_for(output_file)
+    tasks = pending_tasks(links_by_brand, brands, max_links, offset, journal_path, resume)
     total_tasks = len(tasks)
     if total_tasks == 0:
         console.print("[yellow]No links to scrape with the current settings.[/yellow]")
-        return
+        if journal_path.exists():
+            return compact_output(output_file, journal_path)
+        return init_output(output_file)
 
-    console.print(Panel(f"Preparing to scrape {total_tasks} product pages", border_style="cyan"))
+    concurrency = max(1, concurrency)
+    parse_workers = max(0, min(parse_workers, total_tasks))
+    queue_size = max(1, queue_size)
+    console.print(
+        Panel(
+            f"Preparing to scrape {total_tasks} product pages with {concurrency} fetchers "
+            f"and {parse_workers or 'inline'} parser workers",
+            border_style="cyan",
+        )
+    )
 
-    errors: List[str] = []
     start_time = time.perf_counter()
-
-    with requests.Session() as session:
-        session.headers.update(DEFAULT_HEADERS)
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("{task.description}"),
-            BarColumn(),
-            TextColumn("{task.completed}/{task.total}"),
-            TimeElapsedColumn(),
-            console=console,
-        ) as progress:
-            task_id = progress.add_task("Scraping products", total=total_tasks)
-
-            for item in tasks:
-                brand = item["brand"]
-                url = item["url"]
-                progress.update(task_id, description=f"{brand.upper()} :: {url}")
-                try:
-                    html = fetch_page(session, url, delay)
-                    product_data = parse_product_page(html, url, brand)
-                    products.setdefault(brand, {})[url] = product_data
-                except Exception as exc:  # pylint: disable=broad-except
-                    error_msg = f"{brand}:{url} -> {exc}"
-                    console.print(f"    [red]Failed to scrape {url}: {exc}[/red]")
-                    errors.append(error_msg)
-                finally:
-                    progress.advance(task_id)
+    rate_limiter = HostRateLimiter.from_delay(delay, burst=DEFAULT_BURST)
+    html_queue: "queue.Queue[PageResult]" = queue.Queue(maxsize=queue_size)
+    breaker = CircuitBreaker()
+
+    with create_session(concurrency) as session:
+        start_fetchers(
+            session,
+            tasks,
+            rate_limiter,
+            html_queue,
+            concurrency,
+            cache,
+            breaker=breaker,
+            archive=archive,
+        )
+        results = parse_results(
+            html_queue,
+            total=total_tasks,
+            parse_workers=parse_workers,
+            max_in_flight=max(parse_workers * 2, 1),
+            engine=engine,
+            baseline=baseline,
+        )
+        errors, failed, skipped = journal_results(results, total_tasks, journal_path)
 
     elapsed = time.perf_counter() - start_time
-    elapsed = time.perf_counter() - start_time
-    save_output(output_file, output)
+    output = compact_output(output_file, journal_path, skipped if baseline is not None else None, failed)
+    if cache is not None:
+        console.print(
+            f"[dim]Response cache: {cache.total_bytes / (1024 * 1024):.1f} MB in {cache.directory}[/dim]"
+        )
+    if archive is not None:
+        removed = archive.compact()
+        console.print(f"[dim]HTML archive: {len(archive.entries())} pages, {removed} stale blobs removed[/dim]")
+
+    report_run(elapsed, total_tasks, errors, skipped)
+    if breaker.trips:
+        console.print(f"[yellow]Circuit breaker paused the crawl {breaker.trips} times.[/yellow]")
+    return output
+
+
+def reparse_products(
+    archive: HtmlArchive,
+    brands: List[str],
+    max_links: Optional[int],
+    offset: int,
+    output_file: Path = OUTPUT_FILE,
+    parse_workers: int = DEFAULT_PARSE_WORKERS,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    engine: str = DEFAULT_ENGINE,
+    journal_file: Optional[Path] = None,
+    resume: bool = False,
+) -> None:
+    """Rebuilds product records from the raw HTML archive without touching the network."""
+    journal_path = journal_file or journal_path_for(output_file)
+    tasks = pending_tasks(archive.links_by_brand(), brands, max_links, offset, journal_path, resume)
+    total_tasks = len(tasks)
+    if total_tasks == 0:
+        console.print("[yellow]No archived pages to reparse with the current settings.[/yellow]")
+        if journal_path.exists():
+            compact_output(output_file, journal_path)
+        return
 
+    parse_workers = max(0, min(parse_workers, total_tasks))
     console.print(
         Panel(
-            f"Completed in {elapsed:.1f}s. Scraped {total_tasks - len(errors)} of {total_tasks} pages.",
-            border_style="blue",
+            f"Reparsing {total_tasks} archived pages with {parse_workers or 'inline'} parser workers",
+            border_style="cyan",
         )
     )
 
-    if errors:
-        error_table = "\n".join(errors[:10])
-        console.print(
-            Panel(
-                f"Encountered {len(errors)} errors (showing up to 10):\n{error_table}",
-                border_style="red",
-            )
-        )
+    start_time = time.perf_counter()
+    html_queue: "queue.Queue[PageResult]" = queue.Queue(maxsize=max(1, queue_size))
+    start_archive_loader(archive, tasks, html_queue)
+    results = parse_results(
+        html_queue,
+        total=total_tasks,
+        parse_workers=parse_workers,
+        max_in_flight=max(parse_workers * 2, 1),
+        engine=engine,
+    )
+    errors, failed, _ = journal_results(results, total_tasks, journal_path)
+    compact_output(output_file, journal_path, failed=failed)
+    report_run(time.perf_counter() - start_time, total_tasks, errors, verb="Reparsed")
 
 
 def build_arg_parser() -> argparse.ArgumentParser:
@@ -664,7 +1054,93 @@ def build_arg_parser() -> argparse.ArgumentParser:
         "--delay",
         type=float,
         default=DEFAULT_DELAY,
-        help=f"Delay between requests in seconds (default: {DEFAULT_DELAY})",
+        help=(
+            "Average delay between requests to the same host in seconds; "
+            f"enforced by a per-host token bucket (default: {DEFAULT_DELAY})"
+        ),
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Number of product pages fetched in parallel (default: {DEFAULT_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=DEFAULT_PARSE_WORKERS,
+        help=(
+            "Number of parser processes; 0 parses inline on the main thread "
+            f"(default: {DEFAULT_PARSE_WORKERS})"
+        ),
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help=f"Maximum fetched pages waiting to be parsed (default: {DEFAULT_QUEUE_SIZE})",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip URLs already recorded in the scrape journal of an interrupted run",
+    )
+    parser.add_argument(
+        "--journal",
+        type=Path,
+        default=None,
+        help="Path of the JSONL scrape journal (default: next to --output with a .jsonl suffix)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=sorted(EXTRACTION_ENGINES),
+        default=DEFAULT_ENGINE,
+        help=(
+            "Extraction engine: 'soup' (BeautifulSoup selectors) or 'lxml' "
+            f"(single-pass compiled XPath on raw bytes) (default: {DEFAULT_ENGINE})"
+        ),
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=CACHE_DIR,
+        help="Directory of the persistent HTTP response cache (default: data/http_cache)",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+        help="Size limit of the response cache before least recently used pages are evicted",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the response cache and conditional requests",
+    )
+    parser.add_argument(
+        "--archive-dir",
+        type=Path,
+        default=ARCHIVE_DIR,
+        help="Directory of the compressed raw HTML archive (default: data/html_archive)",
+    )
+    parser.add_argument(
+        "--no-archive",
+        action="store_true",
+        help="Do not keep raw HTML of fetched pages in the archive",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        help=(
+            "Existing product details JSON; products whose page or record fingerprint "
+            "matches it are skipped instead of written to the output"
+        ),
+    )
+    parser.add_argument(
+        "--reparse",
+        action="store_true",
+        help="Rebuild the output from the HTML archive instead of fetching pages (no network access)",
     )
     parser.add_argument(
         "--input_links",
@@ -688,7 +1164,11 @@ def main() -> None:
     parser = build_arg_parser()
     args = parser.parse_args()
 
-    links_by_brand = load_links(args.input_links)
+    archive = None
+    if args.reparse or not args.no_archive:
+        archive = HtmlArchive(args.archive_dir)
+
+    links_by_brand = archive.links_by_brand() if args.reparse else load_links(args.input_links)
     available_brands = sorted(links_by_brand.keys())
 
     if args.brands:
@@ -700,6 +1180,32 @@ def main() -> None:
     else:
         selected_brands = available_brands
 
+    if args.reparse:
+        console.print(
+            Panel(
+                f"Reparsing archived pages for {', '.join(b.upper() for b in selected_brands)} "
+                f"with {args.parse_workers} parsers ({args.engine})",
+                border_style="magenta",
+            )
+        )
+        reparse_products(
+            archive=archive,
+            brands=selected_brands,
+            max_links=args.max,
+            offset=args.offset,
+            output_file=args.output,
+            parse_workers=args.parse_workers,
+            queue_size=args.queue_size,
+            engine=args.engine,
+            journal_file=args.journal,
+            resume=args.resume,
+        )
+        return
+
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+
     console.print(
         Panel(
             "\n".join(
@@ -709,6 +1215,10 @@ def main() -> None:
                     f"  Max links   : {args.max if args.max is not None else 'ALL'}",
                     f"  Offset      : {args.offset}",
                     f"  Delay (s)   : {args.delay}",
+                    f"  Concurrency : {args.concurrency}",
+                    f"  Parsers     : {args.parse_workers} ({args.engine})",
+                    f"  Cache       : {'off' if cache is None else args.cache_dir}",
+                    f"  Archive     : {'off' if archive is None else args.archive_dir}",
                 ]
             ),
             border_style="magenta",
@@ -722,6 +1232,15 @@ def main() -> None:
         offset=args.offset,
         delay=max(args.delay, 0.0),
         output_file=args.output,
+        concurrency=args.concurrency,
+        parse_workers=args.parse_workers,
+        queue_size=args.queue_size,
+        cache=cache,
+        engine=args.engine,
+        journal_file=args.journal,
+        resume=args.resume,
+        archive=archive,
+        baseline=load_baseline(args.baseline) if args.baseline else None,
     )
 
 
@@ -0,0 +1,105 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore
+
+BACKEND_ENV = "JSON_BACKEND"
+COMPACT_ENV = "JSON_COMPACT"
+
+
+def _json_dumps(obj: Any, compact: bool, sort_keys: bool) -> bytes:
+    if compact:
+        text = json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, separators=(",", ":"))
+    else:
+        text = json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, indent=2)
+    return text.encode("utf-8")
+
+
+def _json_loads(data: Union[bytes, str]) -> Any:
+    return json.loads(data)
+
+
+def _orjson_dumps(obj: Any, compact: bool, sort_keys: bool) -> bytes:
+    option = orjson.OPT_NON_STR_KEYS
+    if not compact:
+        option |= orjson.OPT_INDENT_2
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(obj, option=option)
+
+
+def _orjson_loads(data: Union[bytes, str]) -> Any:
+    return orjson.loads(data)
+
+
+BACKENDS: Dict[str, Tuple[Callable[[Any, bool, bool], bytes], Callable[[Union[bytes, str]], Any]]] = {
+    "json": (_json_dumps, _json_loads),
+}
+if orjson is not None:
+    BACKENDS["orjson"] = (_orjson_dumps, _orjson_loads)
+
+
+def backend_name() -> str:
+    """orjson when installed, else stdlib json. JSON_BACKEND=json forces the stdlib."""
+    requested = os.environ.get(BACKEND_ENV, "").strip().lower()
+    if requested:
+        if requested not in BACKENDS:
+            raise ValueError(
+                f"{BACKEND_ENV}={requested!r} is not available (choose from {', '.join(BACKENDS)})"
+            )
+        return requested
+    return "orjson" if "orjson" in BACKENDS else "json"
+
+
+def compact_default() -> bool:
+    """Whether files are written without indentation (JSON_COMPACT=1)."""
+    return os.environ.get(COMPACT_ENV, "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def dumps(
+    obj: Any,
+    compact: Optional[bool] = None,
+    sort_keys: bool = False,
+    backend: Optional[str] = None,
+) -> bytes:
+    """UTF-8 encoded JSON; indented with two spaces unless compact."""
+    encode = BACKENDS[backend or backend_name()][0]
+    return encode(obj, compact_default() if compact is None else compact, sort_keys)
+
+
+def loads(data: Union[bytes, str], backend: Optional[str] = None) -> Any:
+    return BACKENDS[backend or backend_name()][1](data)
+
+
+def load(path: Path, backend: Optional[str] = None) -> Any:
+    with open(path, "rb") as fp:
+        return loads(fp.read(), backend)
+
+
+def dump(
+    obj: Any,
+    path: Path,
+    compact: Optional[bool] = None,
+    atomic: bool = False,
+    backend: Optional[str] = None,
+) -> int:
+    """
+    Writes `obj` to `path` and returns the number of bytes written. With atomic=True
+    the data goes to a temp file that is fsynced and renamed over `path`, so readers
+    never see a partially written file.
+    """
+    path = Path(path)
+    data = dumps(obj, compact=compact, backend=backend)
+    target = path.with_name(path.name + ".tmp") if atomic else path
+    with open(target, "wb") as fp:
+        fp.write(data)
+        fp.flush()
+        os.fsync(fp.fileno())
+    if atomic:
+        os.replace(target, path)
+    return len(data)
@@ -0,0 +1,128 @@
+import argparse
+import gzip
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from rich.console import Console
+
+from catalog_store import normalize_slug
+from sitemap_reader import iter_sitemap
+from slug_index import SlugIndex
+
+console = Console()
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SNAPSHOT_FILE = BASE_DIR / "data" / "sitemap_snapshot.tsv.gz"
+
+# (slug, newest lastmod) pairs, sorted by slug
+Snapshot = List[Tuple[str, str]]
+
+
+class SitemapDiff(NamedTuple):
+    """Slugs that appeared, got a different lastmod, or disappeared between two sitemaps."""
+
+    added: List[str]
+    changed: List[str]
+    removed: List[str]
+
+    def tombstones(self, removed_at: str) -> Dict[str, Optional[str]]:
+        """
+        {slug: removed_at} for the removed products and {slug: None} for the
+        added ones, so a product that comes back loses its tombstone.
+        """
+        marks: Dict[str, Optional[str]] = {slug: None for slug in self.added}
+        marks.update((slug, removed_at) for slug in self.removed)
+        return marks
+
+    def summary(self) -> str:
+        return f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed"
+
+
+def sitemap_snapshot(url_map: Dict[str, str]) -> Snapshot:
+    """Sorted (slug, newest lastmod) pairs of a {url: lastmod} sitemap."""
+    newest: Dict[str, str] = {}
+    for url, lastmod in url_map.items():
+        slug = normalize_slug(url)
+        if lastmod > newest.get(slug, ""):
+            newest[slug] = lastmod
+    return sorted(newest.items())
+
+
+def catalog_snapshot(index: SlugIndex) -> Snapshot:
+    """
+    Sorted (slug, newest lastmod) pairs of the catalog, the baseline of the first
+    diff: catalog products missing from the sitemap then count as removed.
+    """
+    return sorted((slug, entry.lastmod or "") for slug, entry in index.entries.items())
+
+
+def iter_snapshot(path: Path = SNAPSHOT_FILE) -> Iterator[Tuple[str, str]]:
+    """Streams the (slug, lastmod) pairs of a saved snapshot, in slug order."""
+    with gzip.open(path, "rt", encoding="utf-8", newline="\n") as fp:
+        for line in fp:
+            slug, _, lastmod = line.rstrip("\n").partition("\t")
+            yield slug, lastmod
+
+
+def save_snapshot(snapshot: Iterable[Tuple[str, str]], path: Path = SNAPSHOT_FILE) -> None:
+    """Writes sorted (slug, lastmod) pairs as gzipped TSV, replacing `path` atomically."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    # mtime=0 keeps the file byte-identical for an identical sitemap
+    with open(tmp, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as fp:
+        fp.write("".join(f"{slug}\t{lastmod}\n" for slug, lastmod in snapshot).encode("utf-8"))
+    os.replace(tmp, path)
+
+
+def diff_snapshots(old: Iterable[Tuple[str, str]], new: Iterable[Tuple[str, str]]) -> SitemapDiff:
+    """
+    Merge-diffs two snapshots sorted by slug in a single pass over both, so the
+    cost grows linearly with the sitemap and the old side is never held in memory.
+    """
+    diff = SitemapDiff([], [], [])
+    old_iter, new_iter = iter(old), iter(new)
+    old_item, new_item = next(old_iter, None), next(new_iter, None)
+    while old_item is not None and new_item is not None:
+        if old_item[0] == new_item[0]:
+            if old_item[1] != new_item[1]:
+                diff.changed.append(new_item[0])
+            old_item, new_item = next(old_iter, None), next(new_iter, None)
+        elif old_item[0] < new_item[0]:
+            diff.removed.append(old_item[0])
+            old_item = next(old_iter, None)
+        else:
+            diff.added.append(new_item[0])
+            new_item = next(new_iter, None)
+    while old_item is not None:
+        diff.removed.append(old_item[0])
+        old_item = next(old_iter, None)
+    while new_item is not None:
+        diff.added.append(new_item[0])
+        new_item = next(new_iter, None)
+    return diff
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Diff a sitemap against the saved sitemap snapshot")
+    parser.add_argument("sitemap", help="Path or URL of the sitemap (.xml or .xml.gz)")
+    parser.add_argument("--snapshot", type=Path, default=SNAPSHOT_FILE, help="Snapshot to diff against (default: data/sitemap_snapshot.tsv.gz)")
+    parser.add_argument("--save", action="store_true", help="Replace the snapshot with the sitemap afterwards")
+    args = parser.parse_args()
+
+    current = sitemap_snapshot({entry.url: entry.lastmod for entry in iter_sitemap(args.sitemap) if entry.lastmod})
+    previous = iter_snapshot(args.snapshot) if args.snapshot.exists() else iter(())
+    diff = diff_snapshots(previous, current)
+    console.print(f"[bold]{diff.summary()}[/bold]")
+    for label, slugs in (("+", diff.added), ("~", diff.changed), ("-", diff.removed)):
+        for slug in slugs[:20]:
+            console.print(f"  {label} {slug}")
+        if len(slugs) > 20:
+            console.print(f"  {label} ... {len(slugs) - 20} more")
+    if args.save:
+        save_snapshot(current, args.snapshot)
+        console.print(f"[green]Saved {len(current)} slugs to {args.snapshot}[/green]")
+
+
+if __name__ == "__main__":
+    main()
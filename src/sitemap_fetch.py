@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from requests import Session
+
+import http_client
+from sitemap_reader import SitemapDownload
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CACHE_DIR = BASE_DIR / "data" / "sitemap_cache"
+DEFAULT_WORKERS = 4
+
+
+class SitemapSet(NamedTuple):
+    """Every sitemap reachable from one root (a sitemap index or a single sitemap)."""
+
+    # {url: lastmod} across all sitemaps; entries without lastmod are left out
+    urls: Dict[str, str]
+    # {sitemap url: validators} of the root and every child, for the next fetch
+    validators: Dict[str, Dict[str, Any]]
+    # Number of sitemaps answered 304 / hashing the same, and in total
+    unchanged_count: int
+    sitemap_count: int
+
+    @property
+    def unchanged(self) -> bool:
+        """True if no sitemap changed at all since the validators passed in."""
+        return self.unchanged_count == self.sitemap_count
+
+
+def cache_path(url: str, cache_dir: Path = CACHE_DIR) -> Path:
+    return cache_dir / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]}.tsv.gz"
+
+
+def read_cache(path: Path) -> Dict[str, str]:
+    urls: Dict[str, str] = {}
+    with gzip.open(path, "rt", encoding="utf-8", newline="\n") as fp:
+        for line in fp:
+            url, _, lastmod = line.rstrip("\n").partition("\t")
+            urls[url] = lastmod
+    return urls
+
+
+def write_cache(path: Path, urls: Dict[str, str]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as fp:
+        fp.write("".join(f"{url}\t{lastmod}\n" for url, lastmod in urls.items()).encode("utf-8"))
+    os.replace(tmp, path)
+
+
+def fetch_one(
+    url: str,
+    previous: Optional[Dict[str, Any]],
+    session: Optional[Session] = None,
+    cache_dir: Optional[Path] = CACHE_DIR,
+) -> Tuple[Dict[str, str], SitemapDownload]:
+    """
+    Conditionally downloads one sitemap and returns its {url: lastmod} with the
+    download. A 304 is answered from the cache of the last full download; a
+    sitemap without a usable cache entry is downloaded unconditionally.
+    """
+    previous = previous or {}
+    cached = cache_path(url, cache_dir) if cache_dir is not None else None
+    # An index lists its children in its validators; a sitemap needs its cache
+    if not previous.get("children") and (cached is None or not cached.exists()):
+        previous = {}
+    download = SitemapDownload(url, previous, session)
+    urls = {entry.url: entry.lastmod for entry in download if entry.lastmod}
+    if download.not_modified:
+        children = previous.get("children") or []
+        if not children and cached is not None:
+            urls = read_cache(cached)
+    else:
+        children = [child.url for child in download.children]
+        if not children and cached is not None:
+            write_cache(cached, urls)
+    if children:
+        download.validators["children"] = children
+    return urls, download
+
+
+def fetch_sitemaps(
+    root: str,
+    state: Optional[Dict[str, Dict[str, Any]]] = None,
+    workers: int = DEFAULT_WORKERS,
+    cache_dir: Optional[Path] = CACHE_DIR,
+) -> SitemapSet:
+    """
+    Fetches `root` and, if it is a sitemap index, all of its child sitemaps
+    concurrently, each stream-parsed by its own worker and conditional on its
+    validators in `state`, into one {url: lastmod} view. Unchanged children are
+    read back from their cache instead of being downloaded. `root` may also be a
+    plain sitemap (or a local file), which is then the only sitemap.
+    """
+    state = state or {}
+    session = http_client.create_session(pool_size=max(workers, 1))
+    urls, download = fetch_one(root, state.get(root), session, cache_dir)
+    validators = {root: download.validators}
+    children: List[str] = download.validators.get("children", [])
+    if not children:
+        return SitemapSet(urls, validators, int(download.unchanged), 1)
+
+    unchanged = 0
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = [pool.submit(fetch_one, child, state.get(child), session, cache_dir) for child in children]
+        # Merged in index order, so a URL listed twice keeps the later child's date
+        for child, future in zip(children, futures):
+            child_urls, child_download = future.result()
+            urls.update(child_urls)
+            validators[child] = child_download.validators
+            unchanged += int(child_download.unchanged)
+    # The index itself counts too: a child added to or dropped from it is a change
+    return SitemapSet(urls, validators, unchanged + int(download.unchanged), len(children) + 1)
+
+
+def prune_cache(keep: List[str], cache_dir: Path = CACHE_DIR) -> int:
+    """Deletes the cache files of sitemaps not in `keep`. Returns the number deleted."""
+    if not cache_dir.exists():
+        return 0
+    wanted = {cache_path(url, cache_dir).name for url in keep}
+    removed = 0
+    for path in cache_dir.glob("*.tsv.gz"):
+        if path.name not in wanted:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
@@ -0,0 +1,195 @@
+import gzip
+import hashlib
+import io
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Union
+
+from lxml import etree
+from requests import Session
+
+import http_client
+
+GZIP_MAGIC = b"\x1f\x8b"
+FIELDS = ("loc", "lastmod", "changefreq", "priority")
+
+
+class SitemapEntry(NamedTuple):
+    url: str
+    lastmod: Optional[str]
+    changefreq: Optional[str]
+    priority: Optional[float]
+
+
+def _local_name(tag: str) -> str:
+    """{http://www.sitemaps.org/schemas/sitemap/0.9}url -> url"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _priority(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def _decompressed(fp: BinaryIO) -> BinaryIO:
+    """`fp` itself, or a gzip reader over it if the data is gzipped (checked on the first bytes)."""
+    head = fp.peek(2)[:2] if hasattr(fp, "peek") else b""
+    return gzip.GzipFile(fileobj=fp) if head == GZIP_MAGIC else fp
+
+
+def iter_sitemap_file(fp: BinaryIO, children: Optional[List[SitemapEntry]] = None) -> Iterator[SitemapEntry]:
+    """
+    Yields one SitemapEntry per <url> of a sitemap read from `fp`, gzipped or
+    not. Each <url> is cleared from the tree once read, so memory stays flat
+    however large the sitemap is. Entries without a <loc> are skipped.
+
+    For a sitemap index, the <sitemap> entries (child sitemap URL and lastmod)
+    are appended to `children` instead of being yielded.
+    """
+    context = etree.iterparse(
+        _decompressed(fp),
+        events=("end",),
+        tag=("{*}url", "{*}sitemap"),
+        resolve_entities=False,
+        no_network=True,
+        huge_tree=True,
+    )
+    for _, element in context:
+        values = {}
+        for child in element:
+            if not isinstance(child.tag, str):
+                continue  # comments, processing instructions
+            name = _local_name(child.tag)
+            if name in FIELDS and child.text:
+                values[name] = child.text.strip()
+        # Drop the finished <url> and the ones before it from the tree
+        element.clear(keep_tail=True)
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+        if not values.get("loc"):
+            continue
+        entry = SitemapEntry(
+            values["loc"],
+            values.get("lastmod"),
+            values.get("changefreq"),
+            _priority(values.get("priority")),
+        )
+        if _local_name(element.tag) == "sitemap":
+            if children is not None:
+                children.append(entry)
+            continue
+        yield entry
+
+
+class _Digesting(io.RawIOBase):
+    """Passes reads of `fp` through while hashing every byte read."""
+
+    def __init__(self, fp: BinaryIO) -> None:
+        self._fp = fp
+        self.digest = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:  # type: ignore[override]
+        data = self._fp.read(len(buffer))
+        self.digest.update(data)
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def _is_url(source: Union[str, Path]) -> bool:
+    return isinstance(source, str) and source.startswith(("http://", "https://"))
+
+
+class SitemapDownload:
+    """
+    One conditional read of a sitemap. Iterating it streams the entries like
+    iter_sitemap() while hashing the (still compressed) body. `previous` holds
+    the validators of the last read of the same sitemap: the request sends them
+    as If-None-Match / If-Modified-Since, and a 304 yields no entries at all.
+
+    After iteration, `unchanged` tells whether the server answered 304 or the
+    body hashed the same as before, `validators` holds what to store for the
+    next read (ETag, Last-Modified, sha256), and `children` the child sitemaps
+    if the document was a sitemap index.
+    """
+
+    def __init__(
+        self,
+        source: Union[str, Path],
+        previous: Optional[Dict[str, Any]] = None,
+        session: Optional[Session] = None,
+    ) -> None:
+        self.source = source
+        self.previous = previous or {}
+        self.session = session
+        self.not_modified = False
+        self.validators: Dict[str, Any] = {}
+        self.children: List[SitemapEntry] = []
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if self.previous.get("etag"):
+            headers["If-None-Match"] = self.previous["etag"]
+        if self.previous.get("last_modified"):
+            headers["If-Modified-Since"] = self.previous["last_modified"]
+        return headers
+
+    @property
+    def unchanged(self) -> bool:
+        if self.not_modified:
+            return True
+        sha256 = self.validators.get("sha256")
+        return bool(sha256) and sha256 == self.previous.get("sha256")
+
+    def __iter__(self) -> Iterator[SitemapEntry]:
+        if _is_url(self.source):
+            with http_client.open_stream(
+                str(self.source), session=self.session, headers=self.conditional_headers()
+            ) as (response, body):
+                if response.status_code == 304:
+                    self.not_modified = True
+                    self.validators = dict(self.previous, checked_at=_now())
+                    return
+                yield from self._read(
+                    body,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                )
+            return
+        with open(self.source, "rb") as fp:
+            yield from self._read(fp, etag=None, last_modified=None)
+
+    def _read(self, fp: BinaryIO, etag: Optional[str], last_modified: Optional[str]) -> Iterator[SitemapEntry]:
+        digesting = _Digesting(fp)
+        yield from iter_sitemap_file(io.BufferedReader(digesting), self.children)
+        # Hash whatever the parser left unread (trailing whitespace), so the
+        # digest always covers the whole body
+        while digesting.read(http_client.CHUNK_SIZE):
+            pass
+        self.validators = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha256": digesting.digest.hexdigest(),
+            "checked_at": _now(),
+        }
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat(timespec="seconds") + "Z"
+
+
+def iter_sitemap(source: Union[str, Path], session: Optional[Session] = None) -> Iterator[SitemapEntry]:
+    """
+    Streams a sitemap from a URL or a local file (.xml or .xml.gz). A URL is
+    decompressed and parsed as the response arrives; nothing is written to disk.
+    """
+    if _is_url(source):
+        with http_client.open_stream(str(source), session=session) as (_, body):
+            yield from iter_sitemap_file(body)
+        return
+    with open(source, "rb") as fp:
+        yield from iter_sitemap_file(fp)
@@ -0,0 +1,169 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from catalog_shards import ShardedCatalog, is_shard_catalog
+from catalog_store import normalize_slug
+from json_stream import iter_catalog
+import serialization
+
+INDEX_VERSION = 1
+
+
+def slug_index_path(catalog_path: Path) -> Path:
+    """product_details.json -> product_details.slugs.json (catalog/manifest.json -> catalog/manifest.slugs.json)."""
+    return catalog_path.with_name(f"{catalog_path.stem}.slugs.json")
+
+
+def catalog_stamp(catalog_path: Path) -> Optional[List[int]]:
+    """[size, mtime_ns] of the catalog file, or None if it does not exist."""
+    try:
+        stat = catalog_path.stat()
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _newer(current: Optional[str], candidate: Optional[str]) -> Optional[str]:
+    if not candidate:
+        return current
+    if not current or candidate > current:
+        return candidate
+    return current
+
+
+@dataclass(slots=True)
+class SlugEntry:
+    urls: List[str] = field(default_factory=list)
+    # Newest lastmod of any of the URLs.
+    lastmod: Optional[str] = None
+    content_hash: Optional[str] = None
+
+
+class SlugIndex:
+    """
+    slug -> (catalog URLs, newest lastmod, page content hash), kept next to
+    product_details.json so update detection never has to open the catalog.
+
+    The index records the size and mtime of the catalog it describes. Writers of
+    the catalog (run_updates) update it in place and save() it after the catalog;
+    if anything else rewrote the catalog in between, read() notices the stamp
+    mismatch and rebuilds the index by streaming the catalog once.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, SlugEntry]] = None) -> None:
+        self.entries: Dict[str, SlugEntry] = entries or {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self.entries
+
+    def get(self, slug: str) -> Optional[SlugEntry]:
+        return self.entries.get(slug)
+
+    def add(self, url: str, lastmod: Optional[str] = None, content_hash: Optional[str] = None) -> SlugEntry:
+        entry = self.entries.setdefault(normalize_slug(url), SlugEntry())
+        if url not in entry.urls:
+            entry.urls.append(url)
+        entry.lastmod = _newer(entry.lastmod, lastmod)
+        if content_hash:
+            entry.content_hash = content_hash
+        return entry
+
+    def add_product(self, url: str, product: Dict[str, Any]) -> SlugEntry:
+        meta = product.get("meta") if isinstance(product.get("meta"), dict) else {}
+        return self.add(url, product.get("lastmod"), meta.get("content_hash"))
+
+    def remove(self, slug: str) -> Optional[SlugEntry]:
+        return self.entries.pop(slug, None)
+
+    def set_lastmod(self, slug: str, lastmod: str) -> bool:
+        """Sets the lastmod of every URL of `slug`, as update_product_details_lastmod does."""
+        entry = self.entries.get(slug)
+        if entry is None or entry.lastmod == lastmod:
+            return False
+        entry.lastmod = lastmod
+        return True
+
+    def is_up_to_date(self, slug: str, lastmod: Optional[str]) -> bool:
+        """True if a stored URL of `slug` has the sitemap `lastmod` or a newer one."""
+        entry = self.entries.get(slug)
+        return bool(entry and entry.lastmod and lastmod and entry.lastmod >= lastmod)
+
+    @classmethod
+    def from_products(cls, products: Iterable[Tuple[str, Dict[str, Any]]]) -> "SlugIndex":
+        """Builds the index from (url, product) pairs."""
+        index = cls()
+        for url, product in products:
+            if isinstance(product, dict):
+                index.add_product(url, product)
+        return index
+
+    @classmethod
+    def from_catalog(cls, catalog_path: Path) -> "SlugIndex":
+        """
+        Streams product_details.json, or the shards of a shard manifest, once;
+        the catalog is never fully loaded.
+        """
+        if not catalog_path.exists():
+            return cls()
+        if is_shard_catalog(catalog_path):
+            products = ShardedCatalog(catalog_path).iter_products()
+        else:
+            products = iter_catalog(catalog_path)
+        return cls.from_products((url, product) for _, url, product in products)
+
+    def save(self, index_path: Path, catalog_path: Path) -> None:
+        """Writes the index stamped with the catalog's current size and mtime."""
+        data = {
+            "meta": {
+                "version": INDEX_VERSION,
+                "generated_at": datetime.utcnow().isoformat(),
+                "catalog": catalog_path.name,
+                "catalog_stamp": catalog_stamp(catalog_path),
+                "total_slugs": len(self.entries),
+            },
+            "slugs": {
+                slug: [entry.urls, entry.lastmod, entry.content_hash]
+                for slug, entry in self.entries.items()
+            },
+        }
+        serialization.dump(data, index_path, compact=True, atomic=True)
+
+    @classmethod
+    def read(cls, index_path: Path, catalog_path: Path) -> Optional["SlugIndex"]:
+        """The saved index if it still describes the catalog, else None."""
+        if not index_path.exists():
+            return None
+        try:
+            data = serialization.load(index_path)
+        except (OSError, ValueError):
+            return None
+        meta = data.get("meta") or {}
+        if meta.get("version") != INDEX_VERSION or meta.get("catalog_stamp") != catalog_stamp(catalog_path):
+            return None
+        return cls(
+            {
+                slug: SlugEntry(urls, lastmod, content_hash)
+                for slug, (urls, lastmod, content_hash) in data.get("slugs", {}).items()
+            }
+        )
+
+
+def load_slug_index(catalog_path: Path, index_path: Optional[Path] = None) -> Tuple[SlugIndex, bool]:
+    """
+    Returns (index, rebuilt). A missing or stale index is rebuilt from the
+    catalog and saved, so the next load is a plain read again.
+    """
+    index_path = index_path or slug_index_path(catalog_path)
+    index = SlugIndex.read(index_path, catalog_path)
+    if index is not None:
+        return index, False
+    index = SlugIndex.from_catalog(catalog_path)
+    if catalog_path.exists():
+        index.save(index_path, catalog_path)
+    return index, True
+
@@ -0,0 +1,69 @@
+from typing import Dict, List
+
+import pandas as pd
+
+from slug_index import SlugIndex
+
+# Arrow-backed strings: the str methods below run as vectorized Arrow kernels
+STRING_DTYPE = "string[pyarrow]"
+
+
+def slugs(urls: pd.Series) -> pd.Series:
+    """catalog_store.normalize_slug over a whole column: .../371/slug/?c=123 -> slug"""
+    return (
+        urls.str.replace(r"\?.*$", "", regex=True)
+        .str.rstrip("/")
+        .str.replace(r"^.*/", "", regex=True)
+    )
+
+
+def lastmod_times(values: pd.Series) -> pd.Series:
+    """
+    ISO 8601 lastmod strings as UTC datetimes (dates without an offset count as
+    UTC); NaT if unparseable. A sitemap repeats the same few hundred dates, so
+    each distinct value is parsed once and the result spread back by code.
+    """
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=values.dtype), utc=True, format="ISO8601", errors="coerce")
+    # Missing values have the code -1, which allow_fill turns into NaT
+    return pd.Series(parsed.array.take(codes, allow_fill=True), index=values.index)
+
+
+def sitemap_frame(sitemap_urls: Dict[str, str]) -> pd.DataFrame:
+    """url, lastmod (string), slug, and lastmod as a datetime, in sitemap order."""
+    frame = pd.DataFrame({
+        "url": pd.array(list(sitemap_urls), dtype=STRING_DTYPE),
+        "lastmod": pd.array(list(sitemap_urls.values()), dtype=STRING_DTYPE),
+    })
+    frame["slug"] = slugs(frame["url"])
+    frame["lastmod_at"] = lastmod_times(frame["lastmod"])
+    return frame
+
+
+def index_frame(index: SlugIndex) -> pd.DataFrame:
+    """slug, the newest stored lastmod (string) and the same as a datetime."""
+    frame = pd.DataFrame({
+        "slug": pd.array(list(index.entries), dtype=STRING_DTYPE),
+        "stored": pd.array([entry.lastmod for entry in index.entries.values()], dtype=STRING_DTYPE),
+    })
+    frame["stored_at"] = lastmod_times(frame["stored"])
+    return frame
+
+
+def identify_updates(sitemap_urls: Dict[str, str], index: SlugIndex) -> List[str]:
+    """
+    The sitemap URLs to scrape, in sitemap order and one per product: new slugs,
+    and known slugs for which no stored URL has the sitemap lastmod or a newer
+    one. The sitemap is joined against the slug index in a single merge.
+
+    Dates are compared as datetimes, so offsets are honoured. A lastmod that is
+    not ISO 8601 falls back to comparing the raw strings, as the loop did.
+    """
+    if not sitemap_urls:
+        return []
+    merged = sitemap_frame(sitemap_urls).merge(index_frame(index), on="slug", how="left", sort=False)
+    parsed = merged["stored_at"].notna() & merged["lastmod_at"].notna()
+    up_to_date = (merged["stored_at"] >= merged["lastmod_at"]) | (
+        ~parsed & (merged["stored"] >= merged["lastmod"]).fillna(False).astype(bool)
+    )
+    return merged.loc[~up_to_date, ["url", "slug"]].drop_duplicates("slug")["url"].tolist()
@@ -1,11 +1,18 @@
-import xml.etree.ElementTree as ET
 import json
 import os
+from pathlib import Path
+from lxml import etree
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn, TimeRemainingColumn
 from rich.panel import Panel
 from rich.theme import Theme
 
+from catalog_shards import SHARD_DIR, open_shards
+from catalog_snapshots import write_snapshot
+from catalog_store import CATALOG_DB, catalog_backend, open_catalog
+from sitemap_fetch import fetch_sitemaps
+import serialization
+
 # Define a custom theme for a pretty UI
 custom_theme = Theme({
     "info": "cyan",
@@ -19,61 +26,59 @@ console = Console(theme=custom_theme)
 
 
 
-def parse_sitemap(xml_path):
-    """Parses the sitemap.xml and returns a dictionary of {url: lastmod}."""
-    if not os.path.exists(xml_path):
-        console.print(f"[error]Error: {xml_path} not found.[/error]")
+def parse_sitemap(source):
+    """
+    Streams a sitemap or sitemap index (file path or URL, .xml or .xml.gz; the
+    children of an index are fetched concurrently) and returns a dictionary of {url: lastmod}.
+    """
+    if not str(source).startswith(("http://", "https://")) and not os.path.exists(source):
+        console.print(f"[error]Error: {source} not found.[/error]")
         return {}
 
-    url_map = {}
     try:
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
-        
-        # Handle namespace
-        ns = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-        
-        # Find all url entries
-        urls = root.findall('ns:url', ns)
-        
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            TaskProgressColumn(),
-            console=console
-        ) as progress:
-            task = progress.add_task("[cyan]Parsing Sitemap...", total=len(urls))
-            
-            for url_entry in urls:
-                loc = url_entry.find('ns:loc', ns)
-                lastmod = url_entry.find('ns:lastmod', ns)
-                
-                if loc is not None and lastmod is not None:
-                    url_map[loc.text.strip()] = lastmod.text.strip()
-                
-                progress.advance(task)
-                
-        console.print(f"[success]Successfully parsed {len(url_map)} URLs from {xml_path}[/success]")
+        with console.status("[cyan]Parsing Sitemap...[/cyan]"):
+            sitemaps = fetch_sitemaps(str(source), cache_dir=None)
+        url_map = sitemaps.urls
+        console.print(f"[success]Successfully parsed {len(url_map)} URLs from {source} ({sitemaps.sitemap_count} sitemap files)[/success]")
         return url_map
 
-    except ET.ParseError as e:
+    except etree.XMLSyntaxError as e:
         console.print(f"[error]Error parsing XML: {e}[/error]")
         return {}
     except Exception as e:
         console.print(f"[error]Unexpected error: {e}[/error]")
         return {}
 
+def update_catalog(json_path, url_map):
+    """Updates lastmod dates in the SQLite catalog, then re-exports product_details.json if anything changed."""
+    with open_catalog(CATALOG_DB, legacy_json=Path(json_path)) as store:
+        updated_count = store.set_lastmod_by_url(url_map)
+        store.export_if_stale(Path(json_path))
+        total_products = store.count()
+    console.print(Panel(f"[success]Update Complete![/success]\n\n[info]Total Products Processed:[/info] {total_products}\n[info]Products Updated:[/info] {updated_count}", title="Summary", border_style="green"))
+
+def update_shards(json_path, url_map):
+    """Updates lastmod dates in the shard catalog; only shards with a changed date are rewritten."""
+    catalog = open_shards(SHARD_DIR, legacy_json=Path(json_path))
+    written = catalog.set_lastmod_by_url(url_map)
+    console.print(Panel(f"[success]Update Complete![/success]\n\n[info]Total Products Processed:[/info] {catalog.count()}\n[info]Shards Rewritten:[/info] {len(written)} of {len(catalog.shards())}", title="Summary", border_style="green"))
+
 def update_json(json_path, url_map):
     """Updates the product_details.json with lastmod dates."""
+    if catalog_backend() == "sqlite":
+        update_catalog(json_path, url_map)
+        return
+    if catalog_backend() == "shards":
+        update_shards(json_path, url_map)
+        return
+
     if not os.path.exists(json_path):
         console.print(f"[error]Error: {json_path} not found.[/error]")
         return
 
     try:
         with console.status("[bold green]Loading JSON data...[/bold green]"):
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = serialization.load(json_path)
 
         if 'products' not in data:
             console.print("[error]Invalid JSON structure: 'products' key missing.[/error]")
@@ -108,8 +113,7 @@ def update_json(json_path, url_map):
                     progress.advance(task)
 
         with console.status("[bold green]Saving updated JSON...[/bold green]"):
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
+            write_snapshot(data, Path(json_path))
 
         console.print(Panel(f"[success]Update Complete![/success]\n\n[info]Total Products Processed:[/info] {total_products}\n[info]Products Updated:[/info] {updated_count}", title="Summary", border_style="green"))
 
@@ -121,7 +125,7 @@ def update_json(json_path, url_map):
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="Update lastmod dates in product details")
-    parser.add_argument("--sitemap", default="sitemap.xml", help="Path to sitemap.xml")
+    parser.add_argument("--sitemap", default="sitemap.xml", help="Path or URL of the sitemap (.xml or .xml.gz)")
     parser.add_argument("--input", default="product_details.json", help="Path to product_details.json")
     args = parser.parse_args()
 
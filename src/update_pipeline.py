@@ -0,0 +1,234 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from rich.panel import Panel
+
+import scrape_products
+from convert_products_to_csv import convert_records
+from html_archive import HtmlArchive
+from http_cache import ResponseCache
+from product_model import ProductRecord
+from product_schema import is_removed
+from run_updates import (
+    PRODUCT_DETAILS_FILE,
+    SCRAPE_JOURNAL,
+    SITEMAP_URL,
+    UPDATED_CSV,
+    baseline_path,
+    console,
+    diff_sitemap,
+    fetch_sitemap,
+    get_existing_products,
+    identify_updates,
+    load_scrape_baseline,
+    load_sitemap_state,
+    merge_updates,
+    normalize_url,
+    record_price_history,
+    record_sitemap,
+    save_sitemap_state,
+    update_product_details_lastmod,
+)
+from sitemap_fetch import SitemapSet
+
+# {brand: {url: product}}, as scraped and as stored in the catalog
+Products = Dict[str, Dict[str, Dict[str, Any]]]
+
+
+class UpdatePlan(NamedTuple):
+    """What a run has to do, decided from the sitemap before anything is scraped."""
+
+    # {url: lastmod} of the product pages in the sitemap
+    sitemap_urls: Dict[str, str]
+    sitemaps: Optional[SitemapSet]
+    # {slug: removed_at or None}: products to tombstone or restore
+    tombstones: Dict[str, Optional[str]]
+    # The sitemap's own snapshot, saved once the run completes
+    snapshot: List[Tuple[str, str]]
+    # Every sitemap URL of each product to scrape, so the scraper can attach all
+    # of its category URLs (it still fetches each product once)
+    product_urls: List[str]
+
+
+class ScrapeResult(NamedTuple):
+    # Products whose content changed; unchanged ones are not included
+    products: Products
+    skipped: int
+    # Pages that could not be fetched or parsed
+    failed: List[str]
+    # Slugs of the products scraped, changed or skipped as unchanged (not failed)
+    scraped_slugs: Set[str]
+
+    @property
+    def changed(self) -> int:
+        return sum(len(items) for items in self.products.values())
+
+
+class UpdateResult(NamedTuple):
+    # unchanged | up_to_date | no_changes | updated | failed
+    status: str
+    changed: int = 0
+    csv: Optional[Path] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status != "failed"
+
+
+def read_sitemap(source: str = SITEMAP_URL, force: bool = False) -> Tuple[Dict[str, str], Optional[SitemapSet]]:
+    """
+    Stage 1: the product URLs of the sitemap. The download is conditional on the
+    validators of the last completed run, if there is a catalog it could have
+    produced and `force` is not set.
+    """
+    state = None
+    if not force and baseline_path().exists():
+        state = load_sitemap_state()
+    return fetch_sitemap(source, state)
+
+
+def plan_updates(sitemap_urls: Dict[str, str], sitemaps: Optional[SitemapSet] = None) -> UpdatePlan:
+    """
+    Stage 2: diffs the sitemap against the last one (products that left it are
+    tombstoned, returning ones restored) and picks the products to scrape.
+    """
+    existing_index = get_existing_products(PRODUCT_DETAILS_FILE)
+    changes, snapshot = diff_sitemap(sitemap_urls, existing_index)
+    tombstones = changes.tombstones(datetime.utcnow().date().isoformat())
+    updated_slugs = {normalize_url(url) for url in identify_updates(sitemap_urls, existing_index)}
+    product_urls = [url for url in sitemap_urls if normalize_url(url) in updated_slugs]
+    return UpdatePlan(sitemap_urls, sitemaps, tombstones, snapshot, product_urls)
+
+
+def scrape(product_urls: List[str], journal: Path = SCRAPE_JOURNAL) -> ScrapeResult:
+    """
+    Stage 3: scrapes the products in this process, with the scraper's default
+    settings, and returns those whose content changed since the catalog (only
+    the records of these products are loaded to compare against). Parsed
+    products are journaled as they arrive and the journal of an interrupted run
+    is resumed; nothing else is written.
+    """
+    links = scrape_products.group_links_by_brand(product_urls)
+    output = scrape_products.scrape_products(
+        links_by_brand=links,
+        brands=sorted(links),
+        max_links=None,
+        offset=0,
+        delay=scrape_products.DEFAULT_DELAY,
+        output_file=None,
+        cache=ResponseCache(scrape_products.CACHE_DIR),
+        journal_file=journal,
+        resume=True,
+        archive=HtmlArchive(scrape_products.ARCHIVE_DIR),
+        baseline=load_scrape_baseline(product_urls),
+    )
+    meta = output["meta"]
+    failed = meta.get("failed_urls", [])
+    failed_slugs = {normalize_url(url) for url in failed}
+    scraped_slugs = {normalize_url(url) for url in product_urls} - failed_slugs
+    return ScrapeResult(output["products"], meta.get("skipped_unchanged", 0), failed, scraped_slugs)
+
+
+def merge(plan: UpdatePlan, scraped: Optional[ScrapeResult] = None) -> bool:
+    """
+    Stage 4: records price/stock history and merges the scraped products into
+    the catalog, then updates lastmod dates and tombstones from the sitemap.
+    Of the products the plan had to scrape, only those in `scraped.scraped_slugs`
+    get the sitemap lastmod: the others keep their old one, so the next run
+    picks them up again.
+    Returns False if the catalog could not be written; lastmod dates are not
+    touched after a failed merge. A failure to record price history is reported
+    but does not fail the stage.
+    """
+    if scraped is not None and scraped.products:
+        record_price_history(scraped.products)
+        if not merge_updates(PRODUCT_DETAILS_FILE, scraped.products, plan.sitemap_urls):
+            return False
+    planned = {normalize_url(url) for url in plan.product_urls}
+    settled = scraped.scraped_slugs if scraped is not None else set()
+    sitemap_urls = {
+        url: lastmod
+        for url, lastmod in plan.sitemap_urls.items()
+        if normalize_url(url) not in planned or normalize_url(url) in settled
+    }
+    return update_product_details_lastmod(PRODUCT_DETAILS_FILE, sitemap_urls, plan.tombstones)
+
+
+def convert(products: Products, output: Path = UPDATED_CSV, price_formula: str = "") -> int:
+    """Stage 5: writes the CSV rows of the products, record by record. Returns the number converted."""
+    records = (
+        ProductRecord.from_dict(product)
+        for items in products.values()
+        for product in items.values()
+        if not is_removed(product)
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    return convert_records(records, output, price_formula=price_formula)
+
+
+def run_update(source: str = SITEMAP_URL, force: bool = False, output: Path = UPDATED_CSV) -> UpdateResult:
+    """
+    The whole update in one process: sitemap -> diff -> scrape -> merge -> convert.
+    The sitemap is only recorded as processed once every stage succeeded and
+    every page was scraped, so the next run repeats a failed one.
+    """
+    console.print(Panel.fit("[bold blue]AC Schnitzer Update Workflow[/bold blue]", subtitle="v1.4"))
+
+    sitemap_urls, sitemaps = read_sitemap(source, force)
+    if sitemaps is not None and sitemaps.unchanged:
+        save_sitemap_state(sitemaps.validators)
+        console.print("[success]Sitemap unchanged since the last run. Nothing to update.[/success]")
+        return UpdateResult("unchanged")
+    if not sitemap_urls:
+        console.print("[error]No URLs found in sitemap. Aborting.[/error]")
+        return UpdateResult("failed")
+
+    plan = plan_updates(sitemap_urls, sitemaps)
+    if not plan.product_urls:
+        console.print("[success]No updates found. All products are up to date.[/success]")
+        # Still update lastmod in main file just in case
+        if not merge(plan):
+            return UpdateResult("failed")
+        record_sitemap(sitemaps, plan.snapshot)
+        return UpdateResult("up_to_date")
+
+    console.print(f"[highlight]Found {len({normalize_url(url) for url in plan.product_urls})} products to update/add.[/highlight]")
+    console.print(Panel("[bold magenta]Starting Scraper for Updated Products...[/bold magenta]"))
+    try:
+        scraped = scrape(plan.product_urls)
+    except Exception as e:
+        console.print(f"[error]Scraping failed: {e}[/error]")
+        return UpdateResult("failed")
+
+    if scraped.skipped:
+        console.print(f"[info]Skipped {scraped.skipped} products whose content did not change since the last scrape.[/info]")
+    if not scraped.changed:
+        console.print("[success]No product content changed. Skipping merge and CSV conversion.[/success]")
+    # The products that were scraped are merged even if others failed
+    if not merge(plan, scraped):
+        return UpdateResult("failed", scraped.changed)
+
+    csv = None
+    if scraped.changed:
+        console.print(Panel("[bold magenta]Converting Updated Products to CSV...[/bold magenta]"))
+        try:
+            converted = convert(scraped.products, output)
+            console.print(f"[success]Successfully generated {output.name} with {converted} products[/success]")
+            csv = output
+        except Exception as e:
+            console.print(f"[error]Conversion failed: {e}[/error]")
+            return UpdateResult("failed", scraped.changed)
+
+    if scraped.failed:
+        console.print(
+            f"[error]{len(scraped.failed)} products could not be scraped. "
+            "The sitemap is not recorded, so the next run processes it again.[/error]"
+        )
+        return UpdateResult("failed", scraped.changed, csv)
+
+    record_sitemap(sitemaps, plan.snapshot)
+    if not scraped.changed:
+        return UpdateResult("no_changes")
+    console.print(Panel.fit("[bold green]Update Workflow Completed Successfully![/bold green]"))
+    return UpdateResult("updated", scraped.changed, output)